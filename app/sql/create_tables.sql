@@ -9,9 +9,32 @@ create table if not exists public.company (
   year_business_back varchar,
   employee_band varchar(50),
   revenue_band varchar(50),
-  external_id integer
+  external_id integer,
+  external_company_id bigint
 );
 
+-- Clave natural de company (upsert del modo delta de src/upload.py)
+alter table public.company add column if not exists external_company_id bigint;
+-- Bases donde la columna se creó como varchar: add column if not exists no cambia su
+-- tipo, así que se convierte aquí (los Company ID son enteros)
+do $$
+begin
+  if exists (
+    select 1 from information_schema.columns
+    where table_schema = 'public'
+      and table_name = 'company'
+      and column_name = 'external_company_id'
+      and data_type <> 'bigint'
+  ) then
+    alter table public.company
+      alter column external_company_id type bigint
+      using nullif(trim(external_company_id::text), '')::numeric::bigint;
+  end if;
+end;
+$$;
+create unique index if not exists company_external_company_id_key
+  on public.company(external_company_id);
+
 -- =========================================
 -- INDUSTRY: tabla maestra
 -- =========================================
@@ -142,3 +165,21 @@ create table if not exists public.score (
 
 create index if not exists idx_score_company
   on public.score(company_id);
+
+-- =========================================
+-- Checksum del mapeo external_company_id -> id (src/controllers/company_mapping.py)
+-- Usa company.external_company_id: en bases anteriores a esa columna la agrega el
+-- alter table de la sección COMPANY, que corre antes.
+-- =========================================
+create or replace function public.company_mapping_checksum()
+returns text
+language plpgsql
+stable
+as $$
+begin
+  return (
+    select md5(coalesce(string_agg(id::text || ':' || coalesce(external_company_id::text, ''), ',' order by id), ''))
+    from public.company
+  );
+end;
+$$;
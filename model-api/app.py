@@ -1,110 +1,45 @@
 # app.py (Ejemplo usando FastAPI)
 
-from fastapi import FastAPI
+import time
+# Inicio de la importación del módulo, para el reporte de arranque (ver StartupState)
+_MODULE_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, contextmanager
 import logging
-from catboost import CatBoostClassifier, CatBoostRegressor
 import numpy as np
 import pandas as pd
-from sklearn.preprocessing import OrdinalEncoder
 from pydantic import BaseModel
-from typing import Optional
-from enum import Enum
+from typing import Any, Dict, List, Optional
+import hmac
+import threading
 import os
-try:
-    from joblib import dump, load
-except Exception:
-    import pickle
-    def dump(obj, path):
-        with open(path, 'wb') as f:
-            pickle.dump(obj, f)
-    def load(path):
-        with open(path, 'rb') as f:
-            return pickle.load(f)
-
-
-# --- Enums para campos categóricos (valores esperados según notebook / dataframes) ---
-class RevenueBandEnum(str, Enum):
-    less_100K = "<$100K"
-    _100k_499k = "$100K-$499K"
-    _500k_999k = "$500K-$999K"
-    _1m_2_49m = "$1M-$2.49M"
-    _2_5m_4_9m = "$2.5M-$4.9M"
-    _5m_9_9m = "$5M-$9.9M"
-    _10m_24_9m = "$10M-$24.9M"
-    _25m_49m = "$25M-$49M"
-    _50m_99m = "$50M-$99M"
-    _100m_499m = "$100M-$499M"
-    _500m_999m = "$500M-$999M"
-    _1b_4_9b = "$1B-$4.9B"
-    _5b_9_9b = "$5B-$9.9B"
-    _10b_24_9b = "$10B-$24.9B"
-    _25b_plus = "$25B+"
-
-
-class CloudCoverageEnum(str, Enum):
-    Iaas = "Iaas"
-    SaaS = "SaaS"
-    PaaS = "PaaS"
-    Other = "Other"
-
-
-class TechnologyScopeEnum(str, Enum):
-    Mobility = "Mobility"
-    IoT = "IoT"
-    Cloud = "Cloud"
-    BigDataAndAnalytics = "Big Data and Analytics"
-    AI = "AI"
-    Robotics = "Robotics"
-    AR_VR = "AR/VR"
-    ThreeD_Printing = "3D Printing"
-    Social = "Social"
-    Security = "Security"
-    Blockchain = "Blockchain"
-    Other = "-"
-
-
-class PartnerClassificationEnum(str, Enum):
-    ISV = "Independent Software Vendor (ISV)"
-    RSI = "Regional System Integrator (RSI)"
-    GSI = "Global Systems Integrator (GSI)"
-    CSP = "Cloud Service Provider (CSP)"
-    MSP = "Managed Service Provider (MSP)"
-    DMR = "Direct Market Reseller (DMR)"
-    VAR = "Value Added Reseller (VAR)"
-    Distributor = "Distributor"
-    Other = "-"
-
-
-class IndustryAgrpEnum(str, Enum):
-    Finanzas = "Finanzas"
-    Salud = "Salud"
-    Energia = "Energia"
-    Manufactura = "Manufactura"
-    Servicios = "Servicios"
-    Sector_publico = "Sector_publico"
-    Otros = "Otros"
-
-
-# Enums adicionales solicitados: Employee Band y Years in Business Band
-class EmployeeBandEnum(str, Enum):
-    _1_10 = "1-10"
-    _11_50 = "11-50"
-    _51_200 = "51-200"
-    _201_500 = "201-500"
-    _501_1000 = "501-1000"
-    _1001_5000 = "1001-5000"
-    _5001_plus = "5001+"
-
-
-class YearsInBusinessEnum(str, Enum):
-    less_1 = "<1"
-    _1_2 = "1-2"
-    _3_5 = "3-5"
-    _6_10 = "6-10"
-    _11_20 = "11-20"
-    _21_plus = "21+"
+from collections import Counter
+# catboost (y sklearn, vía joblib) se importan al cargar el primer bundle: importar app.py
+# no los necesita y así su costo aparece medido en el reporte de arranque.
+# Los subsistemas viven en módulos propios; app.py reexporta sus nombres para los scripts,
+# benchmarks y tests que los importan desde aquí.
+from features import (
+    BAND_COLUMNS, ENCODER_DIR, ENCODER_FILES, CloudCoverageEnum, CompiledFeatureEncoder, DEFAULT_REGIONS,
+    EmployeeBandEnum, EncoderRegistry, IndustryAgrpEnum, PartnerClassificationEnum, RevenueBandEnum,
+    TechnologyScopeEnum, YearsInBusinessEnum, default_feature_domains, encoder_registry, feature_encoder,
+    feature_engineering, synthetic_payloads,
+)
+from metrics import Metrics, metrics
+from prediction_cache import PredictionCache, file_signature
+from score_table import ScoreTable, file_sha256
+from lite_model import LiteModel
+from micro_batcher import MicroBatcher
+from bundles import (
+    BUNDLE_MODEL_FILE, DEFAULT_VERSION, INFERENCE_BACKEND, LITE_MODEL_FILE, LITE_MODEL_PATH, MODEL_PATH,
+    MODEL_REPOSITORY, MODEL_VERSION, MODEL_WATCH_INTERVAL, PREDICT_THREAD_COUNT, SCORE_TABLE_PATH,
+    USE_SCORE_TABLE, ModelBundle, ModelRegistry, ModelSchema, activate_bundle, align_features,
+    get_model_feature_names, model_registry, on_activate, predict_scores,
+)
+from explain import explain_scores, explanation_cache, explanation_result
 
 
 # Configurar logging básico
@@ -116,26 +51,125 @@ if not logger.handlers:
     logger.addHandler(handler)
     logger.setLevel(logging.INFO)
 
-# --- 1. CARGA DEL MODELO (Solo se ejecuta una vez al inicio) ---
-MODEL_PATH = "catboost_best_model.cbm"
-model = None
+# PREDICTION_CACHE_SIZE=0 desactiva la caché; PREDICTION_CACHE_TTL=0 significa sin expiración
+prediction_cache = PredictionCache(
+    max_size=int(os.getenv("PREDICTION_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("PREDICTION_CACHE_TTL", "0")),
+)
+
+# Globales del bundle activo que se mantienen por compatibilidad con los scripts y benchmarks
+# (las peticiones usan active_bundle); los actualiza _bind_active_bundle en cada activación
+model = model_schema = score_table = active_bundle = None
+
+
+@on_activate
+def _bind_active_bundle(bundle):
+    global active_bundle, model, model_schema, score_table, encoder_registry, feature_encoder
+    prediction_cache.bind(bundle.model_path)
+    explanation_cache.bind(bundle.model_path)
+    model, model_schema, score_table = bundle.model, bundle.schema, bundle.score_table
+    encoder_registry, feature_encoder = bundle.registry, bundle.encoder
+    active_bundle = bundle
+
+
+# MICROBATCH_MAX_SIZE=1 desactiva el agrupamiento (cada petición se puntúa sola)
+micro_batcher = MicroBatcher(
+    lambda rows, bundle=None: predict_scores_cached(rows, bundle),
+    max_size=int(os.getenv("MICROBATCH_MAX_SIZE", "64")),
+    max_wait=float(os.getenv("MICROBATCH_MAX_WAIT_MS", "2")) / 1000.0,
+    threads=int(os.getenv("INFERENCE_THREADS", "1")),
+)
+
+
+# Token para /admin/*; sin valor los endpoints de administración quedan deshabilitados
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+
+class StartupState:
+    """
+    Reporte de arranque del proceso: segundos por fase (import de app.py, carga del bundle,
+    calentamiento del camino de la petición) y si ya puede recibir tráfico.
+    /ready responde 200 solo después de cargar y calentar el modelo; /health solo indica
+    que el proceso está vivo.
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self.ready = False
+        self.ready_at = None
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = round(time.perf_counter() - started, 4)
+
+    def mark_ready(self):
+        self.ready = True
+        self.ready_at = time.perf_counter()
+
+    def total_seconds(self):
+        """Segundos desde que empezó a importarse app.py hasta quedar listo (None si aún no lo está)."""
+        return round(self.ready_at - _MODULE_STARTED, 4) if self.ready_at is not None else None
+
+    def report(self):
+        return {
+            "ready": self.ready,
+            "total_seconds": self.total_seconds(),
+            "phases": dict(self.phases),
+            "model_version": active_bundle.version if active_bundle is not None else None,
+            "model_timings": dict(active_bundle.timings) if active_bundle is not None else {},
+            "pid": os.getpid(),
+        }
+
+
+startup = StartupState()
+
+
+def load_artifacts(force=False):
+    """
+    Carga, calienta y activa la versión inicial del modelo (modelo, encoders y tabla de scores).
+    Es idempotente: si el proceso maestro de gunicorn ya la cargó antes de hacer fork
+    (preload_app), los workers heredan esas páginas compartidas y aquí no se recarga nada.
+    """
+    if active_bundle is not None and not force:
+        return
+    version = model_registry.initial_version()
+    with startup.phase("artifacts"):
+        try:
+            model_registry.load(version)
+        except Exception as e:
+            # Es crucial que la app no sirva predicciones si no puede cargar el modelo
+            logger.error(f"Error al cargar el modelo: {e}")
+
+
+def warm_up_request_path(n=8):
+    """Valida y normaliza entradas sintéticas (pydantic + InputNormalizer) para que no lo pague la primera petición."""
+    for payload in synthetic_payloads(n):
+        build_payload(PredictionInput(**{field: payload[column] for field, column in _PAYLOAD_FIELDS}))
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Maneja los eventos de startup y shutdown de la aplicación usando lifespan."""
-    # Startup
-    global model
-    try:
-        # Cargar como regresor (salida continua 0-1)
-        model = CatBoostRegressor()
-        model.load_model(MODEL_PATH)
-        logger.info(f"Modelo CatBoost cargado exitosamente desde: {MODEL_PATH}")
-    except Exception as e:
-        logger.error(f"Error al cargar el modelo: {e}")
-        # Es crucial que la app no inicie si no puede cargar el modelo
+    # Startup: todo se carga y se calienta antes de marcar el proceso como listo
+    load_artifacts()
+    with startup.phase("request_path"):
+        warm_up_request_path()
+    await micro_batcher.start()
+    model_registry.start_watching(MODEL_WATCH_INTERVAL)
+    if active_bundle is not None:
+        startup.mark_ready()
+        logger.info(f"API lista en {startup.total_seconds():.2f}s: {startup.report()}")
+    else:
+        logger.error("La API arrancó sin modelo; /ready responderá 503")
     # Yield control a la aplicación durante su ejecución
     yield
     # Shutdown (lógica de limpieza si es necesaria)
+    model_registry.stop_watching()
+    await micro_batcher.stop()
     logger.info("Aplicación cerrando")
 
 # Inicializa la aplicación FastAPI con lifespan handler
@@ -165,153 +199,281 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-@app.post("/predict")
-def predict(data: PredictionInput):
-    """Realiza una predicción usando el modelo CatBoost cargado."""
-    if model is None:
-        return {"error": "El modelo no está cargado. La aplicación no se inició correctamente."}
-
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Cuenta peticiones y mide su duración total por ruta."""
+    start = time.perf_counter()
+    status = 500
     try:
-        # Si algunos campos vienen como Enum, extraer su .value; si no, dejar None/str
-        # Normalizar valores de entrada para tolerar variaciones de mayúsculas/minúsculas y espacios
-        def norm(v):
-            if v is None:
-                return None
-            if isinstance(v, str):
-                return v.strip()
-            return v
-
-        # Mapeos tolerantes para variantes comunes desde el front
-        def map_cloud(v):
-            s = norm(v)
-            if s is None:
-                return None
-            s_upper = s.upper()
-            if s_upper == 'IAAS':
-                return 'Iaas'
-            if s_upper == 'PAAS':
-                return 'PaaS'
-            if s_upper == 'SAAS':
-                return 'SaaS'
-            return s
-
-        def map_technology(v):
-            s = norm(v)
-            if s is None:
-                return None
-            # Normalizar variantes comunes
-            aliases = {
-                'mobility': 'Mobility',
-                'iot': 'IoT',
-                'cloud': 'Cloud',
-                'big data and analytics': 'Big Data and Analytics',
-                'bigdataandanalytics': 'Big Data and Analytics',
-                'ai': 'AI',
-                'robotics': 'Robotics',
-                'ar/vr': 'AR/VR',
-                'arvr': 'AR/VR',
-                '3d printing': '3D Printing',
-                '3dprinting': '3D Printing',
-                'social': 'Social',
-                'security': 'Security',
-                'blockchain': 'Blockchain',
-                '-': '-',
-            }
-            key = s.lower().replace(' ', '') if s.lower() not in aliases else s.lower()
-            return aliases.get(s.lower(), aliases.get(key, s))
-
-        def map_partner(v):
-            s = norm(v)
-            if s is None:
-                return None
-            aliases = {
-                'independent software vendor (isv)': 'Independent Software Vendor (ISV)',
-                'isv': 'Independent Software Vendor (ISV)',
-                'regional system integrator (rsi)': 'Regional System Integrator (RSI)',
-                'rsi': 'Regional System Integrator (RSI)',
-                'global systems integrator (gsi)': 'Global Systems Integrator (GSI)',
-                'gsi': 'Global Systems Integrator (GSI)',
-                'cloud service provider (csp)': 'Cloud Service Provider (CSP)',
-                'csp': 'Cloud Service Provider (CSP)',
-                'managed service provider (msp)': 'Managed Service Provider (MSP)',
-                'msp': 'Managed Service Provider (MSP)',
-                'direct market reseller (dmr)': 'Direct Market Reseller (DMR)',
-                'dmr': 'Direct Market Reseller (DMR)',
-                'value added reseller (var)': 'Value Added Reseller (VAR)',
-                'var': 'Value Added Reseller (VAR)',
-                'distributor': 'Distributor',
-                '-': '-',
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        path = request.url.path
+        metrics.observe("model_api_request_seconds", time.perf_counter() - start, path=path)
+        metrics.inc("model_api_requests_total", path=path, status=status)
+
+
+# --- Normalización de entrada (compilada una vez a partir de los Enums) ---
+# Tipos de nube que se aceptan sin importar mayúsculas/minúsculas
+_CLOUD_ALIASES = {e.value.upper(): e.value for e in CloudCoverageEnum if e is not CloudCoverageEnum.Other}
+
+# Technology: nombre en minúsculas y sin espacios, más variantes sueltas del front
+_TECHNOLOGY_ALIASES = {}
+for _e in TechnologyScopeEnum:
+    _TECHNOLOGY_ALIASES[_e.value.lower()] = _e.value
+    _TECHNOLOGY_ALIASES[_e.value.lower().replace(' ', '')] = _e.value
+_TECHNOLOGY_ALIASES['arvr'] = TechnologyScopeEnum.AR_VR.value
+
+# Partner: nombre completo en minúsculas y la sigla entre paréntesis (isv, rsi, ...)
+_PARTNER_ALIASES = {}
+for _e in PartnerClassificationEnum:
+    _PARTNER_ALIASES[_e.value.lower()] = _e.value
+    if '(' in _e.value:
+        _PARTNER_ALIASES[_e.value[_e.value.index('(') + 1:_e.value.rindex(')')].lower()] = _e.value
+
+
+def _canonical_cloud(s):
+    return _CLOUD_ALIASES.get(s.upper(), s)
+
+
+def _canonical_technology(s):
+    low = s.lower()
+    hit = _TECHNOLOGY_ALIASES.get(low)
+    if hit is None:
+        hit = _TECHNOLOGY_ALIASES.get(low.replace(' ', ''))
+    return s if hit is None else hit
+
+
+def _canonical_partner(s):
+    return _PARTNER_ALIASES.get(s.lower(), s)
+
+
+class InputNormalizer:
+    """
+    Canonicaliza los campos de PredictionInput (strip + alias).
+    Por campo hay una tabla texto crudo -> valor canónico sembrada con los valores de los
+    Enums y sus alias; lo que no está en la tabla se resuelve con la regla del campo y se
+    memoriza (hasta MAX_TABLE entradas). Además cuenta cada valor crudo que no llega ya en
+    su forma canónica, para detectar valores del front que conviene corregir.
+    """
+
+    MAX_TABLE = 4096
+    MAX_VARIANTS = 256
+
+    # campo -> (regla sobre el texto ya sin espacios, Enum con los valores canónicos)
+    FIELDS = {
+        'revenue_band': (None, RevenueBandEnum),
+        'employee_band': (None, EmployeeBandEnum),
+        'years_in_business_band': (None, YearsInBusinessEnum),
+        'global_region': (None, None),
+        'industry_detail_customer': (None, None),
+        'cloud_coverage': (_canonical_cloud, CloudCoverageEnum),
+        'technology_scope': (_canonical_technology, TechnologyScopeEnum),
+        'partner_classification': (_canonical_partner, PartnerClassificationEnum),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rules = {}
+        self.canonical = {}
+        self.tables = {}
+        self.variants = {}
+        for field, (rule, enum_cls) in self.FIELDS.items():
+            rule = rule or (lambda s: s)
+            canonical = frozenset(e.value for e in enum_cls) if enum_cls else None
+            seeds = set(canonical or ())
+            if rule is _canonical_cloud:
+                seeds |= set(_CLOUD_ALIASES) | {v.lower() for v in _CLOUD_ALIASES}
+            elif rule is _canonical_technology:
+                seeds |= set(_TECHNOLOGY_ALIASES)
+            elif rule is _canonical_partner:
+                seeds |= set(_PARTNER_ALIASES)
+            self.rules[field] = rule
+            self.canonical[field] = canonical
+            self.tables[field] = {x: rule(x) for x in seeds}
+            self.variants[field] = Counter()
+
+    def _record(self, field, raw, count=1):
+        canonical = self.canonical[field]
+        if canonical is None or raw in canonical:
+            return
+        variants = self.variants[field]
+        with self._lock:
+            if raw in variants or len(variants) < self.MAX_VARIANTS:
+                variants[raw] += count
+            else:
+                variants['<otros>'] += count
+
+    def _resolve(self, field, stripped):
+        table = self.tables[field]
+        hit = table.get(stripped)
+        if hit is None:
+            hit = self.rules[field](stripped)
+            if len(table) < self.MAX_TABLE:
+                table[stripped] = hit
+        return hit
+
+    def normalize(self, field, value):
+        """Valor canónico de un campo (None se mantiene; no-strings se devuelven tal cual)."""
+        if not isinstance(value, str):
+            return value
+        canonical = self.canonical[field]
+        if canonical is not None and value not in canonical:
+            self._record(field, value)
+        stripped = value.strip()
+        hit = self.tables[field].get(stripped)
+        return hit if hit is not None else self._resolve(field, stripped)
+
+    def normalize_series(self, field, series: pd.Series) -> pd.Series:
+        """Versión vectorizada: resuelve cada valor distinto una vez (los nulos quedan en None)."""
+        codes, uniques = pd.factorize(series)
+        resolved = []
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques)) if len(uniques) else []
+        for raw, count in zip(uniques, counts):
+            if isinstance(raw, str):
+                self._record(field, raw, int(count))
+                resolved.append(self._resolve(field, raw.strip()))
+            else:
+                resolved.append(raw)
+        table = np.array(resolved + [None], dtype=object)
+        return pd.Series(table[codes], index=series.index, dtype=object)
+
+    def stats(self, top=20):
+        """Variantes crudas más frecuentes por campo (solo campos con Enum)."""
+        with self._lock:
+            return {
+                field: [{"raw": raw, "canonical": self._resolve(field, raw.strip()) if raw != '<otros>' else None, "count": n}
+                        for raw, n in counter.most_common(top)]
+                for field, counter in self.variants.items()
+                if self.canonical[field] is not None
             }
-            key = s.lower()
-            return aliases.get(key, s)
-
-        payload = {
-            'Company ID': data.company_id,
-            'Revenue Band': norm(data.revenue_band),
-            'Employee Band': norm(data.employee_band),
-            'Years in Business Band': norm(data.years_in_business_band),
-            'Global Region': norm(data.global_region),
-            'Industry Detail (Customer)': norm(data.industry_detail_customer),
-            'Cloud Coverage': map_cloud(data.cloud_coverage),
-            'Technology Scope': map_technology(data.technology_scope),
-            'Partner Classification': map_partner(data.partner_classification)
-        }
 
-        # Preparar DataFrame de entrada y aplicar feature engineering
-        features_df = pd.DataFrame([payload])
-        features_transformed = feature_engineering(features_df)
-
-        # (debug prints removed)
-
-        # Quitar columnas que no son usadas por el modelo
-        X = features_transformed.drop(['Relevance', 'Company ID'], axis=1, errors='ignore')
-
-        # Alinear columnas con las que el modelo espera (evita errores por nombres distintos)
-        def _get_model_feature_names(m):
-            # Intentar varios atributos/métodos que puede tener un modelo CatBoost
-            for attr in ('feature_names_', 'feature_names', 'get_feature_names'):
-                if hasattr(m, attr):
-                    val = getattr(m, attr)
-                    if callable(val):
-                        try:
-                            return list(val())
-                        except Exception:
-                            continue
-                    else:
-                        return list(val)
-            return None
-
-        expected = _get_model_feature_names(model)
-        # (debug prints removed)
-        if expected is not None and len(expected) > 0:
-            # Añadir columnas faltantes con NaN (el modelo deberá manejarlas o se pueden imputar)
-            for col in expected:
-                if col not in X.columns:
-                    X[col] = np.nan
-            # Seleccionar/ordenar solo las columnas esperadas (descartar extras)
-            X = X[expected]
+
+input_normalizer = InputNormalizer()
+
+# Campo de PredictionInput -> columna cruda que espera feature_engineering
+FIELD_TO_COLUMN = {
+    'company_id': 'Company ID',
+    'revenue_band': 'Revenue Band',
+    'employee_band': 'Employee Band',
+    'years_in_business_band': 'Years in Business Band',
+    'global_region': 'Global Region',
+    'industry_detail_customer': 'Industry Detail (Customer)',
+    'cloud_coverage': 'Cloud Coverage',
+    'technology_scope': 'Technology Scope',
+    'partner_classification': 'Partner Classification',
+}
+
+
+_PAYLOAD_FIELDS = [(f, c) for f, c in FIELD_TO_COLUMN.items() if f != 'company_id']
+
+
+def build_payload(data: PredictionInput) -> dict:
+    """Normaliza un PredictionInput al diccionario de columnas crudas que espera feature_engineering."""
+    normalize = input_normalizer.normalize
+    payload = {'Company ID': data.company_id}
+    for field, column in _PAYLOAD_FIELDS:
+        payload[column] = normalize(field, getattr(data, field))
+    return payload
+
+
+def normalize_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Versión por lotes de build_payload: acepta columnas con nombre de campo (revenue_band, ...)
+    o crudas ('Revenue Band', ...) y devuelve las columnas crudas normalizadas.
+    """
+    df = df.rename(columns={f: c for f, c in FIELD_TO_COLUMN.items() if f in df.columns})
+    out = pd.DataFrame(index=df.index)
+    for field, column in FIELD_TO_COLUMN.items():
+        if field == 'company_id':
+            if column in df.columns:
+                out[column] = df[column]
+            continue
+        if column not in df.columns:
+            out[column] = None
+            continue
+        values = df[column].astype(object).where(df[column].notna(), None)
+        out[column] = input_normalizer.normalize_series(field, values)
+    return out
+
+
+def predict_scores_cached(X, bundle=None) -> np.ndarray:
+    """
+    Como predict_scores, pero resuelve cada fila primero en la tabla de scores del bundle
+    (si tiene) y luego en prediction_cache; solo envía a CatBoost las combinaciones de
+    features que no están en ninguna de las dos (sin repetir duplicados del lote).
+    Las entradas de la caché van etiquetadas con la versión del bundle.
+    """
+    bundle = bundle or active_bundle
+    if bundle is None:
+        raise RuntimeError("El modelo no está cargado")
+    table = bundle.score_table
+    if table is None and not prediction_cache.enabled:
+        return predict_scores(X, bundle.model)
+
+    is_frame = isinstance(X, pd.DataFrame)
+    keys = list(X.itertuples(index=False, name=None)) if is_frame else [tuple(r) for r in X]
+    scores = np.empty(len(keys), dtype=float)
+    pending = {}
+    for j, key in enumerate(keys):
+        if key in pending:
+            pending[key].append(j)
+            continue
+        found = table.lookup(key) if table is not None else None
+        if found is None and prediction_cache.enabled:
+            found = prediction_cache.get((bundle.version, key))
+        if found is None:
+            pending[key] = [j]
         else:
-            # Fallback: si el modelo no expone nombres y existe una columna 'Revenue Band Mod'
-            # pero falta 'Revenue Band', renombrarla para evitar el error observado.
-            if 'Revenue Band Mod' in X.columns and 'Revenue Band' not in X.columns:
-                X = X.rename(columns={'Revenue Band Mod': 'Revenue Band'})
+            scores[j] = found
+
+    if pending:
+        first_rows = [rows[0] for rows in pending.values()]
+        X_miss = X.iloc[first_rows] if is_frame else [X[j] for j in first_rows]
+        for (key, rows), value in zip(pending.items(), predict_scores(X_miss, bundle.model)):
+            if prediction_cache.enabled:
+                prediction_cache.put((bundle.version, key), float(value))
+            scores[rows] = value
+    return scores
 
-        # (debug prints removed)
+
+@app.post("/predict")
+async def predict(data: PredictionInput):
+    """
+    Realiza una predicción usando el modelo CatBoost cargado.
+    Las features se construyen en el event loop (lookups en memoria) y la inferencia se
+    delega al micro_batcher, que la junta con otras peticiones concurrentes.
+    Toda la petición usa el bundle que estaba activo al empezar, aunque cambie a mitad.
+    """
+    bundle = active_bundle
+    if bundle is None:
+        return {"error": "El modelo no está cargado. La aplicación no se inició correctamente."}
+
+    try:
+        with metrics.timer("normalize"):
+            payload = build_payload(data)
+
+        # Features de una fila con las tablas compiladas (equivalente a feature_engineering)
+        with metrics.timer("features"):
+            features = bundle.encoder.encode_row(payload)
 
         # Regresión: devolver salida RAW del predictor
         try:
-            yhat = model.predict(X)
-            val = float(yhat[0]) if hasattr(yhat, '__iter__') else float(yhat)
-            return {"model_used": "CatBoostRegressor", "score": val}
+            if bundle.schema is not None:
+                with metrics.timer("align"):
+                    row = bundle.schema.row(features)
+                val = await micro_batcher.submit(row, bundle)
+            else:
+                with metrics.timer("align"):
+                    X = align_features(pd.DataFrame([features]), bundle.schema)
+                val = float((await run_in_threadpool(predict_scores_cached, X, bundle))[0])
+            return {"model_used": "CatBoostRegressor", "model_version": bundle.version, "score": val}
         except Exception as e_pred:
-            # Fallback: RawFormulaVal directamente
-            try:
-                raw = model.predict(X, prediction_type='RawFormulaVal')
-                val = float(raw[0]) if not isinstance(raw, np.ndarray) else float(raw[0])
-                return {"model_used": "CatBoostRegressor", "score": val}
-            except Exception:
-                return {"error": f"No se pudo obtener salida RAW: {e_pred}"}
+            metrics.inc("model_api_errors_total", endpoint="/predict", type=type(e_pred).__name__)
+            return {"error": f"No se pudo obtener salida RAW: {e_pred}"}
     except Exception as e:
+        metrics.inc("model_api_errors_total", endpoint="/predict", type=type(e).__name__)
         import traceback
         tb = traceback.format_exc()
         # Registrar la traza en logs del servidor (no se devuelve en la respuesta)
@@ -321,208 +483,292 @@ def predict(data: PredictionInput):
             pass
         return {"error": f"Error durante la predicción: {e}"}
 
-@app.get("/health")
-def health_check():
-    return {"status": "ok", "model_loaded": model is not None}
+
+# Límite de filas por llamada a /predict/batch (configurable por variable de entorno)
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "10000"))
 
 
-def feature_engineering(input_data):
+def validate_records(records: List[dict], endpoint: str):
     """
-    Aplica transformaciones de ingeniería de características a los datos de entrada.
-    Replica (de forma simplificada) el procesamiento del notebook 1_Preparación_score.ipynb
-    - Normaliza bands (Revenue / Employee / Years)
-    - Agrupa categorías (Industry, Cloud, Technology, Partner)
-    - Reusa encoders ordinales guardados en `artifacts/` si existen
+    Valida y normaliza cada registro por separado. Devuelve (resultados con 'index' y
+    'company_id' o 'error', payloads válidos, posiciones de esos payloads en el lote).
     """
-    output_data = input_data.copy()
-
-    # Helper: safe string
-    def sstr(x):
-        return None if x is None or (isinstance(x, float) and np.isnan(x)) else str(x)
-
-    # Directorio de artefactos
-    enc_dir = 'artifacts'
-    os.makedirs(enc_dir, exist_ok=True)
-
-    # ===== Revenue Band =====
-    if 'Revenue Band' in output_data.columns:
-        # Normalizar texto y extraer límite inferior
-        output_data['Revenue Band Mod'] = (
-            output_data['Revenue Band'].fillna('').astype(str)
-            .str.replace('K', '000', regex=False)
-            .str.replace('.5M', '500000', regex=False)
-            .str.replace('M', '000000', regex=False)
-            .str.replace('B', '000000000', regex=False)
-            .str.replace('$', '', regex=False)
-            .str.replace('+', '', regex=False)
-            .str.split('-').str[0]
-            .str.replace('<', '-', regex=False)
-        )
-        # Convertir a float cuando sea posible
-        output_data['Revenue Band Mod'] = pd.to_numeric(output_data['Revenue Band Mod'], errors='coerce')
-
-        rev_path = os.path.join(enc_dir, 'encoder_revenue.joblib')
-        try:
-            if os.path.exists(rev_path):
-                encoder_revenue = load(rev_path)
-            else:
-                encoder_revenue = OrdinalEncoder()
-                encoder_revenue.fit(output_data[['Revenue Band Mod']].fillna(-1).to_numpy())
-                dump(encoder_revenue, rev_path)
-        except Exception:
-            encoder_revenue = OrdinalEncoder()
-            encoder_revenue.fit(output_data[['Revenue Band Mod']].fillna(-1))
+    results: List[dict] = [{"index": i} for i in range(len(records))]
+    payloads = []
+    valid_idx = []
+    metrics.observe("model_api_batch_size", len(records), source=endpoint.strip("/").replace("/", "_"))
+    with metrics.timer("normalize"):
+        for i, record in enumerate(records):
+            try:
+                data = record if isinstance(record, PredictionInput) else PredictionInput(**record)
+                results[i]["company_id"] = data.company_id
+                payloads.append(build_payload(data))
+                valid_idx.append(i)
+            except Exception as e:
+                metrics.inc("model_api_errors_total", endpoint=endpoint, type=type(e).__name__)
+                results[i]["error"] = f"Entrada inválida: {e}"
+    return results, payloads, valid_idx
 
-        # Usar .to_numpy() para evitar verificación por nombre de columna en encoders guardados
-        arr_rev = output_data[['Revenue Band Mod']].fillna(-1).to_numpy(dtype=float)
-        try:
-            allowed_rev = set([float(x) for x in encoder_revenue.categories_[0]])
-            arr_rev = np.where(np.isin(arr_rev, list(allowed_rev)), arr_rev, -1.0)
-        except Exception:
-            pass
-        transformed_rev = encoder_revenue.transform(arr_rev)
-        output_data['Revenue Band Mod Codificado'] = transformed_rev.reshape(-1, 1) if transformed_rev.ndim == 2 else transformed_rev
-
-    # ===== Employee Band =====
-    if 'Employee Band' in output_data.columns:
-        output_data['Employee Band Mod'] = (
-            output_data['Employee Band'].fillna('').astype(str)
-            .str.replace('+', '', regex=False)
-            .str.replace(',', '', regex=False)
-            .str.split('-').str[0]
-        )
-        output_data['Employee Band Mod'] = pd.to_numeric(output_data['Employee Band Mod'], errors='coerce')
-
-        emp_path = os.path.join(enc_dir, 'encoder_employee.joblib')
-        try:
-            if os.path.exists(emp_path):
-                encoder_employee = load(emp_path)
-            else:
-                encoder_employee = OrdinalEncoder()
-                encoder_employee.fit(output_data[['Employee Band Mod']].fillna(-1).to_numpy())
-                dump(encoder_employee, emp_path)
-        except Exception:
-            encoder_employee = OrdinalEncoder()
-            encoder_employee.fit(output_data[['Employee Band Mod']].fillna(-1))
 
-        arr_emp = output_data[['Employee Band Mod']].fillna(-1).to_numpy(dtype=float)
-        try:
-            allowed_emp = set([float(x) for x in encoder_employee.categories_[0]])
-            arr_emp = np.where(np.isin(arr_emp, list(allowed_emp)), arr_emp, -1.0)
-        except Exception:
-            pass
-        transformed_emp = encoder_employee.transform(arr_emp)
-        output_data['Employee Band Mod Codificado'] = transformed_emp.reshape(-1, 1) if transformed_emp.ndim == 2 else transformed_emp
-
-    # ===== Years in Business Band =====
-    if 'Years in Business Band' in output_data.columns:
-        output_data['Years in Business Band Mod'] = (
-            output_data['Years in Business Band'].fillna('').astype(str)
-            .str.replace('+', '', regex=False)
-            .str.replace(' ', '', regex=False)
-            .str.replace('<', '', regex=False)
-            .str.split('-').str[0]
-        )
-        output_data['Years in Business Band Mod'] = pd.to_numeric(output_data['Years in Business Band Mod'], errors='coerce')
-
-        years_path = os.path.join(enc_dir, 'encoder_years.joblib')
-        try:
-            if os.path.exists(years_path):
-                encoder_years = load(years_path)
-            else:
-                encoder_years = OrdinalEncoder()
-                encoder_years.fit(output_data[['Years in Business Band Mod']].fillna(-1).to_numpy())
-                dump(encoder_years, years_path)
-        except Exception:
-            encoder_years = OrdinalEncoder()
-            encoder_years.fit(output_data[['Years in Business Band Mod']].fillna(-1))
+def score_records(records: List[dict], bundle=None) -> List[dict]:
+    """
+    Puntúa una lista de registros crudos (dicts con los campos de PredictionInput) con
+    `bundle` (por defecto, el activo al llamar).
+    - Valida y normaliza cada registro por separado: un registro inválido no tumba el lote
+    - Aplica feature_engineering y alineación de columnas una sola vez sobre todo el lote
+    - Hace una única llamada a model.predict; si falla, reintenta fila a fila para aislar errores
+    Los resultados conservan el orden de entrada.
+    """
+    bundle = bundle or active_bundle
+    if bundle is None:
+        raise RuntimeError("El modelo no está cargado")
+    results, payloads, valid_idx = validate_records(records, "/predict/batch")
+    if not payloads:
+        return results
+
+    try:
+        with metrics.timer("features"):
+            features_df = feature_engineering(pd.DataFrame(payloads), bundle.registry)
+        with metrics.timer("align"):
+            X = align_features(features_df, bundle.schema)
+        scores = predict_scores_cached(X, bundle)
+    except Exception as e_batch:
+        logger.warning("Fallo la predicción por lote (%s); reintentando fila a fila", e_batch)
+        scores = np.full(len(payloads), np.nan)
+        for j, payload in enumerate(payloads):
+            try:
+                X_row = align_features(feature_engineering(pd.DataFrame([payload]), bundle.registry), bundle.schema)
+                scores[j] = predict_scores(X_row, bundle.model)[0]
+            except Exception as e_row:
+                metrics.inc("model_api_errors_total", endpoint="/predict/batch", type=type(e_row).__name__)
+                results[valid_idx[j]]["error"] = f"Error durante la predicción: {e_row}"
+
+    for j, i in enumerate(valid_idx):
+        if "error" not in results[i]:
+            results[i]["score"] = float(scores[j])
+    return results
+
+
+@app.post("/predict/batch")
+def predict_batch(data: List[Dict[str, Any]]):
+    """
+    Predicción por lotes: recibe una lista de registros con la forma de PredictionInput
+    y devuelve un resultado por registro, en el mismo orden, con 'score' o 'error'.
+    """
+    bundle = active_bundle
+    if bundle is None:
+        return {"error": "El modelo no está cargado. La aplicación no se inició correctamente."}
+    if len(data) > MAX_BATCH_SIZE:
+        return {"error": f"El lote tiene {len(data)} registros; el máximo permitido es {MAX_BATCH_SIZE}."}
+
+    try:
+        results = score_records(data, bundle)
+    except Exception as e:
+        logger.exception("Error durante /predict/batch")
+        return {"error": f"Error durante la predicción por lote: {e}"}
+
+    n_errors = sum(1 for r in results if "error" in r)
+    return {
+        "model_used": "CatBoostRegressor",
+        "model_version": bundle.version,
+        "count": len(results),
+        "errors": n_errors,
+        "results": results,
+    }
+
+# Límite de filas por llamada a /predict/explain/batch (SHAP es mucho más caro que predict)
+MAX_EXPLAIN_BATCH_SIZE = int(os.getenv("MAX_EXPLAIN_BATCH_SIZE", "1000"))
+
+
+@app.post("/predict/explain")
+def predict_explain(data: PredictionInput):
+    """
+    Score y contribución de cada feature (valores SHAP de CatBoost) para una empresa:
+    score = expected_value + suma de las contribuciones.
+    """
+    bundle = active_bundle
+    if bundle is None:
+        return {"error": "El modelo no está cargado. La aplicación no se inició correctamente."}
+    try:
+        with metrics.timer("normalize"):
+            payload = build_payload(data)
+        with metrics.timer("features"):
+            features = bundle.encoder.encode_row(payload)
+        with metrics.timer("align"):
+            X = align_features(pd.DataFrame([features]), bundle.schema)
+        values = explain_scores(X, bundle)
+        score = predict_scores_cached(X, bundle)[0]
+        return {
+            "model_used": "CatBoostRegressor",
+            "model_version": bundle.version,
+            "company_id": data.company_id,
+            **explanation_result(X.iloc[0].tolist(), values[0], score, bundle.schema.feature_names),
+        }
+    except Exception as e:
+        metrics.inc("model_api_errors_total", endpoint="/predict/explain", type=type(e).__name__)
+        logger.exception("Error durante /predict/explain")
+        return {"error": f"Error durante la explicación: {e}"}
+
+
+def explain_records(records: List[dict], bundle=None) -> List[dict]:
+    """
+    Como score_records, pero cada resultado trae además las contribuciones de sus features.
+    Si falla la llamada por lote a ShapValues, reintenta fila a fila: la fila que falla
+    recibe 'error' y el resto del lote se explica igual.
+    """
+    bundle = bundle or active_bundle
+    if bundle is None:
+        raise RuntimeError("El modelo no está cargado")
+    results, payloads, valid_idx = validate_records(records, "/predict/explain/batch")
+    if not payloads:
+        return results
+    names = bundle.schema.feature_names if bundle.schema is not None else None
 
-        arr_years = output_data[['Years in Business Band Mod']].fillna(-1).to_numpy(dtype=float)
+    try:
+        with metrics.timer("features"):
+            features_df = feature_engineering(pd.DataFrame(payloads), bundle.registry)
+        with metrics.timer("align"):
+            X = align_features(features_df, bundle.schema)
+        values = explain_scores(X, bundle)
+        scores = predict_scores_cached(X, bundle)
+    except Exception as e_batch:
+        logger.warning("Fallo la explicación por lote (%s); reintentando fila a fila", e_batch)
+        for i, payload in zip(valid_idx, payloads):
+            try:
+                X_row = align_features(feature_engineering(pd.DataFrame([payload]), bundle.registry), bundle.schema)
+                row_values = explain_scores(X_row, bundle)[0]
+                row_score = predict_scores_cached(X_row, bundle)[0]
+            except Exception as e_row:
+                metrics.inc("model_api_errors_total", endpoint="/predict/explain/batch", type=type(e_row).__name__)
+                results[i]["error"] = f"Error durante la explicación: {e_row}"
+                continue
+            results[i].update(explanation_result(X_row.iloc[0].tolist(), row_values, row_score, names))
+        return results
+
+    for j, (i, features) in enumerate(zip(valid_idx, X.itertuples(index=False, name=None))):
+        results[i].update(explanation_result(features, values[j], scores[j], names))
+    return results
+
+
+@app.post("/predict/explain/batch")
+def predict_explain_batch(data: List[Dict[str, Any]]):
+    """Explicaciones por lotes: un resultado por registro, en orden, con contribuciones o 'error'."""
+    bundle = active_bundle
+    if bundle is None:
+        return {"error": "El modelo no está cargado. La aplicación no se inició correctamente."}
+    if len(data) > MAX_EXPLAIN_BATCH_SIZE:
+        return {"error": f"El lote tiene {len(data)} registros; el máximo permitido es {MAX_EXPLAIN_BATCH_SIZE}."}
+    try:
+        results = explain_records(data, bundle)
+    except Exception as e:
+        metrics.inc("model_api_errors_total", endpoint="/predict/explain/batch", type=type(e).__name__)
+        logger.exception("Error durante /predict/explain/batch")
+        return {"error": f"Error durante la explicación por lote: {e}"}
+    return {
+        "model_used": "CatBoostRegressor",
+        "model_version": bundle.version,
+        "count": len(results),
+        "errors": sum(1 for r in results if "error" in r),
+        "results": results,
+    }
+
+
+@app.get("/model/schema")
+def model_schema_info():
+    """Columnas que espera el modelo, en orden; permite a los clientes enviar datos ya alineados."""
+    bundle = active_bundle
+    if bundle is None or bundle.schema is None:
+        return {"error": "El modelo no está cargado o no expone nombres de features."}
+    return {"model_version": bundle.version, "model_path": bundle.model_path, **bundle.schema.to_dict()}
+
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """Métricas del proceso en formato de texto de Prometheus."""
+    cache = prediction_cache.stats()
+    explanations = explanation_cache.stats()
+    gauges = {
+        "model_api_prediction_cache_hits_total": ("counter", "Aciertos de la caché de predicciones", cache["hits"]),
+        "model_api_prediction_cache_misses_total": ("counter", "Fallos de la caché de predicciones", cache["misses"]),
+        "model_api_prediction_cache_evictions_total": ("counter", "Desalojos LRU de la caché de predicciones", cache["evictions"]),
+        "model_api_prediction_cache_size": ("gauge", "Entradas en la caché de predicciones", cache["size"]),
+        "model_api_explanation_cache_hits_total": ("counter", "Aciertos de la caché de explicaciones", explanations["hits"]),
+        "model_api_explanation_cache_misses_total": ("counter", "Fallos de la caché de explicaciones", explanations["misses"]),
+        "model_api_explanation_cache_size": ("gauge", "Entradas en la caché de explicaciones", explanations["size"]),
+        "model_api_model_loaded": ("gauge", "1 si el modelo está cargado", int(model is not None)),
+        "model_api_ready": ("gauge", "1 si el proceso terminó de arrancar y tiene modelo", int(startup.ready)),
+        "model_api_startup_seconds": ("gauge", "Segundos desde el import de app.py hasta quedar listo", startup.total_seconds() or 0.0),
+        "model_api_model_activations_total": ("counter", "Versiones del modelo activadas desde el arranque", len(model_registry.history)),
+    }
+    return PlainTextResponse(metrics.render(gauges), media_type="text/plain; version=0.0.4")
+
+
+def require_admin(token: Optional[str]):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Endpoints de administración deshabilitados (falta ADMIN_TOKEN)")
+    if token is None or not hmac.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="X-Admin-Token inválido")
+
+
+@app.get("/admin/models")
+def list_models(x_admin_token: Optional[str] = Header(None)):
+    """Versión activa, versiones publicadas en el repositorio y estado de la carga en curso."""
+    require_admin(x_admin_token)
+    return model_registry.info()
+
+
+@app.post("/admin/models/{version}/activate")
+async def activate_model(version: str, wait: bool = False, x_admin_token: Optional[str] = Header(None)):
+    """
+    Carga, calienta y activa una versión publicada sin cortar el servicio.
+    Por defecto responde 202 y carga en segundo plano (seguir el estado en /admin/models);
+    con wait=true responde cuando la versión ya está activa o falló.
+    """
+    require_admin(x_admin_token)
+    if version not in model_registry.versions() and version != DEFAULT_VERSION:
+        raise HTTPException(status_code=404, detail=f"No existe la versión {version}")
+    if wait:
         try:
-            allowed_years = set([float(x) for x in encoder_years.categories_[0]])
-            arr_years = np.where(np.isin(arr_years, list(allowed_years)), arr_years, -1.0)
-        except Exception:
-            pass
-        transformed_years = encoder_years.transform(arr_years)
-        output_data['Years in Business Band Mod Codificado'] = transformed_years.reshape(-1, 1) if transformed_years.ndim == 2 else transformed_years
-
-    # ===== Industry grouping =====
-    if 'Industry Detail (Customer)' in output_data.columns:
-        def map_industry(code):
-            if pd.isna(code) or code == 'None':
-                return np.nan
-            code = str(code).strip().upper()
-            if code.startswith('B'):
-                return 'Finanzas'
-            if code.startswith('C'):
-                return 'Salud'
-            if code.startswith('D'):
-                return 'Energia'
-            if code.startswith('E'):
-                return 'Manufactura'
-            if code.startswith('F'):
-                return 'Servicios'
-            if code.startswith('G'):
-                return 'Sector_publico'
-            return 'Otros'
-        output_data['Industry_agrupado'] = output_data['Industry Detail (Customer)'].apply(map_industry)
-
-    # ===== Cloud Coverage grouping =====
-    if 'Cloud Coverage' in output_data.columns:
-        output_data['Cloud_agrupado'] = output_data['Cloud Coverage'].apply(lambda x: 'Publico' if sstr(x) in ['Iaas', 'SaaS', 'PaaS'] else 'Otros')
-
-    # ===== Technology grouping =====
-    if 'Technology Scope' in output_data.columns:
-        infraestructura = ['Mobility', 'IoT', 'Cloud']
-        inteligencia = ['Big Data and Analytics', 'AI', 'Robotics']
-        usuario = ['AR/VR', '3D Printing', 'Social']
-        seguridad = ['Security', 'Blockchain']
-        def map_tech(scope):
-            if pd.isna(scope) or scope == 'None':
-                return np.nan
-            s = str(scope).strip()
-            if s in infraestructura:
-                return 'Infraestructura'
-            if s in inteligencia:
-                return 'Inteligencia'
-            if s in usuario:
-                return 'Usuario'
-            if s in seguridad:
-                return 'Seguridad'
-            return 'Otros'
-        output_data['Technology_agrupado'] = output_data['Technology Scope'].apply(map_tech)
-
-    # ===== Partner grouping =====
-    if 'Partner Classification' in output_data.columns:
-        desarrollador = ['Independent Software Vendor (ISV)']
-        integrador = ['Regional System Integrator (RSI)', 'Global Systems Integrator (GSI)']
-        proveedor = ['Cloud Service Provider (CSP)', 'Managed Service Provider (MSP)']
-        revendedor = ['Direct Market Reseller (DMR)', 'Value Added Reseller (VAR)', 'Distributor']
-        def map_partner(p):
-            if pd.isna(p) or p == 'None':
-                return np.nan
-            s = str(p).strip()
-            if s in desarrollador:
-                return 'Desarrollador'
-            if s in integrador:
-                return 'Integrador'
-            if s in proveedor:
-                return 'Proveedor'
-            if s in revendedor:
-                return 'Revendedor'
-            return 'Otros'
-        output_data['Partner_agrupado'] = output_data['Partner Classification'].apply(map_partner)
-
-    # ===== Imputaciones =====
-    ordinales = ['Revenue Band Mod Codificado', 'Employee Band Mod Codificado', 'Years in Business Band Mod Codificado']
-    for col in ordinales:
-        if col in output_data.columns:
-            med = output_data[col].median()
-            output_data[col] = output_data[col].fillna(med)
-
-    categoricas = ['Global Region', 'Industry_agrupado', 'Cloud_agrupado', 'Technology_agrupado', 'Partner_agrupado']
-    for col in categoricas:
-        if col in output_data.columns:
-            output_data[col] = output_data[col].fillna('Otros')
-
-    return output_data
\ No newline at end of file
+            bundle = await run_in_threadpool(model_registry.load, version)
+        except Exception as e:
+            return {"error": f"No se pudo activar la versión {version}: {e}"}
+        return {"status": "active", "model": bundle.info()}
+    if not model_registry.load_async(version):
+        raise HTTPException(status_code=409, detail=f"Ya hay una carga en curso ({model_registry.loading})")
+    return JSONResponse(status_code=202, content={"status": "loading", "version": version})
+
+
+@app.get("/normalizer/variants")
+def normalizer_variants(top: int = 20):
+    """Valores crudos que no llegaron en forma canónica, por campo y frecuencia."""
+    return input_normalizer.stats(top)
+
+
+@app.get("/ready")
+def readiness_check():
+    """Probe de readiness: 200 cuando el modelo está cargado y calentado, 503 mientras no."""
+    report = startup.report()
+    if not startup.ready or active_bundle is None:
+        return JSONResponse(status_code=503, content=report)
+    return report
+
+
+@app.get("/health")
+def health_check():
+    """Probe de liveness: el proceso responde (no implica que el modelo esté cargado)."""
+    return {
+        "status": "ok",
+        "ready": startup.ready,
+        "model_loaded": model is not None,
+        "model_version": active_bundle.version if active_bundle is not None else None,
+        "model_loading": model_registry.loading,
+        "encoders_loaded": encoder_registry.loaded,
+        "prediction_cache": prediction_cache.stats(),
+        "explanation_cache": explanation_cache.stats(),
+        "score_table_rows": score_table.info()["rows"] if score_table is not None else None,
+        "micro_batcher": micro_batcher.stats(),
+        "pid": os.getpid(),
+    }
+
+
+startup.phases["import"] = round(time.perf_counter() - _MODULE_STARTED, 4)
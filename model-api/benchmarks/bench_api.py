@@ -0,0 +1,234 @@
+"""benchmarks/bench_api.py
+
+Benchmark reproducible del camino de predicción de la API.
+
+Uso:
+    python benchmarks/bench_api.py --out bench_before.json
+    # ... cambio de rendimiento ...
+    python benchmarks/bench_api.py --out bench_after.json --compare bench_before.json
+
+Carga `catboost_best_model.cbm` y los encoders de `artifacts/` igual que el lifespan y mide,
+con entradas sintéticas generadas a partir de los Enums declarados en app.py:
+ - feature_engineering (pandas) por fila y sobre un lote
+ - CompiledFeatureEncoder.encode_row por fila
+ - /predict de una fila, vía cliente ASGI en proceso (sin red)
+ - /predict/batch con varios tamaños de lote
+ - /predict concurrente (--concurrency peticiones en vuelo)
+
+Por defecto desactiva la caché de predicciones y la tabla de scores para medir el modelo;
+--with-cache las deja activas. Los resultados se escriben en JSON; con --compare se marca
+como regresión cualquier métrica que empeore más de --threshold (por defecto 20 %).
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import httpx
+import pandas as pd
+
+import app as model_app
+
+
+def synthetic_records(n, seed=0):
+    """Registros de entrada aleatorios (y reproducibles) a partir de los Enums de app.py."""
+    rng = random.Random(seed)
+    regions = ['Americas', 'EMEA', 'APJ']
+    industries = ['B1. Banking', 'C2. Healthcare', 'D1. Energy', 'E6. Consumer Goods', 'F1. Retail', 'G1. Government', 'H1. Other']
+    return [
+        {
+            'company_id': i,
+            'revenue_band': rng.choice(list(model_app.RevenueBandEnum)).value,
+            'employee_band': rng.choice(list(model_app.EmployeeBandEnum)).value,
+            'years_in_business_band': rng.choice(list(model_app.YearsInBusinessEnum)).value,
+            'global_region': rng.choice(regions),
+            'industry_detail_customer': rng.choice(industries),
+            'cloud_coverage': rng.choice(list(model_app.CloudCoverageEnum)).value,
+            'technology_scope': rng.choice(list(model_app.TechnologyScopeEnum)).value,
+            'partner_classification': rng.choice(list(model_app.PartnerClassificationEnum)).value,
+        }
+        for i in range(n)
+    ]
+
+
+def summarize(samples, rows_per_sample=1):
+    """Estadísticos de una lista de duraciones en segundos."""
+    ordered = sorted(samples)
+
+    def pct(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    total = sum(samples)
+    return {
+        'n': len(samples),
+        'mean_ms': round(statistics.fmean(samples) * 1e3, 4),
+        'p50_ms': round(pct(0.50) * 1e3, 4),
+        'p95_ms': round(pct(0.95) * 1e3, 4),
+        'p99_ms': round(pct(0.99) * 1e3, 4),
+        'rows_per_s': round(len(samples) * rows_per_sample / total, 1) if total else None,
+    }
+
+
+def time_calls(fn, args_list, rows_per_call=1):
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples, rows_per_call)
+
+
+def bench_feature_engineering(records, batch_size):
+    payloads = [model_app.build_payload(model_app.PredictionInput(**r)) for r in records]
+    single = time_calls(lambda p: model_app.feature_engineering(pd.DataFrame([p])), [(p,) for p in payloads[:200]])
+    batch = time_calls(
+        lambda chunk: model_app.feature_engineering(pd.DataFrame(chunk)),
+        [(payloads[i:i + batch_size],) for i in range(0, len(payloads) - batch_size + 1, batch_size)][:10] or [(payloads,)],
+        rows_per_call=min(batch_size, len(payloads)),
+    )
+    compiled = time_calls(model_app.feature_encoder.encode_row, [(p,) for p in payloads])
+    return {
+        'feature_engineering_single': single,
+        f'feature_engineering_batch_{batch_size}': batch,
+        'compiled_encode_row': compiled,
+    }
+
+
+async def bench_http(records, batch_sizes, concurrency):
+    results = {}
+    await model_app.micro_batcher.start()
+    transport = httpx.ASGITransport(app=model_app.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            # Calentamiento
+            for r in records[:20]:
+                await client.post('/predict', json=r)
+
+            samples = []
+            for r in records[:500]:
+                start = time.perf_counter()
+                resp = await client.post('/predict', json=r)
+                samples.append(time.perf_counter() - start)
+                assert 'score' in resp.json(), resp.text
+            results['predict_single'] = summarize(samples)
+
+            for size in batch_sizes:
+                chunk = (records * (size // len(records) + 1))[:size]
+                samples = []
+                for _ in range(5):
+                    start = time.perf_counter()
+                    resp = await client.post('/predict/batch', json=chunk)
+                    samples.append(time.perf_counter() - start)
+                    assert resp.json().get('errors') == 0, resp.text[:500]
+                results[f'predict_batch_{size}'] = summarize(samples, rows_per_sample=size)
+
+            async def one(r):
+                start = time.perf_counter()
+                resp = await client.post('/predict', json=r)
+                assert 'score' in resp.json(), resp.text
+                return time.perf_counter() - start
+
+            wall = time.perf_counter()
+            samples = []
+            pending = records[:2000]
+            for i in range(0, len(pending), concurrency):
+                samples.extend(await asyncio.gather(*[one(r) for r in pending[i:i + concurrency]]))
+            wall = time.perf_counter() - wall
+            conc = summarize(samples)
+            conc['concurrency'] = concurrency
+            conc['rows_per_s'] = round(len(samples) / wall, 1)
+            results[f'predict_concurrent_{concurrency}'] = conc
+    finally:
+        await model_app.micro_batcher.stop()
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except Exception:
+        commit = None
+    import catboost
+    import numpy
+    return {
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'pandas': pd.__version__,
+        'numpy': numpy.__version__,
+        'catboost': catboost.__version__,
+    }
+
+
+def compare(current, baseline, threshold):
+    """Lista de regresiones: p50 que sube o throughput que baja más de threshold."""
+    regressions = []
+    for name, cur in current.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if base.get('p50_ms') and cur['p50_ms'] > base['p50_ms'] * (1 + threshold):
+            regressions.append(f"{name}: p50 {base['p50_ms']} ms -> {cur['p50_ms']} ms")
+        if base.get('rows_per_s') and cur.get('rows_per_s') and cur['rows_per_s'] < base['rows_per_s'] * (1 - threshold):
+            regressions.append(f"{name}: {base['rows_per_s']} filas/s -> {cur['rows_per_s']} filas/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del camino de predicción de la API')
+    parser.add_argument('--rows', type=int, default=2000, help='Registros sintéticos a generar')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[100, 1000])
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--with-cache', action='store_true', help='Mantener caché de predicciones y tabla de scores')
+    parser.add_argument('--out', default=None, help='Archivo JSON de salida')
+    parser.add_argument('--compare', default=None, help='JSON de una corrida anterior para detectar regresiones')
+    parser.add_argument('--threshold', type=float, default=0.20)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    model_app.load_artifacts()
+    if model_app.model is None:
+        print('Error: no se pudo cargar el modelo')
+        sys.exit(1)
+    if not args.with_cache:
+        model_app.prediction_cache.max_size = 0
+        model_app.active_bundle.score_table = None
+
+    records = synthetic_records(args.rows, args.seed)
+    results = bench_feature_engineering(records, max(args.batch_sizes))
+    results.update(asyncio.run(bench_http(records, args.batch_sizes, args.concurrency)))
+
+    report = {'environment': environment(), 'config': vars(args), 'results': results}
+    for name, r in results.items():
+        print(f"{name:<32} p50={r['p50_ms']:>9} ms  p95={r['p95_ms']:>9} ms  filas/s={r['rows_per_s']}")
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f'Resultados guardados en {args.out}')
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print(f'REGRESIÓN {line}')
+        if regressions:
+            sys.exit(2)
+        print('Sin regresiones respecto a', args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""benchmarks/bench_backends.py
+
+Compara los backends de inferencia de la API: CatBoost (.cbm) y LiteModel (solo NumPy).
+
+Uso:
+    python benchmarks/bench_backends.py --out bench_backends.json
+    python benchmarks/bench_backends.py --lite artifacts/model_lite.npz --rows 20000
+
+Cada backend se mide en un proceso nuevo, para que la memoria y el tiempo de carga no se
+mezclen: memoria residente (RSS) tras importar app.py y tras cargar y calentar el bundle,
+segundos de carga, y latencia de predict_scores con filas ya codificadas (una fila y
+lotes de lista como los del micro-batcher, y DataFrames como los de /predict/batch).
+También reporta la diferencia máxima entre los scores de ambos backends.
+Si no existe el export lite, lo genera en un directorio temporal con scripts/export_lite_model.py.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def rss_mb():
+    """Memoria residente actual del proceso en MB (Linux); None si no se puede leer."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        return None
+
+
+def run_child(backend, lite_path, rows, repeat, seed):
+    """Mide un backend dentro de este proceso y devuelve el reporte (más los scores para comparar)."""
+    import pandas as pd
+    import app as model_app
+    from bench_api import summarize, synthetic_records
+
+    report = {'backend': backend, 'rss_after_import_mb': rss_mb()}
+    os.chdir(ROOT)
+    start = time.perf_counter()
+    bundle = model_app.ModelBundle(
+        backend, model_app.MODEL_PATH, model_app.ENCODER_DIR, None, lite_path, backend=backend,
+    ).load()
+    bundle.warm_up()
+    report['load_seconds'] = round(time.perf_counter() - start, 4)
+    report['timings'] = bundle.timings
+    report['rss_after_load_mb'] = rss_mb()
+
+    payloads = [model_app.build_payload(model_app.PredictionInput(**r)) for r in synthetic_records(rows, seed)]
+    lists = [bundle.schema.row(bundle.encoder.encode_row(p)) for p in payloads]
+    frame = bundle.schema.align(pd.DataFrame([bundle.encoder.encode_row(p) for p in payloads]))
+
+    def timed(fn, calls, rows_per_call):
+        samples = []
+        for args in calls:
+            t0 = time.perf_counter()
+            fn(*args)
+            samples.append(time.perf_counter() - t0)
+        return summarize(samples, rows_per_call)
+
+    score = lambda X: model_app.predict_scores(X, bundle.model)
+    latency = {'single_row': timed(score, [([row],) for row in lists[:repeat]], 1)}
+    for size in (64, 1000):
+        chunks = [(lists[i:i + size],) for i in range(0, len(lists) - size + 1, size)][:repeat] or [(lists,)]
+        latency[f'list_{size}'] = timed(score, chunks, min(size, len(lists)))
+    latency[f'dataframe_{len(frame)}'] = timed(score, [(frame,)] * 5, len(frame))
+    report['latency'] = latency
+    report['rss_peak_mb'] = rss_mb()
+    report['scores'] = [float(v) for v in score(frame)]
+    return report
+
+
+def ensure_lite(lite_path):
+    if lite_path and os.path.exists(lite_path):
+        return lite_path
+    out = tempfile.mkdtemp(prefix='model_lite_')
+    subprocess.run(
+        [sys.executable, os.path.join(ROOT, 'scripts', 'export_lite_model.py'), '--out', out, '--check-rows', '20000'],
+        check=True, cwd=ROOT,
+    )
+    return os.path.join(out, 'model_lite.npz')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Latencia y memoria de los backends de inferencia')
+    parser.add_argument('--lite', default=os.path.join(ROOT, 'artifacts', 'model_lite.npz'), help='Export de scripts/export_lite_model.py')
+    parser.add_argument('--rows', type=int, default=10000, help='Filas sintéticas')
+    parser.add_argument('--repeat', type=int, default=200, help='Llamadas por medición')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default=None, help='Archivo JSON de salida')
+    parser.add_argument('--child', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        print(json.dumps(run_child(args.child, args.lite, args.rows, args.repeat, args.seed)))
+        return
+
+    lite_path = ensure_lite(args.lite)
+    reports = {}
+    for backend in ('catboost', 'lite'):
+        cmd = [sys.executable, os.path.abspath(__file__), '--child', backend, '--lite', lite_path,
+               '--rows', str(args.rows), '--repeat', str(args.repeat), '--seed', str(args.seed)]
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True, cwd=ROOT).stdout
+        reports[backend] = json.loads(out.strip().splitlines()[-1])
+
+    scores = {name: reports[name].pop('scores') for name in reports}
+    max_diff = max(abs(a - b) for a, b in zip(scores['catboost'], scores['lite']))
+    for name, r in reports.items():
+        print(f"{name}: carga {r['load_seconds']}s, RSS import {r['rss_after_import_mb']} MB -> cargado {r['rss_after_load_mb']} MB (pico {r['rss_peak_mb']} MB)")
+        for case, m in r['latency'].items():
+            print(f"  {case:<18} p50={m['p50_ms']:>9} ms  p95={m['p95_ms']:>9} ms  filas/s={m['rows_per_s']}")
+    print(f"Diferencia máxima de score entre backends: {max_diff:.3g}")
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump({'config': vars(args), 'max_abs_diff': max_diff, 'results': reports}, f, indent=2)
+        print(f'Resultados guardados en {args.out}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""benchmarks/bench_workers.py
+
+Mide cómo escala el throughput de /predict con el número de workers de gunicorn.
+
+Uso:
+    python benchmarks/bench_workers.py --workers 1 2 4 --clients 8 --duration 10 --out bench_workers.json
+
+Para cada número de workers levanta `gunicorn -c gunicorn.conf.py app:app` en un puerto
+local, espera a /health y lanza `--clients` procesos cliente que envían peticiones con
+keep-alive durante `--duration` segundos. Por defecto desactiva la caché de predicciones
+y la tabla de scores para medir el camino que realmente usa CatBoost.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import subprocess
+import http.client
+import multiprocessing
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+REVENUE = ["<$100K", "$100K-$499K", "$1M-$2.49M", "$10M-$24.9M", "$1B-$4.9B", "$25B+"]
+EMPLOYEE = ["1-10", "11-50", "51-200", "201-500", "1001-5000", "5001+"]
+YEARS = ["<1", "1-2", "3-5", "6-10", "11-20", "21+"]
+REGIONS = ["Americas", "EMEA", "APJ"]
+INDUSTRY = ["B1. Banking", "C2. Healthcare", "E6. Consumer Goods", "F1. Retail", "G1. Government"]
+CLOUD = ["Iaas", "SaaS", "PaaS", "Other"]
+TECH = ["Cloud", "AI", "Security", "Social", "-"]
+PARTNER = ["Independent Software Vendor (ISV)", "Distributor", "Managed Service Provider (MSP)", "-"]
+
+
+def random_payload(rng):
+    return {
+        "company_id": rng.randint(1, 10**8),
+        "revenue_band": rng.choice(REVENUE),
+        "employee_band": rng.choice(EMPLOYEE),
+        "years_in_business_band": rng.choice(YEARS),
+        "global_region": rng.choice(REGIONS),
+        "industry_detail_customer": rng.choice(INDUSTRY),
+        "cloud_coverage": rng.choice(CLOUD),
+        "technology_scope": rng.choice(TECH),
+        "partner_classification": rng.choice(PARTNER),
+    }
+
+
+def _client(port, duration, seed, out_queue):
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    headers = {"Content-Type": "application/json"}
+    done = errors = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        conn.request("POST", "/predict", body=json.dumps(random_payload(rng)), headers=headers)
+        resp = conn.getresponse()
+        body = resp.read()
+        if resp.status != 200 or b'"error"' in body:
+            errors += 1
+        done += 1
+    conn.close()
+    out_queue.put((done, errors))
+
+
+def _wait_ready(port, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/health")
+            if json.loads(conn.getresponse().read()).get("model_loaded"):
+                return True
+        except Exception:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def run(workers, clients, duration, port, keep_cache):
+    env = dict(os.environ, MODEL_API_WORKERS=str(workers), MODEL_API_BIND=f"127.0.0.1:{port}")
+    if not keep_cache:
+        env.update(PREDICTION_CACHE_SIZE="0", USE_SCORE_TABLE="0")
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        if not _wait_ready(port):
+            raise RuntimeError(f"El servidor con {workers} workers no arrancó")
+        startup = time.perf_counter() - started
+        queue = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=_client, args=(port, duration, seed, queue)) for seed in range(clients)]
+        for p in procs:
+            p.start()
+        totals = [queue.get() for _ in procs]
+        for p in procs:
+            p.join()
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    requests = sum(t[0] for t in totals)
+    return {
+        "workers": workers,
+        "clients": clients,
+        "duration_s": duration,
+        "startup_s": round(startup, 3),
+        "requests": requests,
+        "errors": sum(t[1] for t in totals),
+        "throughput_rps": round(requests / duration, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput de /predict vs número de workers")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=8, help="Procesos cliente concurrentes")
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos de carga por configuración")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--keep-cache", action="store_true", help="No desactivar caché ni tabla de scores")
+    parser.add_argument("--out", default=None, help="Archivo JSON de salida")
+    args = parser.parse_args()
+
+    results = []
+    for w in args.workers:
+        r = run(w, args.clients, args.duration, args.port, args.keep_cache)
+        print(f"workers={r['workers']:>2}  {r['throughput_rps']:>8} req/s  errores={r['errors']}  arranque={r['startup_s']}s")
+        results.append(r)
+    base = results[0]["throughput_rps"] or 1.0
+    for r in results:
+        r["speedup"] = round(r["throughput_rps"] / base, 2)
+
+    report = {"cpu_count": multiprocessing.cpu_count(), "results": results}
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Resultados guardados en {args.out}")
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
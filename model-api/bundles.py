@@ -0,0 +1,374 @@
+"""bundles.py
+
+Versiones del modelo (bundle = modelo + encoders + tabla de scores): ModelBundle carga y
+calienta una versión, ModelRegistry las busca en el repositorio de modelos y las activa sin
+cortar el servicio, y activate_bundle publica la activa. También están el esquema de entrada
+del modelo y la llamada de inferencia que comparten todos los endpoints.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+import features
+from features import ENCODER_DIR, CompiledFeatureEncoder, EncoderRegistry, feature_engineering, synthetic_payloads
+from lite_model import LiteModel
+from metrics import metrics
+from score_table import ScoreTable
+
+logger = logging.getLogger("model_api")
+
+MODEL_PATH = "catboost_best_model.cbm"
+SCORE_TABLE_PATH = os.getenv("SCORE_TABLE_PATH", os.path.join(ENCODER_DIR, "score_table.npy"))
+# USE_SCORE_TABLE=0 fuerza el modelo en vivo aunque exista la tabla
+USE_SCORE_TABLE = os.getenv("USE_SCORE_TABLE", "1") == "1"
+# Backend de inferencia: "catboost" (modelo .cbm) o "lite" (LiteModel, ver scripts/export_lite_model.py)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "catboost")
+LITE_MODEL_FILE = "model_lite.npz"
+LITE_MODEL_PATH = os.getenv("LITE_MODEL_PATH", os.path.join(ENCODER_DIR, LITE_MODEL_FILE))
+
+# Hilos que usa CatBoost en cada predict (-1 = todos los núcleos). Con varios workers
+# conviene 1 por worker para no sobresuscribir la CPU (gunicorn.conf.py lo ajusta).
+PREDICT_THREAD_COUNT = int(os.getenv("PREDICT_THREAD_COUNT", "-1"))
+
+
+# --- Versiones del modelo (bundle = modelo + encoders + tabla de scores) ---
+# Repositorio de versiones: un subdirectorio por versión con el .cbm, los tres encoders de
+# scripts/save_encoders.py y, opcionalmente, score_table.npy/.json (ver scripts/publish_model.py)
+MODEL_REPOSITORY = os.getenv("MODEL_REPOSITORY", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models"))
+# Versión a cargar al arrancar; sin valor se usa la más reciente del repositorio o, si está
+# vacío, el bundle "default" (MODEL_PATH + ENCODER_DIR + SCORE_TABLE_PATH)
+MODEL_VERSION = os.getenv("MODEL_VERSION")
+DEFAULT_VERSION = "default"
+BUNDLE_MODEL_FILE = os.path.basename(MODEL_PATH)
+# Segundos entre revisiones del repositorio en busca de versiones nuevas (0 = sin vigilancia)
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "0"))
+
+
+def get_model_feature_names(m):
+    """Nombres de features del modelo, probando los atributos/métodos que puede exponer CatBoost."""
+    for attr in ('feature_names_', 'feature_names', 'get_feature_names'):
+        if hasattr(m, attr):
+            val = getattr(m, attr)
+            if callable(val):
+                try:
+                    return list(val())
+                except Exception:
+                    continue
+            else:
+                return list(val)
+    return None
+
+
+class ModelSchema:
+    """
+    Esquema de entrada del modelo, resuelto una sola vez al cargarlo.
+    Hace de plan de alineación: un único reindex para DataFrames y una lista
+    ordenada de columnas para filas sueltas.
+    """
+
+    def __init__(self, feature_names, cat_features=None):
+        self.feature_names = list(feature_names)
+        self.cat_features = list(cat_features or [])
+
+    @classmethod
+    def from_model(cls, m):
+        """Devuelve el esquema del modelo, o None si no expone nombres de features."""
+        names = get_model_feature_names(m)
+        if not names:
+            return None
+        try:
+            cat_idx = list(m.get_cat_feature_indices())
+        except Exception:
+            cat_idx = []
+        return cls(names, [names[i] for i in cat_idx])
+
+    def align(self, X: pd.DataFrame) -> pd.DataFrame:
+        """Ordena las columnas esperadas, añade las faltantes como NaN y descarta el resto."""
+        if list(X.columns) == self.feature_names:
+            return X
+        return X.reindex(columns=self.feature_names)
+
+    def row(self, features: dict) -> list:
+        """Fila en el orden del modelo a partir de un dict de features (faltantes -> NaN)."""
+        return [features.get(col, np.nan) for col in self.feature_names]
+
+    def to_dict(self):
+        return {
+            "feature_names": self.feature_names,
+            "cat_features": self.cat_features,
+            "numeric_features": [c for c in self.feature_names if c not in self.cat_features],
+        }
+
+
+def align_features(features_transformed: pd.DataFrame, schema=None) -> pd.DataFrame:
+    """Deja solo las columnas que usa el modelo (por defecto, el del bundle activo), en el orden en que las espera."""
+    if schema is None and active_bundle is not None:
+        schema = active_bundle.schema
+    if schema is not None:
+        return schema.align(features_transformed)
+
+    # Quitar columnas que no son usadas por el modelo
+    X = features_transformed.drop(['Relevance', 'Company ID'], axis=1, errors='ignore')
+    # Fallback: si el modelo no expone nombres y existe una columna 'Revenue Band Mod'
+    # pero falta 'Revenue Band', renombrarla para evitar el error observado.
+    if 'Revenue Band Mod' in X.columns and 'Revenue Band' not in X.columns:
+        X = X.rename(columns={'Revenue Band Mod': 'Revenue Band'})
+    return X
+
+
+def predict_scores(X, estimator=None) -> np.ndarray:
+    """
+    Devuelve la salida RAW del regresor para todas las filas de X (DataFrame o lista de filas ya alineadas).
+    `estimator` por defecto es el modelo del bundle activo.
+    """
+    if estimator is None:
+        estimator = active_bundle.model if active_bundle is not None else None
+    metrics.observe("model_api_batch_size", len(X), source="model_predict")
+    with metrics.timer("predict"):
+        try:
+            yhat = estimator.predict(X, thread_count=PREDICT_THREAD_COUNT)
+        except Exception:
+            # Fallback: RawFormulaVal directamente
+            yhat = estimator.predict(X, prediction_type='RawFormulaVal', thread_count=PREDICT_THREAD_COUNT)
+    return np.asarray(yhat, dtype=float).reshape(-1)
+
+
+class ModelBundle:
+    """
+    Una versión del modelo con todo lo que necesita para servir: el regresor, su esquema,
+    sus encoders (EncoderRegistry propio), el CompiledFeatureEncoder construido con ellos
+    y la tabla de scores si existe y corresponde a ese modelo. No se modifica una vez
+    activado: cada petición toma el bundle activo al empezar y lo usa hasta responder.
+    """
+
+    def __init__(self, version, model_path, encoder_dir, score_table_path=None, lite_model_path=None, backend=None):
+        self.version = version
+        self.model_path = model_path
+        self.encoder_dir = encoder_dir
+        self.score_table_path = score_table_path
+        self.lite_model_path = lite_model_path
+        self.backend = backend or INFERENCE_BACKEND
+        self.model = None
+        self.schema = None
+        self.registry = EncoderRegistry()
+        self.encoder = CompiledFeatureEncoder(self.registry)
+        self.score_table = None
+        self.loaded_at = None
+        # Segundos por fase de carga: model, encoders, compile, score_table, warmup
+        self.timings = {}
+
+    @contextmanager
+    def _timed(self, phase):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[phase] = round(time.perf_counter() - started, 4)
+
+    def load(self):
+        """Carga modelo y encoders; falla si falta alguno. La tabla de scores es opcional."""
+        with self._timed("model"):
+            if self.backend == "lite":
+                if not self.lite_model_path or not os.path.exists(self.lite_model_path):
+                    raise FileNotFoundError(
+                        f"No se encontró {self.lite_model_path}. Genéralo con scripts/export_lite_model.py"
+                    )
+                model = LiteModel.load(self.lite_model_path, self.model_path)
+            else:
+                from catboost import CatBoostRegressor
+                # Cargar como regresor (salida continua 0-1)
+                model = CatBoostRegressor()
+                model.load_model(self.model_path)
+            self.schema = ModelSchema.from_model(model)
+        with self._timed("encoders"):
+            self.registry.load(self.encoder_dir)
+        with self._timed("compile"):
+            self.encoder.compile()
+        self.model = model
+        if USE_SCORE_TABLE and self.schema is not None and self.score_table_path and os.path.exists(self.score_table_path):
+            with self._timed("score_table"):
+                try:
+                    self.score_table = ScoreTable.load(self.score_table_path, self.model_path, self.schema.feature_names)
+                    logger.info(f"Tabla de scores cargada desde: {self.score_table_path} ({self.score_table.info()['rows']} filas)")
+                except Exception as e:
+                    self.score_table = None
+                    logger.error(f"No se usará la tabla de scores: {e}")
+        self.loaded_at = time.time()
+        return self
+
+    def warm_up(self, n=64):
+        """
+        Pasa un lote sintético por los caminos que usan las peticiones antes de activar el
+        bundle: feature_engineering sobre un DataFrame (/predict/batch), el encoder compilado
+        y una fila suelta (/predict), y CatBoost con ambos tipos de entrada. Así la primera
+        petición real no paga la inicialización de pandas ni la primera llamada de CatBoost.
+        Rechaza modelos que esperan columnas que la API no genera o que devuelven valores no finitos.
+        """
+        with self._timed("warmup"):
+            payloads = synthetic_payloads(n)
+            features = [self.encoder.encode_row(p) for p in payloads]
+            if self.schema is not None:
+                missing = [col for col in self.schema.feature_names if col not in features[0]]
+                if missing:
+                    raise ValueError(f"El modelo {self.version} espera columnas que la API no genera: {missing}")
+            X = align_features(feature_engineering(pd.DataFrame(payloads), self.registry), self.schema)
+            scores = predict_scores(X, self.model)
+            if len(scores) != n or not np.isfinite(scores).all():
+                raise ValueError(f"El modelo {self.version} devolvió scores inválidos en el calentamiento")
+            if self.schema is not None:
+                predict_scores([self.schema.row(features[0])], self.model)
+
+    def info(self):
+        return {
+            "version": self.version,
+            "backend": self.backend,
+            "model_path": self.model_path,
+            "encoder_dir": self.encoder_dir,
+            "score_table_rows": self.score_table.info()["rows"] if self.score_table is not None else None,
+            "loaded_at": self.loaded_at,
+            "timings": dict(self.timings),
+        }
+
+
+active_bundle = None
+_activation_hooks = []
+
+
+def on_activate(hook):
+    """Registra hook(bundle), que corre en cada activación justo antes del cambio (también sirve de decorador)."""
+    _activation_hooks.append(hook)
+    return hook
+
+
+def activate_bundle(bundle):
+    """
+    Cambia el bundle activo. Las peticiones leen `active_bundle` una sola vez, así que el
+    cambio es atómico para ellas. Antes corren los hooks de on_activate: app.py vacía ahí
+    sus cachés y actualiza los globales (model, model_schema, ...) que mantiene por
+    compatibilidad con los scripts que los usan.
+    """
+    global active_bundle
+    features.use_registry(bundle.registry)
+    for hook in _activation_hooks:
+        hook(bundle)
+    active_bundle = bundle
+
+
+class ModelRegistry:
+    """
+    Versiones publicadas en el repositorio de modelos y carga de la activa.
+    Una versión nueva se carga y se calienta en un hilo aparte mientras la anterior sigue
+    sirviendo; solo si todo sale bien se activa. Nunca hay dos cargas a la vez.
+    """
+
+    def __init__(self, repository=MODEL_REPOSITORY):
+        self.repository = repository
+        self.loading = None
+        self.failed = {}
+        self.history = deque(maxlen=20)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._watcher = None
+        self._stop = threading.Event()
+        self._seen = set()
+
+    def versions(self):
+        """Versiones publicadas (subdirectorios con un modelo), en orden de nombre."""
+        try:
+            names = sorted(os.listdir(self.repository))
+        except OSError:
+            return []
+        return [
+            name for name in names
+            if not name.startswith('.') and os.path.isfile(os.path.join(self.repository, name, BUNDLE_MODEL_FILE))
+        ]
+
+    def initial_version(self):
+        if MODEL_VERSION:
+            return MODEL_VERSION
+        versions = self.versions()
+        return versions[-1] if versions else DEFAULT_VERSION
+
+    def bundle_for(self, version):
+        if version == DEFAULT_VERSION and version not in self.versions():
+            return ModelBundle(DEFAULT_VERSION, MODEL_PATH, ENCODER_DIR, SCORE_TABLE_PATH, LITE_MODEL_PATH)
+        if version not in self.versions():
+            raise FileNotFoundError(f"No existe la versión {version} en {self.repository}")
+        path = os.path.join(self.repository, version)
+        return ModelBundle(
+            version, os.path.join(path, BUNDLE_MODEL_FILE), path,
+            os.path.join(path, "score_table.npy"), os.path.join(path, LITE_MODEL_FILE),
+        )
+
+    def load(self, version):
+        """Carga, calienta y activa `version`. Bloquea hasta terminar; devuelve el bundle activado."""
+        with self._lock:
+            self.loading = version
+            try:
+                bundle = self.bundle_for(version).load()
+                bundle.warm_up()
+                activate_bundle(bundle)
+            except Exception as e:
+                self.failed[version] = str(e)
+                logger.error(f"No se pudo activar la versión {version} del modelo: {e}")
+                raise
+            finally:
+                self.loading = None
+            self.failed.pop(version, None)
+            self.history.append({"version": version, "activated_at": time.time()})
+            logger.info(f"Versión {version} del modelo activa desde: {bundle.model_path} (tiempos: {bundle.timings})")
+            return bundle
+
+    def load_async(self, version):
+        """Lanza load(version) en un hilo. Devuelve False si ya hay una carga en curso."""
+        if self._thread is not None and self._thread.is_alive():
+            return False
+        self._thread = threading.Thread(target=self._load_quietly, args=(version,), name=f"model-load-{version}", daemon=True)
+        self._thread.start()
+        return True
+
+    def _load_quietly(self, version):
+        try:
+            self.load(version)
+        except Exception:
+            pass  # ya quedó registrado en self.failed y en el log
+
+    def start_watching(self, interval):
+        """Revisa el repositorio cada `interval` segundos y activa la versión nueva más reciente."""
+        if interval <= 0 or (self._watcher is not None and self._watcher.is_alive()):
+            return
+        self._seen = set(self.versions())
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="model-watch", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+
+    def _watch(self, interval):
+        while not self._stop.wait(interval):
+            # Solo reacciona a versiones que aparecen: un rollback manual no se deshace solo
+            new = [v for v in self.versions() if v not in self._seen]
+            if new and self.load_async(new[-1]):
+                self._seen.update(new)
+
+    def info(self):
+        return {
+            "repository": self.repository,
+            "active": active_bundle.info() if active_bundle is not None else None,
+            "available": self.versions(),
+            "loading": self.loading,
+            "failed": dict(self.failed),
+            "history": list(self.history),
+            "watching": self._watcher is not None and self._watcher.is_alive(),
+        }
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,73 @@
+"""explain.py
+
+Contribuciones SHAP de CatBoost por feature (los endpoints /predict/explain de app.py),
+memorizadas por vector de features.
+"""
+
+import os
+
+import numpy as np
+
+import bundles
+from bundles import PREDICT_THREAD_COUNT
+from metrics import metrics
+from prediction_cache import PredictionCache
+
+# Contribuciones SHAP por vector de features (ver explain_scores); EXPLAIN_CACHE_SIZE=0 la desactiva
+explanation_cache = PredictionCache(
+    max_size=int(os.getenv("EXPLAIN_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("EXPLAIN_CACHE_TTL", "0")),
+)
+
+
+def explain_scores(X, bundle=None) -> np.ndarray:
+    """
+    Contribuciones SHAP (ShapValues de CatBoost) de cada feature para cada fila de X, con el
+    valor esperado del modelo en la última columna (la suma de la fila es el score RAW).
+    Como el espacio de features es finito, se memorizan en explanation_cache por vector de
+    features ya codificado y solo las combinaciones nuevas (sin repetir) van a CatBoost,
+    todas en una única llamada.
+    """
+    bundle = bundle or bundles.active_bundle
+    if bundle is None or bundle.schema is None:
+        raise RuntimeError("El modelo no está cargado o no expone nombres de features")
+    if not hasattr(bundle.model, "get_feature_importance"):
+        raise RuntimeError(f"El backend '{bundle.backend}' no calcula explicaciones; usa INFERENCE_BACKEND=catboost")
+    keys = list(X.itertuples(index=False, name=None))
+    values = np.empty((len(keys), len(bundle.schema.feature_names) + 1), dtype=float)
+    pending = {}
+    for j, key in enumerate(keys):
+        if key in pending:
+            pending[key].append(j)
+            continue
+        found = explanation_cache.get((bundle.version, key)) if explanation_cache.enabled else None
+        if found is None:
+            pending[key] = [j]
+        else:
+            values[j] = found
+
+    if pending:
+        from catboost import Pool
+        X_miss = X.iloc[[rows[0] for rows in pending.values()]]
+        metrics.observe("model_api_batch_size", len(X_miss), source="model_explain")
+        with metrics.timer("explain"):
+            shap = bundle.model.get_feature_importance(
+                Pool(X_miss, cat_features=bundle.schema.cat_features),
+                type="ShapValues",
+                thread_count=PREDICT_THREAD_COUNT,
+            )
+        for (key, rows), row in zip(pending.items(), shap):
+            if explanation_cache.enabled:
+                explanation_cache.put((bundle.version, key), row)
+            values[rows] = row
+    return values
+
+
+def explanation_result(features, values, score, feature_names) -> dict:
+    """Score, valor esperado y contribuciones de una fila, de mayor a menor impacto."""
+    contributions = [
+        {"feature": name, "value": value.item() if hasattr(value, "item") else value, "contribution": float(c)}
+        for name, value, c in zip(feature_names, features, values[:-1])
+    ]
+    contributions.sort(key=lambda c: abs(c["contribution"]), reverse=True)
+    return {"score": float(score), "expected_value": float(values[-1]), "contributions": contributions}
@@ -0,0 +1,477 @@
+"""features.py
+
+Ingeniería de features del modelo: los valores conocidos de cada campo (Enums), los encoders
+ordinales (EncoderRegistry), las tablas de agrupación, feature_engineering (la ruta por lotes,
+con pandas) y CompiledFeatureEncoder (la ruta de una fila, sin pandas).
+"""
+
+import logging
+import os
+from enum import Enum
+
+import numpy as np
+import pandas as pd
+
+# sklearn (vía joblib) se importa al cargar los encoders del primer bundle, no al importar
+try:
+    from joblib import load
+except Exception:
+    import pickle
+    def load(path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+logger = logging.getLogger("model_api")
+
+
+class RevenueBandEnum(str, Enum):
+    less_100K = "<$100K"
+    _100k_499k = "$100K-$499K"
+    _500k_999k = "$500K-$999K"
+    _1m_2_49m = "$1M-$2.49M"
+    _2_5m_4_9m = "$2.5M-$4.9M"
+    _5m_9_9m = "$5M-$9.9M"
+    _10m_24_9m = "$10M-$24.9M"
+    _25m_49m = "$25M-$49M"
+    _50m_99m = "$50M-$99M"
+    _100m_499m = "$100M-$499M"
+    _500m_999m = "$500M-$999M"
+    _1b_4_9b = "$1B-$4.9B"
+    _5b_9_9b = "$5B-$9.9B"
+    _10b_24_9b = "$10B-$24.9B"
+    _25b_plus = "$25B+"
+
+
+class CloudCoverageEnum(str, Enum):
+    Iaas = "Iaas"
+    SaaS = "SaaS"
+    PaaS = "PaaS"
+    Other = "Other"
+
+
+class TechnologyScopeEnum(str, Enum):
+    Mobility = "Mobility"
+    IoT = "IoT"
+    Cloud = "Cloud"
+    BigDataAndAnalytics = "Big Data and Analytics"
+    AI = "AI"
+    Robotics = "Robotics"
+    AR_VR = "AR/VR"
+    ThreeD_Printing = "3D Printing"
+    Social = "Social"
+    Security = "Security"
+    Blockchain = "Blockchain"
+    Other = "-"
+
+
+class PartnerClassificationEnum(str, Enum):
+    ISV = "Independent Software Vendor (ISV)"
+    RSI = "Regional System Integrator (RSI)"
+    GSI = "Global Systems Integrator (GSI)"
+    CSP = "Cloud Service Provider (CSP)"
+    MSP = "Managed Service Provider (MSP)"
+    DMR = "Direct Market Reseller (DMR)"
+    VAR = "Value Added Reseller (VAR)"
+    Distributor = "Distributor"
+    Other = "-"
+
+
+class IndustryAgrpEnum(str, Enum):
+    Finanzas = "Finanzas"
+    Salud = "Salud"
+    Energia = "Energia"
+    Manufactura = "Manufactura"
+    Servicios = "Servicios"
+    Sector_publico = "Sector_publico"
+    Otros = "Otros"
+
+
+# Enums adicionales solicitados: Employee Band y Years in Business Band
+class EmployeeBandEnum(str, Enum):
+    _1_10 = "1-10"
+    _11_50 = "11-50"
+    _51_200 = "51-200"
+    _201_500 = "201-500"
+    _501_1000 = "501-1000"
+    _1001_5000 = "1001-5000"
+    _5001_plus = "5001+"
+
+
+class YearsInBusinessEnum(str, Enum):
+    less_1 = "<1"
+    _1_2 = "1-2"
+    _3_5 = "3-5"
+    _6_10 = "6-10"
+    _11_20 = "11-20"
+    _21_plus = "21+"
+
+
+# Encoders ordinales (generados con scripts/save_encoders.py)
+ENCODER_DIR = os.getenv("ENCODER_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "artifacts"))
+ENCODER_FILES = {
+    'revenue': 'encoder_revenue.joblib',
+    'employee': 'encoder_employee.joblib',
+    'years': 'encoder_years.joblib',
+}
+
+
+class EncoderRegistry:
+    """
+    Mantiene en memoria los OrdinalEncoders y sus categorías permitidas.
+    Se llena una vez (en el lifespan) y feature_engineering solo lee de aquí:
+    en el camino de la petición no se toca el disco ni se ajustan encoders nuevos.
+    """
+
+    def __init__(self):
+        self.encoders = {}
+        self.allowed = {}
+        self.enc_dir = None
+
+    @property
+    def loaded(self):
+        return self.enc_dir is not None
+
+    def load(self, enc_dir=ENCODER_DIR):
+        """Carga los tres encoders desde enc_dir. Falla si falta alguno."""
+        encoders = {}
+        allowed = {}
+        for name, file_name in ENCODER_FILES.items():
+            path = os.path.join(enc_dir, file_name)
+            if not os.path.exists(path):
+                raise FileNotFoundError(
+                    f"No se encontró {path}. Genera los encoders con scripts/save_encoders.py"
+                )
+            encoder = load(path)
+            encoders[name] = encoder
+            allowed[name] = np.asarray(encoder.categories_[0], dtype=float)
+        # Reemplazo completo para que un lector nunca vea un estado a medias
+        self.encoders, self.allowed, self.enc_dir = encoders, allowed, enc_dir
+        logger.info(f"Encoders ordinales cargados desde: {enc_dir}")
+
+    def get(self, name):
+        """Devuelve (encoder, categorías permitidas). Carga perezosa si nadie llamó a load()."""
+        if not self.loaded:
+            self.load()
+        return self.encoders[name], self.allowed[name]
+
+
+encoder_registry = EncoderRegistry()
+
+
+def use_registry(registry):
+    """Cambia el registry por defecto de feature_engineering (bundles.activate_bundle pone el del bundle activo)."""
+    global encoder_registry
+    encoder_registry = registry
+
+
+# Tablas de agrupación (las usan feature_engineering y CompiledFeatureEncoder)
+INDUSTRY_PREFIX_GROUPS = {
+    'B': 'Finanzas',
+    'C': 'Salud',
+    'D': 'Energia',
+    'E': 'Manufactura',
+    'F': 'Servicios',
+    'G': 'Sector_publico',
+}
+CLOUD_PUBLIC = frozenset(['Iaas', 'SaaS', 'PaaS'])
+TECHNOLOGY_GROUPS = {
+    'Mobility': 'Infraestructura', 'IoT': 'Infraestructura', 'Cloud': 'Infraestructura',
+    'Big Data and Analytics': 'Inteligencia', 'AI': 'Inteligencia', 'Robotics': 'Inteligencia',
+    'AR/VR': 'Usuario', '3D Printing': 'Usuario', 'Social': 'Usuario',
+    'Security': 'Seguridad', 'Blockchain': 'Seguridad',
+}
+PARTNER_GROUPS = {
+    'Independent Software Vendor (ISV)': 'Desarrollador',
+    'Regional System Integrator (RSI)': 'Integrador',
+    'Global Systems Integrator (GSI)': 'Integrador',
+    'Cloud Service Provider (CSP)': 'Proveedor',
+    'Managed Service Provider (MSP)': 'Proveedor',
+    'Direct Market Reseller (DMR)': 'Revendedor',
+    'Value Added Reseller (VAR)': 'Revendedor',
+    'Distributor': 'Revendedor',
+}
+
+# Columna cruda -> (nombre en el registry, columna codificada, enum con los valores conocidos)
+BAND_COLUMNS = {
+    'Revenue Band': ('revenue', 'Revenue Band Mod Codificado', RevenueBandEnum),
+    'Employee Band': ('employee', 'Employee Band Mod Codificado', EmployeeBandEnum),
+    'Years in Business Band': ('years', 'Years in Business Band Mod Codificado', YearsInBusinessEnum),
+}
+
+
+def _missing(x):
+    return x is None or (isinstance(x, float) and np.isnan(x))
+
+
+def group_industry(code):
+    if _missing(code) or code == 'None':
+        return 'Otros'
+    code = str(code).strip().upper()
+    return INDUSTRY_PREFIX_GROUPS.get(code[:1], 'Otros')
+
+
+def group_cloud(x):
+    return 'Publico' if not _missing(x) and str(x) in CLOUD_PUBLIC else 'Otros'
+
+
+def group_technology(scope):
+    if _missing(scope) or scope == 'None':
+        return 'Otros'
+    return TECHNOLOGY_GROUPS.get(str(scope).strip(), 'Otros')
+
+
+def group_partner(p):
+    if _missing(p) or p == 'None':
+        return 'Otros'
+    return PARTNER_GROUPS.get(str(p).strip(), 'Otros')
+
+
+def _group_series(series, group_fn):
+    """
+    Aplica group_fn de forma vectorizada: factoriza la serie, resuelve cada valor distinto
+    una sola vez y expande con los códigos. Los nulos quedan como NaN (luego se imputan 'Otros').
+    """
+    codes, uniques = pd.factorize(series)
+    table = np.array([group_fn(u) for u in uniques] + [np.nan], dtype=object)
+    return pd.Series(table[codes], index=series.index)
+
+
+def _band_number(text):
+    """pd.to_numeric(errors='coerce') de un texto suelto: NaN si no es un número ASCII."""
+    if not text.isascii() or '_' in text:
+        return np.nan
+    try:
+        return float(text)
+    except ValueError:
+        return np.nan
+
+
+def parse_revenue_band(raw):
+    """Límite inferior de un Revenue Band, con las mismas reglas que feature_engineering."""
+    text = '' if _missing(raw) else str(raw)
+    for old, new in (('K', '000'), ('.5M', '500000'), ('M', '000000'), ('B', '000000000'), ('$', ''), ('+', '')):
+        text = text.replace(old, new)
+    return _band_number(text.split('-')[0].replace('<', '-'))
+
+
+def parse_employee_band(raw):
+    text = '' if _missing(raw) else str(raw)
+    return _band_number(text.replace('+', '').replace(',', '').split('-')[0])
+
+
+def parse_years_band(raw):
+    text = '' if _missing(raw) else str(raw)
+    return _band_number(text.replace('+', '').replace(' ', '').replace('<', '').split('-')[0])
+
+
+BAND_PARSERS = {
+    'Revenue Band': parse_revenue_band,
+    'Employee Band': parse_employee_band,
+    'Years in Business Band': parse_years_band,
+}
+
+
+class CompiledFeatureEncoder:
+    """
+    Construye las features de una fila sin pandas: cada band se resuelve con un dict
+    texto crudo -> código ordinal, compilado al arrancar a partir de los encoders del
+    registry y de los valores de los Enums. Un valor que no está en la tabla se parsea
+    con BAND_PARSERS (las reglas de feature_engineering, en Python puro) y su código sale
+    del encoder compilado por límite inferior; no se vuelve a pasar por pandas.
+    """
+
+    # Tope de entradas por tabla: los valores desconocidos se memorizan hasta este límite
+    MAX_CODES = 1024
+
+    def __init__(self, registry=None):
+        self.registry = registry or encoder_registry
+        self.codes = {}
+        self.bounds = {}
+        self.compiled = False
+
+    def _reference_codes(self, column, values):
+        """Códigos que produce feature_engineering para `values` en la columna `column`."""
+        out = feature_engineering(pd.DataFrame({column: list(values)}), self.registry)
+        return [float(v) for v in out[BAND_COLUMNS[column][1]]]
+
+    def _bound_codes(self, column):
+        """{límite inferior permitido -> código}, más el código de "desconocido" (clave -1)."""
+        encoder, allowed = self.registry.get(BAND_COLUMNS[column][0])
+        values = np.append(allowed, -1.0).reshape(-1, 1)
+        values = np.where(np.isin(values, allowed), values, -1.0)
+        return dict(zip(values.ravel().tolist(), np.asarray(encoder.transform(values), dtype=float).ravel().tolist()))
+
+    def compile(self):
+        codes = {}
+        bounds = {}
+        for column, (_, _, enum_cls) in BAND_COLUMNS.items():
+            values = [None, ''] + [e.value for e in enum_cls]
+            codes[column] = dict(zip(values, self._reference_codes(column, values)))
+            bounds[column] = self._bound_codes(column)
+        self.codes, self.bounds = codes, bounds
+        self.compiled = True
+        logger.info("Tablas de codificación de bands compiladas")
+
+    def band_code(self, column, raw):
+        if not self.compiled:
+            self.compile()
+        table = self.codes[column]
+        try:
+            return table[raw]
+        except KeyError:
+            pass
+        bounds = self.bounds[column]
+        code = bounds.get(BAND_PARSERS[column](raw), bounds[-1.0])
+        if len(table) < self.MAX_CODES:
+            table[raw] = code
+        return code
+
+    def encode_row(self, payload: dict) -> dict:
+        """Devuelve las columnas de features del modelo para un payload de build_payload()."""
+        region = payload.get('Global Region')
+        return {
+            'Revenue Band Mod Codificado': self.band_code('Revenue Band', payload.get('Revenue Band')),
+            'Employee Band Mod Codificado': self.band_code('Employee Band', payload.get('Employee Band')),
+            'Years in Business Band Mod Codificado': self.band_code('Years in Business Band', payload.get('Years in Business Band')),
+            'Global Region': 'Otros' if _missing(region) else region,
+            'Industry_agrupado': group_industry(payload.get('Industry Detail (Customer)')),
+            'Cloud_agrupado': group_cloud(payload.get('Cloud Coverage')),
+            'Technology_agrupado': group_technology(payload.get('Technology Scope')),
+            'Partner_agrupado': group_partner(payload.get('Partner Classification')),
+        }
+
+
+feature_encoder = CompiledFeatureEncoder()
+
+
+# Regiones conocidas en entrenamiento (df_location_filtered) más la imputación 'Otros'
+DEFAULT_REGIONS = ['Americas', 'EMEA', 'APJ', 'Otros']
+
+
+def default_feature_domains(registry=None, regions=None):
+    """
+    Dominio de cada feature del modelo después de feature_engineering:
+    códigos ordinales posibles de cada encoder y grupos posibles de cada categórica.
+    """
+    registry = registry or encoder_registry
+    domains = {}
+    for _, (name, coded_col, _) in BAND_COLUMNS.items():
+        _, allowed = registry.get(name)
+        domains[coded_col] = [float(i) for i in range(len(allowed))]
+    domains['Global Region'] = list(regions or DEFAULT_REGIONS)
+    domains['Industry_agrupado'] = list(dict.fromkeys(INDUSTRY_PREFIX_GROUPS.values())) + ['Otros']
+    domains['Cloud_agrupado'] = ['Publico', 'Otros']
+    domains['Technology_agrupado'] = list(dict.fromkeys(TECHNOLOGY_GROUPS.values())) + ['Otros']
+    domains['Partner_agrupado'] = list(dict.fromkeys(PARTNER_GROUPS.values())) + ['Otros']
+    return domains
+
+
+def synthetic_payloads(n=64):
+    """Payloads (con la forma de build_payload) que recorren los valores conocidos; sirven para calentar un bundle."""
+    columns = {
+        'Revenue Band': [e.value for e in RevenueBandEnum],
+        'Employee Band': [e.value for e in EmployeeBandEnum],
+        'Years in Business Band': [e.value for e in YearsInBusinessEnum],
+        'Global Region': DEFAULT_REGIONS,
+        'Industry Detail (Customer)': [f'{prefix}1' for prefix in INDUSTRY_PREFIX_GROUPS] + [None],
+        'Cloud Coverage': [e.value for e in CloudCoverageEnum],
+        'Technology Scope': [e.value for e in TechnologyScopeEnum],
+        'Partner Classification': [e.value for e in PartnerClassificationEnum],
+    }
+    return [{col: values[i % len(values)] for col, values in columns.items()} for i in range(n)]
+
+
+def feature_engineering(input_data, registry=None):
+    """
+    Aplica transformaciones de ingeniería de características a los datos de entrada.
+    Replica (de forma simplificada) el procesamiento del notebook 1_Preparación_score.ipynb
+    - Normaliza bands (Revenue / Employee / Years)
+    - Agrupa categorías (Industry, Cloud, Technology, Partner)
+    - Usa los encoders ordinales de `registry` (por defecto, los del bundle activo)
+    """
+    registry = registry or encoder_registry
+    output_data = input_data.copy()
+
+    # ===== Revenue Band =====
+    if 'Revenue Band' in output_data.columns:
+        # Normalizar texto y extraer límite inferior
+        output_data['Revenue Band Mod'] = (
+            output_data['Revenue Band'].fillna('').astype(str)
+            .str.replace('K', '000', regex=False)
+            .str.replace('.5M', '500000', regex=False)
+            .str.replace('M', '000000', regex=False)
+            .str.replace('B', '000000000', regex=False)
+            .str.replace('$', '', regex=False)
+            .str.replace('+', '', regex=False)
+            .str.split('-').str[0]
+            .str.replace('<', '-', regex=False)
+        )
+        # Convertir a float cuando sea posible
+        output_data['Revenue Band Mod'] = pd.to_numeric(output_data['Revenue Band Mod'], errors='coerce')
+
+        encoder_revenue, allowed_rev = registry.get('revenue')
+        arr_rev = output_data[['Revenue Band Mod']].fillna(-1).to_numpy(dtype=float)
+        arr_rev = np.where(np.isin(arr_rev, allowed_rev), arr_rev, -1.0)
+        transformed_rev = encoder_revenue.transform(arr_rev)
+        output_data['Revenue Band Mod Codificado'] = transformed_rev.reshape(-1, 1) if transformed_rev.ndim == 2 else transformed_rev
+
+    # ===== Employee Band =====
+    if 'Employee Band' in output_data.columns:
+        output_data['Employee Band Mod'] = (
+            output_data['Employee Band'].fillna('').astype(str)
+            .str.replace('+', '', regex=False)
+            .str.replace(',', '', regex=False)
+            .str.split('-').str[0]
+        )
+        output_data['Employee Band Mod'] = pd.to_numeric(output_data['Employee Band Mod'], errors='coerce')
+
+        encoder_employee, allowed_emp = registry.get('employee')
+        arr_emp = output_data[['Employee Band Mod']].fillna(-1).to_numpy(dtype=float)
+        arr_emp = np.where(np.isin(arr_emp, allowed_emp), arr_emp, -1.0)
+        transformed_emp = encoder_employee.transform(arr_emp)
+        output_data['Employee Band Mod Codificado'] = transformed_emp.reshape(-1, 1) if transformed_emp.ndim == 2 else transformed_emp
+
+    # ===== Years in Business Band =====
+    if 'Years in Business Band' in output_data.columns:
+        output_data['Years in Business Band Mod'] = (
+            output_data['Years in Business Band'].fillna('').astype(str)
+            .str.replace('+', '', regex=False)
+            .str.replace(' ', '', regex=False)
+            .str.replace('<', '', regex=False)
+            .str.split('-').str[0]
+        )
+        output_data['Years in Business Band Mod'] = pd.to_numeric(output_data['Years in Business Band Mod'], errors='coerce')
+
+        encoder_years, allowed_years = registry.get('years')
+        arr_years = output_data[['Years in Business Band Mod']].fillna(-1).to_numpy(dtype=float)
+        arr_years = np.where(np.isin(arr_years, allowed_years), arr_years, -1.0)
+        transformed_years = encoder_years.transform(arr_years)
+        output_data['Years in Business Band Mod Codificado'] = transformed_years.reshape(-1, 1) if transformed_years.ndim == 2 else transformed_years
+
+    # ===== Agrupaciones (Industry, Cloud, Technology, Partner) =====
+    # Tablas categoría -> grupo a nivel de módulo; cada valor distinto se resuelve una vez
+    if 'Industry Detail (Customer)' in output_data.columns:
+        output_data['Industry_agrupado'] = _group_series(output_data['Industry Detail (Customer)'], group_industry)
+
+    if 'Cloud Coverage' in output_data.columns:
+        output_data['Cloud_agrupado'] = np.where(output_data['Cloud Coverage'].isin(list(CLOUD_PUBLIC)), 'Publico', 'Otros')
+
+    if 'Technology Scope' in output_data.columns:
+        output_data['Technology_agrupado'] = _group_series(output_data['Technology Scope'], group_technology)
+
+    if 'Partner Classification' in output_data.columns:
+        output_data['Partner_agrupado'] = _group_series(output_data['Partner Classification'], group_partner)
+
+    # ===== Imputaciones =====
+    ordinales = ['Revenue Band Mod Codificado', 'Employee Band Mod Codificado', 'Years in Business Band Mod Codificado']
+    for col in ordinales:
+        if col in output_data.columns:
+            med = output_data[col].median()
+            output_data[col] = output_data[col].fillna(med)
+
+    categoricas = ['Global Region', 'Industry_agrupado', 'Cloud_agrupado', 'Technology_agrupado', 'Partner_agrupado']
+    for col in categoricas:
+        if col in output_data.columns:
+            output_data[col] = output_data[col].fillna('Otros')
+
+    return output_data
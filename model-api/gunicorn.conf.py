@@ -0,0 +1,31 @@
+"""gunicorn.conf.py
+
+Servidor multi-worker para la API:
+    gunicorn -c gunicorn.conf.py app:app
+
+- preload_app: el proceso maestro importa app.py y carga modelo, encoders y tabla de
+  scores UNA vez (when_ready); después hace fork de los workers, que comparten esas
+  páginas por copy-on-write en lugar de tener cada uno su copia. La tabla de scores es
+  un memmap, así que además se comparte vía page cache.
+- Número de workers: MODEL_API_WORKERS (por defecto, un worker por núcleo).
+- Cada worker usa 1 hilo de CatBoost por predict salvo que se fije PREDICT_THREAD_COUNT.
+"""
+
+import multiprocessing
+import os
+
+workers = int(os.getenv("MODEL_API_WORKERS", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = os.getenv("MODEL_API_BIND", "0.0.0.0:80")
+preload_app = True
+timeout = int(os.getenv("MODEL_API_TIMEOUT", "60"))
+
+# Debe fijarse antes de que preload_app importe app.py
+os.environ.setdefault("PREDICT_THREAD_COUNT", "1" if workers > 1 else "-1")
+
+
+def when_ready(server):
+    """Corre en el maestro tras importar la app y antes de crear los workers."""
+    import app as model_app
+    model_app.load_artifacts()
+    server.log.info(f"Artefactos precargados en el maestro (pid {os.getpid()}); lanzando {workers} workers")
@@ -0,0 +1,162 @@
+"""lite_model.py
+
+Backend de inferencia solo con NumPy (INFERENCE_BACKEND=lite), exportado desde el modelo
+CatBoost con scripts/export_lite_model.py.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from score_table import file_sha256
+
+
+class LiteModel:
+    """
+    Motor de inferencia sin catboost, generado con scripts/export_lite_model.py a partir del
+    export JSON del modelo. Cada split binario de los árboles (umbral numérico, one-hot o CTR)
+    viene como una tabla de bits indexada por los códigos de las features de las que depende
+    (la categoría de cada categórica, más un código para "no vista", y el tramo de cada numérica).
+
+    Al cargar se compila: los splits se agrupan por las features de las que dependen y, para
+    cada grupo, se precalcula cuánto aporta al índice de hoja de cada árbol cada combinación de
+    códigos del grupo. Puntuar una fila es entonces sumar una fila de tabla por grupo (el índice
+    de hoja de los 500 árboles) y sumar los valores de esas hojas, todo con NumPy.
+    Expone feature_names_, get_cat_feature_indices() y predict() como CatBoostRegressor.
+    """
+
+    # Filas por bloque al evaluar: acota la memoria de las matrices (filas x árboles)
+    CHUNK_ROWS = 4096
+    # Combinaciones máximas por grupo al fusionar grupos pequeños (filas de su tabla)
+    MAX_GROUP_ROWS = 4096
+
+    def __init__(self, meta, arrays):
+        self.meta = meta
+        self.feature_names_ = list(meta['feature_names'])
+        self.cat_features = list(meta['cat_features'])
+        self.position = {name: i for i, name in enumerate(self.feature_names_)}
+        self.cat_index = {name: {v: i for i, v in enumerate(meta['domains'][name])} for name in self.cat_features}
+        self.cat_domains = {name: pd.Index(meta['domains'][name]) for name in self.cat_features}
+        axes = meta['axes']
+
+        # Código fino por feature: categoría (o "no vista") o tramo respecto a todos sus bordes
+        borders = {}
+        for axis in axes:
+            if axis['kind'] == 'bucket':
+                borders.setdefault(axis['feature'], set()).update(axis['borders'])
+        self.fine_borders = {name: np.array(sorted(b)) for name, b in borders.items()}
+        self.features = [n for n in self.feature_names_ if n in self.cat_index or n in self.fine_borders]
+        size = {n: len(self.cat_index[n]) + 1 if n in self.cat_index else len(self.fine_borders[n]) + 1 for n in self.features}
+        # Código del eje para cada código fino de su feature
+        axis_lut = []
+        for axis in axes:
+            if axis['kind'] == 'cat':
+                axis_lut.append(np.arange(size[axis['feature']]))
+            else:
+                fine = self.fine_borders[axis['feature']]
+                axis_lut.append(np.searchsorted(np.asarray(axis['borders'], dtype=float), np.r_[fine, np.inf], side='left'))
+
+        split_axes, split_strides = arrays['split_axes'], arrays['split_strides']
+        tree_splits = arrays['tree_splits']
+        n_trees = tree_splits.shape[0]
+        uses = {}
+        for t in range(n_trees):
+            for d, split in enumerate(tree_splits[t]):
+                uses.setdefault(int(split), []).append((t, d))
+        split_features = {}
+        for split in uses:
+            deps = [(int(a), int(st)) for a, st in zip(split_axes[split], split_strides[split]) if st > 0]
+            split_features[split] = (frozenset(axes[a]['feature'] for a, _ in deps), deps)
+
+        # Grupos: conjuntos maximales de features; luego se fusionan los pequeños
+        groups = []
+        for feats in sorted({f for f, _ in split_features.values() if f}, key=len, reverse=True):
+            if not any(feats <= g for g in groups):
+                groups.append(feats)
+        rows_of = lambda feats: int(np.prod([size[n] for n in feats]))
+        merged = True
+        while merged and len(groups) > 1:
+            merged = False
+            pairs = [(rows_of(a | b), i, j) for i, a in enumerate(groups) for j, b in enumerate(groups) if i < j]
+            rows, i, j = min(pairs)
+            if rows <= self.MAX_GROUP_ROWS:
+                groups = [g for k, g in enumerate(groups) if k not in (i, j)] + [groups[i] | groups[j]]
+                merged = True
+
+        self.groups = []
+        table_values = arrays['table_values']
+        for feats in groups:
+            names = [n for n in self.features if n in feats]
+            sizes = [size[n] for n in names]
+            radix = np.array([int(np.prod(sizes[k + 1:])) for k in range(len(sizes))], dtype=np.int64)
+            combos = np.indices(sizes).reshape(len(sizes), -1).T
+            contrib = np.zeros((len(combos), n_trees), dtype=np.int8)
+            for split, (split_feats, deps) in split_features.items():
+                if not split_feats or not split_feats <= feats:
+                    continue
+                position = int(arrays['split_offsets'][split]) + sum(
+                    axis_lut[a][combos[:, names.index(axes[a]['feature'])]] * st for a, st in deps
+                )
+                bits = table_values[position].astype(np.int8)
+                for t, d in uses[split]:
+                    contrib[:, t] += bits << d
+                split_features[split] = (frozenset(), deps)  # ya asignado a este grupo
+            self.groups.append(([self.features.index(n) for n in names], radix, contrib))
+
+        self.leaf_values = arrays['leaf_values'].ravel()
+        self.leaf_base = np.arange(n_trees, dtype=np.int64) * arrays['leaf_values'].shape[1]
+        self.scale = float(meta['scale'])
+        self.bias = float(meta['bias'])
+
+    @classmethod
+    def load(cls, path, model_path=None):
+        """Abre el export; falla si se generó con otro modelo (cuando el .cbm está disponible para comparar)."""
+        import json
+        with open(os.path.splitext(path)[0] + '.json', encoding='utf-8') as f:
+            meta = json.load(f)
+        if model_path is not None and os.path.exists(model_path) and meta.get('model_sha256') != file_sha256(model_path):
+            raise ValueError(f"{path} se exportó desde otro modelo; vuelve a ejecutar scripts/export_lite_model.py")
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files}
+        return cls(meta, arrays)
+
+    def get_cat_feature_indices(self):
+        return [self.position[name] for name in self.cat_features]
+
+    def fine_codes(self, X):
+        """Matriz (filas, features) de códigos finos, desde un DataFrame alineado o una lista de filas."""
+        if isinstance(X, pd.DataFrame):
+            columns = {name: X[name] for name in self.features}
+        else:
+            values = np.asarray(X, dtype=object).reshape(len(X), len(self.feature_names_))
+            columns = {name: values[:, self.position[name]] for name in self.features}
+        codes = np.empty((len(X), len(self.features)), dtype=np.int64)
+        for k, name in enumerate(self.features):
+            col = columns[name]
+            if name in self.cat_index:
+                if isinstance(col, pd.Series):
+                    found = self.cat_domains[name].get_indexer(col)
+                else:
+                    index = self.cat_index[name]
+                    found = np.fromiter((index.get(v, -1) for v in col), dtype=np.int64, count=len(col))
+                codes[:, k] = np.where(found < 0, len(self.cat_index[name]), found)
+            else:
+                x = np.asarray(col, dtype=float)
+                # x > borde, como CatBoost; NaN no supera ningún borde
+                codes[:, k] = np.where(np.isnan(x), 0, np.searchsorted(self.fine_borders[name], x, side='left'))
+        return codes
+
+    def predict_codes(self, codes):
+        out = np.empty(len(codes), dtype=float)
+        for start in range(0, len(codes), self.CHUNK_ROWS):
+            block = codes[start:start + self.CHUNK_ROWS]
+            leaves = np.zeros((len(block), len(self.leaf_base)), dtype=np.int16)
+            for cols, radix, contrib in self.groups:
+                leaves += contrib[block[:, cols] @ radix]
+            out[start:start + len(block)] = self.leaf_values[leaves.astype(np.int64) + self.leaf_base].sum(axis=1)
+        return out * self.scale + self.bias
+
+    def predict(self, X, prediction_type=None, thread_count=None):
+        """Salida RAW del regresor (equivalente a CatBoostRegressor.predict dentro de la tolerancia del export)."""
+        return self.predict_codes(self.fine_codes(X))
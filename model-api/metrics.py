@@ -0,0 +1,118 @@
+"""metrics.py
+
+Registro de métricas en memoria del proceso, expuesto por /metrics en formato de texto de
+Prometheus. Lo usan el camino de predicción (app.py, bundles.py, explain.py) y el micro-batcher.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class Metrics:
+    """
+    Registro mínimo de métricas en memoria del proceso (cada worker expone las suyas).
+    - observe(): summaries con p50/p95/p99 sobre una ventana de las últimas observaciones,
+      además de _sum y _count acumulados
+    - inc(): contadores
+    """
+
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self, window=2048):
+        self.window = window
+        self._lock = threading.Lock()
+        self._summaries = {}
+        self._counters = {}
+        self._help = {}
+
+    def describe(self, name, kind, text):
+        self._help[name] = (kind, text)
+
+    @staticmethod
+    def _key(name, labels):
+        return (name, tuple(sorted(labels.items())))
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            entry = self._summaries.get(key)
+            if entry is None:
+                entry = self._summaries[key] = {"window": deque(maxlen=self.window), "sum": 0.0, "count": 0}
+            entry["window"].append(value)
+            entry["sum"] += value
+            entry["count"] += 1
+
+    def inc(self, name, amount=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("model_api_stage_seconds", time.perf_counter() - start, stage=stage)
+
+    @staticmethod
+    def _quantile(sorted_values, q):
+        return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+    def quantiles(self, name, **labels):
+        """{cuantil: valor} sobre la ventana actual; vacío si no hay observaciones."""
+        with self._lock:
+            entry = self._summaries.get(self._key(name, labels))
+            values = sorted(entry["window"]) if entry else []
+        return {q: self._quantile(values, q) for q in self.QUANTILES} if values else {}
+
+    @staticmethod
+    def _labels(pairs, extra=()):
+        pairs = list(pairs) + list(extra)
+        if not pairs:
+            return ""
+        body = ",".join('%s="%s"' % (k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in pairs)
+        return "{" + body + "}"
+
+    def render(self, gauges=None):
+        """Texto en formato de exposición de Prometheus (version 0.0.4)."""
+        with self._lock:
+            summaries = {k: (sorted(v["window"]), v["sum"], v["count"]) for k, v in self._summaries.items()}
+            counters = dict(self._counters)
+        lines = []
+        seen = set()
+
+        def header(name, default_kind):
+            if name in seen:
+                return
+            seen.add(name)
+            kind, text = self._help.get(name, (default_kind, name))
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), (values, total, count) in sorted(summaries.items()):
+            header(name, "summary")
+            for q in self.QUANTILES:
+                if values:
+                    v = self._quantile(values, q)
+                    lines.append(f"{name}{self._labels(labels, [('quantile', q)])} {v:.9g}")
+            lines.append(f"{name}_sum{self._labels(labels)} {total:.9g}")
+            lines.append(f"{name}_count{self._labels(labels)} {count}")
+        for (name, labels), value in sorted(counters.items()):
+            header(name, "counter")
+            lines.append(f"{name}{self._labels(labels)} {value}")
+        for name, (kind, text, value) in sorted((gauges or {}).items()):
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+metrics.describe("model_api_stage_seconds", "summary", "Duración por etapa del camino de predicción (normalize, features, align, predict)")
+metrics.describe("model_api_request_seconds", "summary", "Duración total de la petición HTTP por ruta")
+metrics.describe("model_api_batch_size", "summary", "Filas por llamada a model.predict o por lote recibido")
+metrics.describe("model_api_requests_total", "counter", "Peticiones HTTP por ruta y código de estado")
+metrics.describe("model_api_errors_total", "counter", "Errores por ruta y tipo de excepción")
@@ -0,0 +1,181 @@
+"""micro_batcher.py
+
+Agrupa en una sola llamada al modelo las predicciones concurrentes de /predict.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.concurrency import run_in_threadpool
+
+from metrics import metrics
+
+
+class MicroBatcher:
+    """
+    Agrupa predicciones concurrentes de /predict en un solo model.predict.
+    Cada petición deja su fila (ya alineada al esquema del modelo) en una cola asyncio y
+    espera un future; un task consumidor junta hasta max_size filas o espera como mucho
+    max_wait segundos, puntúa el lote en un executor dedicado y reparte los resultados.
+    Si el lote falla, reintenta fila a fila para que el error solo le llegue a quien toca.
+    Hasta `threads` lotes se puntúan a la vez; mientras tanto el consumidor sigue juntando
+    el siguiente lote en lugar de esperar a que termine el anterior.
+    """
+
+    def __init__(self, score_fn, max_size=64, max_wait=0.002, threads=1):
+        self.score_fn = score_fn
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self.threads = threads
+        self.executor = None
+        self._queue = None
+        self._task = None
+        self._slots = None
+        self._inflight = set()
+        self.batches = 0
+        self.rows = 0
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self.executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="inference")
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.threads)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Los lotes que ya se están puntuando terminan y responden normalmente
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        # Lo que quedó en la cola ya no se va a puntuar: se avisa en lugar de dejarlo colgado
+        if self._queue is not None:
+            while True:
+                try:
+                    _, _, future = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                self._fail([future])
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    async def submit(self, row, context=None):
+        """
+        Score de una fila. `context` (p. ej. el bundle del modelo) se pasa a score_fn y las
+        filas con contextos distintos nunca se mezclan en la misma llamada.
+        Sin consumidor activo (p. ej. fuera del lifespan) puntúa directo.
+        """
+        args = () if context is None else (context,)
+        if not self.running:
+            return float((await run_in_threadpool(self.score_fn, [row], *args))[0])
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((row, context, future))
+        return await future
+
+    @staticmethod
+    def _fail(futures):
+        for future in futures:
+            if not future.done():
+                future.set_exception(RuntimeError("El micro-batcher se detuvo antes de puntuar la fila"))
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        try:
+            while len(batch) < self.max_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+        except asyncio.CancelledError:
+            # stop() a mitad de juntar: las filas ya sacadas de la cola no deben quedar colgadas
+            self._fail([future for _, _, future in batch])
+            raise
+        return batch
+
+    async def _score(self, loop, rows, context):
+        """[(score, None) | (None, excepción)] por fila; si el lote falla, reintenta fila a fila."""
+        args = () if context is None else (context,)
+        try:
+            scores = await loop.run_in_executor(self.executor, self.score_fn, rows, *args)
+            return [(float(v), None) for v in scores]
+        except Exception:
+            results = []
+            for row in rows:
+                try:
+                    value = await loop.run_in_executor(self.executor, self.score_fn, [row], *args)
+                    results.append((float(value[0]), None))
+                except Exception as e:
+                    results.append((None, e))
+            return results
+
+    async def _dispatch(self, loop, items, context):
+        results = await self._score(loop, [row for row, _ in items], context)
+        for (_, future), (value, error) in zip(items, results):
+            if future.done():
+                continue
+            if error is None:
+                future.set_result(value)
+            else:
+                future.set_exception(error)
+
+    def _finished(self, task):
+        self._inflight.discard(task)
+        self._slots.release()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            metrics.observe("model_api_batch_size", len(batch), source="micro_batch")
+            self.batches += 1
+            self.rows += len(batch)
+            # Casi siempre hay un solo contexto; justo tras cambiar de versión puede haber dos
+            groups = {}
+            for row, context, future in batch:
+                groups.setdefault(context, []).append((row, future))
+            pending = list(groups.items())
+            try:
+                while pending:
+                    # Con todos los hilos ocupados se espera aquí, y la cola sigue creciendo
+                    # para el próximo lote
+                    await self._slots.acquire()
+                    context, items = pending.pop(0)
+                    task = asyncio.create_task(self._dispatch(loop, items, context))
+                    self._inflight.add(task)
+                    task.add_done_callback(self._finished)
+            except asyncio.CancelledError:
+                self._fail([future for _, items in pending for _, future in items])
+                raise
+
+    def stats(self):
+        return {
+            "running": self.running,
+            "max_size": self.max_size,
+            "threads": self.threads,
+            "in_flight": len(self._inflight),
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "rows": self.rows,
+            "avg_batch_size": round(self.rows / self.batches, 2) if self.batches else 0.0,
+        }
@@ -0,0 +1,116 @@
+"""prediction_cache.py
+
+Caché LRU (con TTL opcional) de resultados por vector de features, ligada al archivo del
+modelo. app.py la usa para los scores y explain.py para las contribuciones SHAP.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger("model_api")
+
+
+def file_signature(path):
+    """(mtime_ns, tamaño) del archivo, o None si no existe. Sirve para detectar cambios del modelo."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class PredictionCache:
+    """
+    Caché LRU acotada (con TTL opcional) de score por tupla de features ya alineada.
+    Queda ligada a la firma del archivo del modelo: si el archivo cambia, se vacía sola.
+    """
+
+    def __init__(self, max_size=4096, ttl=0.0, check_interval=5.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._source = None
+        self._signature = None
+        self._last_check = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def bind(self, source_path):
+        """Asocia la caché al archivo de modelo cargado y la vacía."""
+        with self._lock:
+            self._source = source_path
+            self._signature = file_signature(source_path)
+            self._last_check = time.monotonic()
+            self._clear_locked()
+
+    def clear(self):
+        with self._lock:
+            self._clear_locked()
+
+    def _clear_locked(self):
+        if self._data:
+            self.invalidations += 1
+        self._data.clear()
+
+    def _check_source_locked(self, now):
+        if self._source is None or now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        signature = file_signature(self._source)
+        if signature != self._signature:
+            logger.info(f"El archivo del modelo cambió ({self._source}); se invalida la caché de predicciones")
+            self._signature = signature
+            self._clear_locked()
+
+    def get(self, key):
+        """Score cacheado para key, o None."""
+        now = time.monotonic()
+        with self._lock:
+            self._check_source_locked(now)
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, stored_at = entry
+            if self.ttl and now - stored_at > self.ttl:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,59 @@
+"""score_table.py
+
+Tabla precalculada de scores sobre el espacio finito de features (ver
+scripts/build_score_table.py) y el hash de archivos con el que se liga a su modelo.
+"""
+
+import os
+
+import numpy as np
+
+
+def file_sha256(path, block_size=1 << 20):
+    import hashlib
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ScoreTable:
+    """
+    Tabla precalculada de scores para el producto cartesiano de los dominios de features
+    (ver scripts/build_score_table.py). Se abre como memmap y cada lookup es O(1):
+    un índice por feature y un offset en el array plano. Devuelve None para valores fuera
+    del dominio, en cuyo caso se usa el modelo en vivo.
+    """
+
+    def __init__(self, feature_names, domains, scores):
+        self.feature_names = list(feature_names)
+        self.index = [{v: i for i, v in enumerate(domains[col])} for col in self.feature_names]
+        shape = [len(domains[col]) for col in self.feature_names]
+        self.strides = [int(np.prod(shape[k + 1:])) for k in range(len(shape))]
+        self.scores = scores
+
+    @classmethod
+    def load(cls, table_path, model_path=None, feature_names=None):
+        """Abre la tabla; falla si fue construida con otro modelo o con otro orden de columnas."""
+        import json
+        with open(os.path.splitext(table_path)[0] + '.json', encoding='utf-8') as f:
+            meta = json.load(f)
+        if model_path is not None and meta.get('model_sha256') != file_sha256(model_path):
+            raise ValueError(f"{table_path} se construyó con otro modelo; vuelve a ejecutar scripts/build_score_table.py")
+        if feature_names is not None and list(feature_names) != meta['feature_names']:
+            raise ValueError(f"{table_path} no coincide con las features del modelo")
+        scores = np.load(table_path, mmap_mode='r')
+        return cls(meta['feature_names'], meta['domains'], scores)
+
+    def lookup(self, row):
+        offset = 0
+        for index, stride, value in zip(self.index, self.strides, row):
+            i = index.get(value)
+            if i is None:
+                return None
+            offset += i * stride
+        return float(self.scores[offset])
+
+    def info(self):
+        return {"rows": int(self.scores.shape[0]), "feature_names": self.feature_names}
@@ -0,0 +1,98 @@
+"""scripts/build_score_table.py
+
+Precalcula el score del modelo para todas las combinaciones posibles de features.
+
+Uso:
+    python scripts/build_score_table.py --model catboost_best_model.cbm --encoders artifacts --out artifacts
+
+Después de feature_engineering todas las entradas del modelo son ordinales o categóricas
+con dominio conocido (códigos de los encoders, grupos de industria/cloud/tecnología/partner
+y regiones), así que el producto cartesiano es finito. El script lo recorre en orden C,
+lo puntúa por bloques con CatBoost y guarda:
+ - score_table.npy  -> array float64 plano, indexado por los códigos de cada feature
+ - score_table.json -> orden de features, dominios y sha256 del modelo usado
+
+La API lo carga como memmap si existe (ver SCORE_TABLE_PATH / USE_SCORE_TABLE en app.py).
+"""
+
+import os
+import sys
+import json
+import argparse
+import itertools
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from catboost import CatBoostRegressor
+
+from app import ModelSchema, default_feature_domains, encoder_registry, file_sha256
+
+
+def iter_combinations(feature_names, domains, chunk_size):
+    """Recorre el producto cartesiano de los dominios en orden C, en DataFrames de chunk_size filas."""
+    product = itertools.product(*[domains[col] for col in feature_names])
+    while True:
+        rows = list(itertools.islice(product, chunk_size))
+        if not rows:
+            return
+        yield pd.DataFrame(rows, columns=feature_names)
+
+
+def compute_scores(model, feature_names, domains, chunk_size=200_000):
+    """Scores de todas las combinaciones, en el orden que espera ScoreTable."""
+    total = int(np.prod([len(domains[col]) for col in feature_names]))
+    scores = np.empty(total, dtype=np.float64)
+    offset = 0
+    for chunk in iter_combinations(feature_names, domains, chunk_size):
+        scores[offset:offset + len(chunk)] = model.predict(chunk)
+        offset += len(chunk)
+    return scores
+
+
+def main(model_path: str, encoders_dir: str, out_dir: str, regions, chunk_size: int):
+    model = CatBoostRegressor()
+    model.load_model(model_path)
+    schema = ModelSchema.from_model(model)
+    if schema is None:
+        print("Error: el modelo no expone nombres de features")
+        sys.exit(1)
+
+    encoder_registry.load(encoders_dir)
+    domains = default_feature_domains(encoder_registry, regions)
+    missing = [col for col in schema.feature_names if col not in domains]
+    if missing:
+        print(f"Error: no hay dominio conocido para {missing}")
+        sys.exit(1)
+
+    sizes = {col: len(domains[col]) for col in schema.feature_names}
+    print(f"Dominios: {sizes} -> {int(np.prod(list(sizes.values())))} combinaciones")
+    scores = compute_scores(model, schema.feature_names, domains, chunk_size)
+
+    os.makedirs(out_dir, exist_ok=True)
+    table_path = os.path.join(out_dir, 'score_table.npy')
+    np.save(table_path, scores)
+    meta = {
+        'feature_names': schema.feature_names,
+        'domains': {col: domains[col] for col in schema.feature_names},
+        'model_sha256': file_sha256(model_path),
+        'rows': int(scores.shape[0]),
+    }
+    with open(os.path.join(out_dir, 'score_table.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    print(f"Guardada tabla de scores en: {table_path} ({scores.nbytes / 1e6:.1f} MB)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Precalcula la tabla de scores del modelo para todo el espacio de features')
+    parser.add_argument('--model', '-m', default=os.path.join(ROOT, 'catboost_best_model.cbm'), help='Ruta al modelo CatBoost (.cbm)')
+    parser.add_argument('--encoders', '-e', default=os.path.join(ROOT, 'artifacts'), help='Directorio con los encoders ordinales')
+    parser.add_argument('--out', '-o', default=os.path.join(ROOT, 'artifacts'), help='Directorio de salida para la tabla')
+    parser.add_argument('--regions', nargs='+', default=None, help="Valores de 'Global Region' a incluir (por defecto Americas EMEA APJ Otros)")
+    parser.add_argument('--chunk-size', type=int, default=200_000, help='Filas por llamada a model.predict')
+    args = parser.parse_args()
+    main(args.model, args.encoders, args.out, args.regions, args.chunk_size)
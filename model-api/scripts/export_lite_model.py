@@ -0,0 +1,265 @@
+"""scripts/export_lite_model.py
+
+Exporta el modelo CatBoost a un motor de inferencia que solo necesita NumPy (app.LiteModel).
+
+Uso:
+    python scripts/export_lite_model.py --model catboost_best_model.cbm --encoders artifacts --out artifacts
+
+El export ONNX de CatBoost no admite features categóricas y el export a Python evalúa los
+hashes de las CTR fila a fila en Python puro. Como tras feature_engineering cada categórica
+tiene un dominio finito (los grupos de industria/cloud/tecnología/partner y las regiones),
+el script parte del export JSON (árboles simétricos) y convierte cada split binario en una
+tabla de bits indexada por los códigos de las features de las que depende:
+ - umbral numérico         -> tramo del valor respecto al borde
+ - one-hot                 -> código de la categoría
+ - CTR sobre combinaciones -> códigos de sus categóricas y tramos de sus numéricas
+Cada tabla se llena preguntándole a CatBoost (calc_leaf_indexes) por todas las
+combinaciones de su dominio, más un código "no vista" por categórica, así que no hace falta
+reimplementar sus hashes. Guarda:
+ - model_lite.npz  -> tablas de splits, splits por árbol y valores de las hojas
+ - model_lite.json -> features, dominios, ejes, sha256 del modelo y resultado de la verificación
+
+Antes de guardar compara LiteModel contra CatBoostRegressor.predict en una muestra del
+espacio de features (--check-rows, 0 = todo el espacio) y falla si alguna diferencia
+supera --tolerance. La API lo usa con INFERENCE_BACKEND=lite (ver LITE_MODEL_PATH en app.py).
+"""
+
+import os
+import sys
+import json
+import argparse
+import itertools
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from catboost import CatBoostRegressor, Pool
+
+from app import LITE_MODEL_FILE, LiteModel, ModelSchema, default_feature_domains, encoder_registry, file_sha256
+
+# Valor que CatBoost no vio en entrenamiento: representa a cualquier categoría desconocida
+UNSEEN = '<no vista>'
+# Hash que CatBoost usa para los huecos vacíos de sus tablas de CTR
+EMPTY_HASH = '18446744073709551615'
+
+
+def export_json(model):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'model.json')
+        model.save_model(path, format='json')
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+
+def binary_features(info, names):
+    """Splits binarios en el orden de split_index: bordes numéricos, valores one-hot y bordes de CTR."""
+    cat_names = {c['feature_index']: names[c['flat_feature_index']] for c in info['categorical_features']}
+    float_names = {f['feature_index']: names[f['flat_feature_index']] for f in info['float_features']}
+    out = []
+    for f in info['float_features']:
+        for border in f['borders']:
+            out.append({'type': 'FloatFeature', 'border': border, 'axes': [('bucket', float_names[f['feature_index']], (border,))]})
+    for c in info['categorical_features']:
+        for value in c.get('values', []):
+            out.append({'type': 'OneHotFeature', 'value': value, 'axes': [('cat', cat_names[c['feature_index']])]})
+    for ctr in info['ctrs']:
+        cats, buckets = [], {}
+        for element in ctr['elements']:
+            if element['combination_element'] == 'float_feature':
+                buckets.setdefault(float_names[element['float_feature_index']], set()).add(element['border'])
+            else:
+                cats.append(cat_names[element['cat_feature_index']])
+        axes = [('cat', name) for name in sorted(set(cats))]
+        axes += [('bucket', name, tuple(sorted(b))) for name, b in sorted(buckets.items())]
+        for border in ctr['borders']:
+            out.append({'type': 'OnlineCtr', 'border': border, 'axes': axes})
+    return out
+
+
+def axis_size(axis, domains):
+    return len(domains[axis[1]]) + 1 if axis[0] == 'cat' else len(axis[2]) + 1
+
+
+def axis_value(axis, code, domains):
+    """Valor de entrada que produce `code` en el eje: la categoría (o UNSEEN) o un número dentro del tramo."""
+    if axis[0] == 'cat':
+        values = domains[axis[1]]
+        return values[code] if code < len(values) else UNSEEN
+    borders = axis[2]
+    if code == 0:
+        return borders[0] - 0.5
+    if code == len(borders):
+        return borders[-1] + 0.5
+    return (borders[code - 1] + borders[code]) / 2
+
+
+def warn_unknown_categories(model_json, domains, names):
+    """Avisa si CatBoost vio en entrenamiento más categorías que las del dominio (irían a 'no vista')."""
+    cat_names = {c['feature_index']: names[c['flat_feature_index']] for c in model_json['features_info']['categorical_features']}
+    for key, data in model_json.get('ctr_data', {}).items():
+        identifier = json.loads(key)['identifier']
+        if len(identifier) != 1 or identifier[0]['combination_element'] != 'cat_feature_value':
+            continue
+        name = cat_names[identifier[0]['cat_feature_index']]
+        stride = int(data['hash_stride'])
+        seen = sum(1 for h in data['hash_map'][::stride] if str(h) != EMPTY_HASH)
+        if seen > len(domains[name]):
+            print(f"Aviso: el modelo vio {seen} valores de '{name}' y el dominio tiene {len(domains[name])}; los que falten se puntuarán como no vistos")
+
+
+def build_tables(model, model_json, names, cat_features, domains):
+    trees = model_json['oblivious_trees']
+    binfeatures = binary_features(model_json['features_info'], names)
+    occurrences = {}
+    for t, tree in enumerate(trees):
+        for d, split in enumerate(tree['splits']):
+            feature = binfeatures[split['split_index']]
+            if feature['type'] != split['split_type'] or (
+                'border' in feature and abs(feature['border'] - split['border']) > 1e-9
+            ):
+                raise ValueError(f"Split {split['split_index']} del árbol {t} no coincide con features_info")
+            occurrences.setdefault(split['split_index'], (t, d))
+    used = sorted(occurrences)
+
+    # Filas de consulta: una por combinación de los ejes de cada grupo de splits
+    base = {name: (domains[name][0] if name in cat_features else 0.0) for name in names}
+    groups = {}
+    for index in used:
+        groups.setdefault(tuple(binfeatures[index]['axes']), []).append(index)
+    rows, group_rows = [], {}
+    for axes, _ in groups.items():
+        start = len(rows)
+        for codes in itertools.product(*[range(axis_size(a, domains)) for a in axes]):
+            row = dict(base)
+            for axis, code in zip(axes, codes):
+                row[axis[1]] = axis_value(axis, code, domains)
+            rows.append(row)
+        group_rows[axes] = (start, len(rows))
+    frame = pd.DataFrame(rows, columns=names)
+    leaves = model.calc_leaf_indexes(Pool(frame, cat_features=[names.index(c) for c in cat_features]))
+
+    axis_ids = {}
+    tables, split_ids = [], {}
+    for axes, indices in groups.items():
+        start, end = group_rows[axes]
+        sizes = [axis_size(a, domains) for a in axes]
+        strides = [int(np.prod(sizes[k + 1:])) for k in range(len(sizes))]
+        ids = [axis_ids.setdefault(a, len(axis_ids)) for a in axes]
+        for index in indices:
+            t, d = occurrences[index]
+            bits = ((leaves[start:end, t] >> d) & 1).astype(np.uint8)
+            split_ids[index] = len(tables)
+            tables.append((ids, strides, bits))
+    # Split ficticio (siempre 0) para rellenar los árboles menos profundos
+    dummy = len(tables)
+    tables.append(([0], [0], np.zeros(1, dtype=np.uint8)))
+
+    k_max = max(len(ids) for ids, _, _ in tables)
+    split_axes = np.zeros((len(tables), k_max), dtype=np.int32)
+    split_strides = np.zeros((len(tables), k_max), dtype=np.int32)
+    split_offsets = np.zeros(len(tables), dtype=np.int64)
+    offset = 0
+    for s, (ids, strides, bits) in enumerate(tables):
+        split_axes[s, :len(ids)] = ids
+        split_strides[s, :len(strides)] = strides
+        split_offsets[s] = offset
+        offset += len(bits)
+    table_values = np.concatenate([bits for _, _, bits in tables])
+
+    depth = max(len(tree['splits']) for tree in trees)
+    tree_splits = np.full((len(trees), depth), dummy, dtype=np.int32)
+    leaf_values = np.zeros((len(trees), 2 ** depth), dtype=np.float64)
+    for t, tree in enumerate(trees):
+        for d, split in enumerate(tree['splits']):
+            tree_splits[t, d] = split_ids[split['split_index']]
+        leaf_values[t, :len(tree['leaf_values'])] = tree['leaf_values']
+
+    axes_meta = [None] * len(axis_ids)
+    for axis, k in axis_ids.items():
+        axes_meta[k] = {'kind': 'cat', 'feature': axis[1]} if axis[0] == 'cat' else {
+            'kind': 'bucket', 'feature': axis[1], 'borders': list(axis[2])}
+    arrays = {
+        'split_offsets': split_offsets,
+        'split_axes': split_axes,
+        'split_strides': split_strides,
+        'table_values': table_values,
+        'tree_splits': tree_splits,
+        'leaf_values': leaf_values,
+    }
+    return axes_meta, arrays
+
+
+def check_rows(names, cat_features, domains, n, seed=0):
+    """Muestra del espacio de features (todo el espacio si n=0), con categorías no vistas incluidas."""
+    full = {name: list(domains[name]) + ([UNSEEN] if name in cat_features else []) for name in names}
+    total = int(np.prod([len(v) for v in full.values()]))
+    if n <= 0 or n >= total:
+        return pd.DataFrame(list(itertools.product(*full.values())), columns=names)
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({name: np.asarray(values, dtype=object)[rng.integers(0, len(values), n)] for name, values in full.items()})
+
+
+def main(model_path, encoders_dir, out_dir, regions, n_check, tolerance):
+    model = CatBoostRegressor()
+    model.load_model(model_path)
+    schema = ModelSchema.from_model(model)
+    if schema is None:
+        print("Error: el modelo no expone nombres de features")
+        sys.exit(1)
+    names, cat_features = schema.feature_names, schema.cat_features
+
+    encoder_registry.load(encoders_dir)
+    domains = default_feature_domains(encoder_registry, regions)
+    model_json = export_json(model)
+    warn_unknown_categories(model_json, domains, names)
+    axes, arrays = build_tables(model, model_json, names, cat_features, domains)
+
+    scale, bias = model_json['scale_and_bias']
+    meta = {
+        'feature_names': names,
+        'cat_features': cat_features,
+        'domains': {name: list(domains[name]) for name in cat_features},
+        'axes': axes,
+        'scale': float(scale),
+        'bias': float(bias[0]),
+        'model_sha256': file_sha256(model_path),
+    }
+    lite = LiteModel(meta, arrays)
+
+    sample = check_rows(names, cat_features, domains, n_check)
+    for col in names:
+        if col not in cat_features:
+            sample[col] = sample[col].astype(float)
+    expected = model.predict(sample)
+    got = lite.predict(sample)
+    max_error = float(np.max(np.abs(got - expected)))
+    print(f"Verificación: {len(sample)} filas, error absoluto máximo {max_error:.3g} (tolerancia {tolerance:g})")
+    if max_error > tolerance:
+        print("Error: el motor exportado no reproduce al modelo dentro de la tolerancia; no se guarda")
+        sys.exit(1)
+    meta['check'] = {'rows': int(len(sample)), 'max_abs_error': max_error, 'tolerance': tolerance}
+
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, LITE_MODEL_FILE)
+    np.savez(path, **arrays)
+    with open(os.path.splitext(path)[0] + '.json', 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    size = sum(a.nbytes for a in arrays.values())
+    print(f"Guardado modelo lite en: {path} ({size / 1e6:.2f} MB, {arrays['tree_splits'].shape[0]} árboles, {len(arrays['split_offsets'])} splits)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Exporta el modelo CatBoost a tablas evaluables solo con NumPy (LiteModel)')
+    parser.add_argument('--model', '-m', default=os.path.join(ROOT, 'catboost_best_model.cbm'), help='Ruta al modelo CatBoost (.cbm)')
+    parser.add_argument('--encoders', '-e', default=os.path.join(ROOT, 'artifacts'), help='Directorio con los encoders ordinales')
+    parser.add_argument('--out', '-o', default=os.path.join(ROOT, 'artifacts'), help='Directorio de salida')
+    parser.add_argument('--regions', nargs='+', default=None, help="Valores de 'Global Region' conocidos (por defecto Americas EMEA APJ Otros)")
+    parser.add_argument('--check-rows', type=int, default=200_000, help='Filas de la muestra de verificación (0 = todo el espacio)')
+    parser.add_argument('--tolerance', type=float, default=1e-6, help='Diferencia absoluta máxima admitida contra CatBoost')
+    args = parser.parse_args()
+    main(args.model, args.encoders, args.out, args.regions, args.check_rows, args.tolerance)
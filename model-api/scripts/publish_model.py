@@ -0,0 +1,71 @@
+"""scripts/publish_model.py
+
+Publica una versión del modelo en el repositorio que vigila la API (MODEL_REPOSITORY).
+
+Uso:
+    python scripts/publish_model.py --version 2024-06-01 --model catboost_best_model.cbm --encoders artifacts
+
+Cada versión es un subdirectorio con el .cbm, los tres encoders de scripts/save_encoders.py
+y, si se indican, la tabla de scripts/build_score_table.py (--score-table) y el export de
+scripts/export_lite_model.py (--lite), ambos generados con ESE modelo. Los archivos se
+copian primero a un directorio oculto y luego se renombra, así la API nunca ve una versión
+a medio copiar.
+
+La API activa la versión nueva sola si MODEL_WATCH_INTERVAL > 0, o con
+POST /admin/models/<version>/activate.
+"""
+
+import os
+import sys
+import shutil
+import argparse
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app import BUNDLE_MODEL_FILE, ENCODER_FILES, LITE_MODEL_FILE, MODEL_REPOSITORY
+
+
+def publish(version: str, model_path: str, encoders_dir: str, repository: str,
+            score_table_dir: str = None, lite_dir: str = None) -> str:
+    target = os.path.join(repository, version)
+    if os.path.exists(target):
+        raise FileExistsError(f"La versión {version} ya existe en {repository}; las versiones no se sobrescriben")
+
+    files = [(model_path, BUNDLE_MODEL_FILE)]
+    files += [(os.path.join(encoders_dir, name), name) for name in ENCODER_FILES.values()]
+    if score_table_dir:
+        files += [(os.path.join(score_table_dir, name), name) for name in ('score_table.npy', 'score_table.json')]
+    if lite_dir:
+        lite_json = os.path.splitext(LITE_MODEL_FILE)[0] + '.json'
+        files += [(os.path.join(lite_dir, name), name) for name in (LITE_MODEL_FILE, lite_json)]
+    for src, _ in files:
+        if not os.path.exists(src):
+            raise FileNotFoundError(f"No se encontró {src}")
+
+    os.makedirs(repository, exist_ok=True)
+    staging = os.path.join(repository, f'.{version}.tmp')
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    try:
+        for src, name in files:
+            shutil.copy2(src, os.path.join(staging, name))
+        os.rename(staging, target)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return target
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Publica modelo + encoders como una versión nueva del repositorio de modelos')
+    parser.add_argument('--version', '-v', required=True, help='Nombre de la versión (la más reciente es la última en orden alfabético)')
+    parser.add_argument('--model', '-m', default=os.path.join(ROOT, 'catboost_best_model.cbm'), help='Ruta al modelo CatBoost (.cbm)')
+    parser.add_argument('--encoders', '-e', default=os.path.join(ROOT, 'artifacts'), help='Directorio con los encoders ordinales')
+    parser.add_argument('--score-table', default=None, help='Directorio con score_table.npy/.json construidos para este modelo')
+    parser.add_argument('--lite', default=None, help='Directorio con model_lite.npz/.json exportados de este modelo')
+    parser.add_argument('--repository', '-r', default=MODEL_REPOSITORY, help='Repositorio de versiones (MODEL_REPOSITORY)')
+    args = parser.parse_args()
+    path = publish(args.version, args.model, args.encoders, args.repository, args.score_table, args.lite)
+    print(f"Versión {args.version} publicada en: {path}")
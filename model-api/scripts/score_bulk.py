@@ -0,0 +1,131 @@
+"""scripts/score_bulk.py
+
+Puntúa un extracto completo (CSV o Parquet) con el modelo CatBoost, sin levantar la API.
+
+Uso:
+    python scripts/score_bulk.py --input ../src/data/df_company_tot.csv --output scores.csv
+    python scripts/score_bulk.py -i extracto.parquet -o scores.parquet --chunk-size 100000 --workers 4
+
+- Carga modelo y encoders igual que el lifespan de app.py (load_artifacts).
+- Lee el archivo por bloques de --chunk-size filas (read_csv con chunksize o iter_batches de
+  Parquet), así que la memoria queda acotada por el tamaño de bloque y no por el archivo.
+- Cada bloque se normaliza (normalize_frame), pasa por feature_engineering y se puntúa con una sola llamada
+  a model.predict. Con --workers > 1 los bloques se reparten en un pool de procesos
+  (heredan el modelo ya cargado vía fork) y se escriben en el orden de entrada.
+- La salida se escribe en streaming: CSV (append por bloque) o Parquet (ParquetWriter).
+
+Columnas de entrada aceptadas: los nombres crudos del dataset ('Revenue Band', 'Employee Band',
+'Years in Business Band', 'Global Region', 'Industry Detail (Customer)', 'Cloud Coverage',
+'Technology Scope', 'Partner Classification') o los campos de PredictionInput
+(revenue_band, employee_band, ...). Las que falten se tratan como nulas.
+"""
+
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import app as model_app
+
+def _is_parquet(path):
+    return os.path.splitext(path)[1].lower() in ('.parquet', '.pq')
+
+
+def read_chunks(path, chunk_size):
+    """Itera el archivo de entrada en DataFrames de como mucho chunk_size filas."""
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size, dtype=str, keep_default_na=True)
+
+
+def score_chunk(chunk: pd.DataFrame):
+    """Devuelve un array con el score de cada fila del bloque (una sola llamada al modelo)."""
+    features = model_app.feature_engineering(model_app.normalize_frame(chunk))
+    return model_app.predict_scores(model_app.align_features(features))
+
+
+class OutputWriter:
+    """Escritura incremental de resultados en CSV o Parquet."""
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = _is_parquet(path)
+        self._writer = None
+        self._first = True
+
+    def write(self, df: pd.DataFrame):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            df.to_csv(self.path, mode='w' if self._first else 'a', header=self._first, index=False)
+        self._first = False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def _output_frame(chunk, scores, id_columns, keep_all):
+    out = chunk.copy() if keep_all else chunk[[c for c in id_columns if c in chunk.columns]].copy()
+    out['score'] = scores
+    return out
+
+
+def run(input_path, output_path, chunk_size=50_000, workers=1, id_columns=('Company ID',), keep_all=False):
+    model_app.load_artifacts()
+    if model_app.model is None:
+        raise RuntimeError('No se pudo cargar el modelo')
+
+    writer = OutputWriter(output_path)
+    total = 0
+    start = time.perf_counter()
+    try:
+        if workers <= 1:
+            for chunk in read_chunks(input_path, chunk_size):
+                writer.write(_output_frame(chunk, score_chunk(chunk), id_columns, keep_all))
+                total += len(chunk)
+        else:
+            # Como mucho 2 bloques por worker en vuelo: memoria acotada y orden de salida estable
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pending = []
+                for chunk in read_chunks(input_path, chunk_size):
+                    pending.append((chunk, pool.submit(score_chunk, chunk)))
+                    if len(pending) >= workers * 2:
+                        done_chunk, future = pending.pop(0)
+                        writer.write(_output_frame(done_chunk, future.result(), id_columns, keep_all))
+                        total += len(done_chunk)
+                for done_chunk, future in pending:
+                    writer.write(_output_frame(done_chunk, future.result(), id_columns, keep_all))
+                    total += len(done_chunk)
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - start
+    print(f"Puntuadas {total} filas en {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f} filas/s) -> {output_path}")
+    return total
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Puntuación masiva de un CSV/Parquet con el modelo CatBoost')
+    parser.add_argument('--input', '-i', required=True, help='CSV o Parquet de entrada')
+    parser.add_argument('--output', '-o', required=True, help='Archivo de salida (.csv o .parquet)')
+    parser.add_argument('--chunk-size', type=int, default=50_000, help='Filas por bloque')
+    parser.add_argument('--workers', type=int, default=1, help='Procesos para puntuar bloques en paralelo')
+    parser.add_argument('--id-columns', nargs='+', default=['Company ID'], help='Columnas de entrada que se copian a la salida')
+    parser.add_argument('--keep-all', action='store_true', help='Copiar todas las columnas de entrada a la salida')
+    args = parser.parse_args()
+    run(args.input, args.output, args.chunk_size, args.workers, args.id_columns, args.keep_all)
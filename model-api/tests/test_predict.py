@@ -1,5 +1,8 @@
+import math
 import os
 import sys
+
+import pytest
 from fastapi.testclient import TestClient
 
 # Asegurar que el directorio padre (workspace `model-api`) esté en sys.path
@@ -9,10 +12,25 @@ if ROOT not in sys.path:
 
 from app import app
 
-client = TestClient(app)
 
+@pytest.fixture
+def loaded_client(monkeypatch):
+    """Cliente con el lifespan ejecutado (modelo y encoders cargados desde model-api/)."""
+    monkeypatch.chdir(ROOT)
+    with TestClient(app) as c:
+        yield c
+
+
+def require_model():
+    """Salta el test si el lifespan no pudo cargar un modelo en este entorno."""
+    import app as app_module
+
+    if app_module.active_bundle is None:
+        pytest.skip("El modelo no está disponible en este entorno")
 
-def test_predict_smoke():
+
+def test_predict_smoke(loaded_client):
+    require_model()
     payload = {
         "company_id": 12345,
         "revenue_band": "<$100K",
@@ -24,10 +42,605 @@ def test_predict_smoke():
         "technology_scope": "Cloud",
         "partner_classification": "Independent Software Vendor (ISV)"
     }
-    resp = client.post("/predict", json=payload)
+    resp = loaded_client.post("/predict", json=payload)
     assert resp.status_code == 200
     data = resp.json()
-    # Debe responder 200 y contener información útil. Aceptamos dos casos:
-    # - el modelo cargó y devuelve 'model_used' y predicción
-    # - el modelo no se cargó y devuelve un mensaje de error (aún así la ruta respondió)
-    assert (data.get("model_used") == "CatBoost" and (("prediction" in data) or ("prediction_proba" in data))) or ("error" in data)
+    assert "error" not in data, data
+    assert data["model_used"] == "CatBoostRegressor"
+    assert isinstance(data["score"], float) and math.isfinite(data["score"])
+
+
+def test_predict_batch_keeps_order_and_reports_row_errors(loaded_client):
+    base = {
+        "revenue_band": "$1M-$2.49M",
+        "employee_band": "11-50",
+        "years_in_business_band": "6-10",
+        "global_region": "Americas",
+        "industry_detail_customer": "E6. Consumer Goods",
+        "cloud_coverage": "saas",
+        "technology_scope": "Cloud",
+        "partner_classification": "isv",
+    }
+    rows = [dict(base, company_id=i) for i in range(5)]
+    rows[2] = {"company_id": "no-es-un-entero"}
+
+    require_model()
+    batch = loaded_client.post("/predict/batch", json=rows).json()
+    single = loaded_client.post("/predict", json=rows[0]).json()
+
+    assert batch["count"] == 5
+    assert batch["errors"] == 1
+    assert [r["index"] for r in batch["results"]] == list(range(5))
+    assert "error" in batch["results"][2]
+    for i in (0, 1, 3, 4):
+        assert batch["results"][i]["company_id"] == i
+        assert abs(batch["results"][i]["score"] - single["score"]) < 1e-9
+
+
+def test_encoder_registry_does_not_fit_missing_encoders(tmp_path):
+    from app import EncoderRegistry
+
+    registry = EncoderRegistry()
+    with pytest.raises(FileNotFoundError):
+        registry.load(str(tmp_path))
+    assert not registry.loaded
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_compiled_feature_encoder_matches_feature_engineering():
+    import pandas as pd
+    from app import (
+        CompiledFeatureEncoder, RevenueBandEnum, EmployeeBandEnum, YearsInBusinessEnum,
+        CloudCoverageEnum, TechnologyScopeEnum, PartnerClassificationEnum, feature_engineering,
+    )
+
+    cols = [
+        'Revenue Band Mod Codificado', 'Employee Band Mod Codificado', 'Years in Business Band Mod Codificado',
+        'Global Region', 'Industry_agrupado', 'Cloud_agrupado', 'Technology_agrupado', 'Partner_agrupado',
+    ]
+    extra = [None, '', 'None', 'desconocido', '10-99', '09-10', '$25B+ ']
+    revenue = [e.value for e in RevenueBandEnum] + extra
+    employee = [e.value for e in EmployeeBandEnum] + extra
+    years = [e.value for e in YearsInBusinessEnum] + extra
+    cloud = [e.value for e in CloudCoverageEnum] + extra
+    tech = [e.value for e in TechnologyScopeEnum] + extra
+    partner = [e.value for e in PartnerClassificationEnum] + extra
+    industry = ['B1. Banking', 'c2', 'D', ' e6. Consumer Goods', 'F1. Retail', 'G', 'H9'] + extra
+    region = ['Americas', 'EMEA', 'APJ'] + extra
+
+    n = max(map(len, [revenue, employee, years, cloud, tech, partner, industry, region]))
+    payloads = [
+        {
+            'Revenue Band': revenue[i % len(revenue)],
+            'Employee Band': employee[(i * 3) % len(employee)],
+            'Years in Business Band': years[(i * 5) % len(years)],
+            'Global Region': region[i % len(region)],
+            'Industry Detail (Customer)': industry[(i * 7) % len(industry)],
+            'Cloud Coverage': cloud[i % len(cloud)],
+            'Technology Scope': tech[(i * 2) % len(tech)],
+            'Partner Classification': partner[(i * 3) % len(partner)],
+        }
+        for i in range(n * 4)
+    ]
+
+    encoder = CompiledFeatureEncoder()
+    for payload in payloads:
+        expected = feature_engineering(pd.DataFrame([payload]))[cols].iloc[0].to_dict()
+        assert encoder.encode_row(payload) == expected, payload
+
+
+def test_compiled_band_codes_match_feature_engineering_past_the_table_limit(monkeypatch):
+    import random
+    import pandas as pd
+    import app as app_module
+
+    encoder = app_module.CompiledFeatureEncoder()
+    encoder.compile()
+    monkeypatch.setattr(encoder, 'MAX_CODES', 4)
+    rng = random.Random(0)
+    pieces = ['$', '<', '+', '-', ' ', ',', '.5', 'K', 'M', 'B', '1', '10', '25', '100', '500', '_', 'e3', 'x', '１']
+    values = [''.join(rng.choice(pieces) for _ in range(rng.randint(1, 5))) for _ in range(300)]
+    values += [5, 2.5, float('nan'), '1_000', '1e3', ' 50 ', 'inf']
+
+    expected = {
+        column: encoder._reference_codes(column, values) for column in app_module.BAND_COLUMNS
+    }
+    sizes = {column: len(table) for column, table in encoder.codes.items()}
+    # Pasado el tope de la tabla no se vuelve a llamar a feature_engineering
+    import features
+
+    monkeypatch.setattr(features, 'feature_engineering', None)
+    for column, codes in expected.items():
+        got = [encoder.band_code(column, value) for value in values]
+        assert got == codes, column
+        assert len(encoder.codes[column]) == sizes[column]
+
+
+def test_model_schema_endpoint_and_alignment(loaded_client):
+    import pandas as pd
+    import app as app_module
+
+    require_model()
+    schema = loaded_client.get("/model/schema").json()
+    names = schema["feature_names"]
+    assert set(schema["cat_features"]) <= set(names)
+
+    shuffled = pd.DataFrame([{**{n: 0 for n in reversed(names)}, 'Company ID': 1, 'Extra': 'x'}])
+    aligned = app_module.align_features(shuffled)
+    assert list(aligned.columns) == names
+
+
+def test_prediction_cache_lru_ttl_and_model_file_invalidation(tmp_path):
+    from app import PredictionCache
+
+    model_file = tmp_path / "model.cbm"
+    model_file.write_bytes(b"v1")
+
+    cache = PredictionCache(max_size=2, check_interval=0)
+    cache.bind(str(model_file))
+    cache.put(("a",), 1.0)
+    cache.put(("b",), 2.0)
+    assert cache.get(("a",)) == 1.0
+    cache.put(("c",), 3.0)  # desaloja ("b",), el menos usado
+    assert cache.get(("b",)) is None
+    assert cache.get(("c",)) == 3.0
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (2, 1, 1)
+
+    model_file.write_bytes(b"version 2")
+    assert cache.get(("a",)) is None
+    assert cache.stats()["invalidations"] == 1
+
+    ttl_cache = PredictionCache(max_size=2, ttl=1e-9)
+    ttl_cache.put(("a",), 1.0)
+    assert ttl_cache.get(("a",)) is None
+    assert ttl_cache.stats()["expirations"] == 1
+
+
+def test_repeated_predictions_hit_the_cache(loaded_client):
+    require_model()
+    payload = {"revenue_band": "$5M-$9.9M", "employee_band": "51-200", "cloud_coverage": "PaaS"}
+    first = loaded_client.post("/predict", json=payload).json()
+    before = loaded_client.get("/health").json()["prediction_cache"]
+    second = loaded_client.post("/predict", json=payload).json()
+    after = loaded_client.get("/health").json()["prediction_cache"]
+    assert second["score"] == first["score"]
+    assert after["hits"] == before["hits"] + 1
+
+
+def test_score_table_matches_live_model(loaded_client, tmp_path):
+    import json
+    import numpy as np
+    import app as app_module
+
+    require_model()
+    sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+    from build_score_table import compute_scores
+
+    names = app_module.model_schema.feature_names
+    domains = app_module.default_feature_domains(regions=['Americas', 'Otros'])
+    # Dominio reducido para que el test sea rápido
+    domains = {col: values[:3] for col, values in domains.items()}
+    scores = compute_scores(app_module.model, names, domains, chunk_size=100)
+    np.save(tmp_path / 'score_table.npy', scores)
+    (tmp_path / 'score_table.json').write_text(json.dumps({
+        'feature_names': names,
+        'domains': domains,
+        'model_sha256': app_module.file_sha256(app_module.MODEL_PATH),
+    }))
+
+    table = app_module.ScoreTable.load(str(tmp_path / 'score_table.npy'), app_module.MODEL_PATH, names)
+    rows = [[domains[col][(i + k) % len(domains[col])] for k, col in enumerate(names)] for i in range(3)]
+    live = app_module.model.predict(rows)
+    for row, expected in zip(rows, live):
+        assert table.lookup(tuple(row)) == expected
+    unseen = list(rows[0])
+    unseen[names.index('Global Region')] = 'Region desconocida'
+    assert table.lookup(tuple(unseen)) is None
+
+
+def test_micro_batcher_merges_concurrent_requests_and_isolates_errors():
+    import asyncio
+    from app import MicroBatcher
+
+    calls = []
+
+    def score_fn(rows):
+        calls.append(len(rows))
+        if any(r[0] < 0 for r in rows):
+            raise ValueError("fila inválida")
+        return [float(r[0]) * 2 for r in rows]
+
+    async def scenario():
+        batcher = MicroBatcher(score_fn, max_size=8, max_wait=0.05)
+        await batcher.start()
+        try:
+            rows = [[i] for i in range(10)] + [[-1]]
+            return await asyncio.gather(*[batcher.submit(r) for r in rows], return_exceptions=True), batcher.stats()
+        finally:
+            await batcher.stop()
+
+    results, stats = asyncio.run(scenario())
+    assert results[:10] == [float(i) * 2 for i in range(10)]
+    assert isinstance(results[10], ValueError)
+    assert stats["rows"] == 11
+    assert stats["batches"] < 11
+    assert max(calls) <= 8
+
+
+def test_micro_batcher_scores_batches_in_parallel_threads():
+    import asyncio
+    import threading
+    from app import MicroBatcher
+
+    # Cada lote espera a que otro esté puntuándose a la vez: con un solo hilo se trabaría
+    barrier = threading.Barrier(2, timeout=5)
+
+    def score_fn(rows):
+        barrier.wait()
+        return [float(r[0]) for r in rows]
+
+    async def scenario():
+        batcher = MicroBatcher(score_fn, max_size=1, max_wait=0, threads=2)
+        await batcher.start()
+        try:
+            return await asyncio.gather(batcher.submit([1]), batcher.submit([2]))
+        finally:
+            await batcher.stop()
+
+    assert asyncio.run(scenario()) == [1.0, 2.0]
+
+
+def test_micro_batcher_stop_fails_the_rows_it_did_not_score():
+    import asyncio
+    import threading
+    from app import MicroBatcher
+
+    release = threading.Event()
+
+    def score_fn(rows):
+        release.wait(5)
+        return [float(r[0]) for r in rows]
+
+    async def scenario():
+        batcher = MicroBatcher(score_fn, max_size=1, max_wait=0, threads=1)
+        await batcher.start()
+        tasks = [asyncio.create_task(batcher.submit([i])) for i in range(4)]
+        # La primera fila queda puntuándose y el resto esperando un hilo libre
+        while batcher.stats()["in_flight"] == 0:
+            await asyncio.sleep(0.01)
+        stopping = asyncio.create_task(batcher.stop())
+        await asyncio.sleep(0.05)
+        release.set()
+        await asyncio.wait_for(stopping, 5)
+        return await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), 5)
+
+    results = asyncio.run(scenario())
+    assert results[0] == 0.0
+    assert all(isinstance(r, RuntimeError) and "se detuvo" in str(r) for r in results[1:])
+
+
+def test_metrics_endpoint_exposes_stage_timings(loaded_client):
+    require_model()
+    loaded_client.post("/predict", json={"revenue_band": "$25B+", "technology_scope": "AI"})
+    loaded_client.post("/predict/batch", json=[{"employee_band": "1-10"}, {"company_id": "x"}])
+    text = loaded_client.get("/metrics").text
+
+    for stage in ("normalize", "features", "align"):
+        assert f'model_api_stage_seconds{{stage="{stage}",quantile="0.99"}}' in text
+    assert 'model_api_stage_seconds_count{stage="predict"}' in text
+    assert 'model_api_requests_total{path="/predict",status="200"}' in text
+    assert 'model_api_errors_total{endpoint="/predict/batch",type="ValidationError"}' in text
+    assert 'model_api_batch_size_count{source="predict_batch"}' in text
+    assert "# TYPE model_api_stage_seconds summary" in text
+
+
+def test_score_bulk_matches_batch_endpoint(loaded_client, tmp_path):
+    import pandas as pd
+    import app as app_module
+
+    require_model()
+    sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+    import score_bulk
+
+    rows = pd.DataFrame({
+        'Company ID': [1, 2, 3, 4, 5],
+        'Revenue Band': [' $500K-$999K', '$25B+', None, '<$100K', '$1M-$2.49M'],
+        'Employee Band': [' 1-9', '5001+', '11-50', None, '10-99'],
+        'Cloud Coverage': ['saas', 'Other', None, 'IAAS', 'PaaS'],
+        'Technology Scope': ['big data and analytics', 'AI', '-', None, 'arvr'],
+    })
+    rows.to_csv(tmp_path / 'in.csv', index=False)
+    score_bulk.run(str(tmp_path / 'in.csv'), str(tmp_path / 'out.csv'), chunk_size=2)
+
+    out = pd.read_csv(tmp_path / 'out.csv')
+    records = [
+        {'company_id': r['Company ID'], 'revenue_band': r['Revenue Band'], 'employee_band': r['Employee Band'],
+         'cloud_coverage': r['Cloud Coverage'], 'technology_scope': r['Technology Scope']}
+        for r in rows.astype(object).where(rows.notna(), None).to_dict(orient='records')
+    ]
+    expected = [r['score'] for r in app_module.score_records(records)]
+    assert list(out['Company ID']) == [1, 2, 3, 4, 5]
+    assert out['score'].tolist() == expected
+
+
+def _reference_groupings(df):
+    """Agrupaciones con Series.apply, tal como las hacía feature_engineering originalmente."""
+    import numpy as np
+    import pandas as pd
+
+    def map_industry(code):
+        if pd.isna(code) or code == 'None':
+            return np.nan
+        code = str(code).strip().upper()
+        for prefix, group in (('B', 'Finanzas'), ('C', 'Salud'), ('D', 'Energia'), ('E', 'Manufactura'),
+                              ('F', 'Servicios'), ('G', 'Sector_publico')):
+            if code.startswith(prefix):
+                return group
+        return 'Otros'
+
+    def make_map(groups):
+        def fn(v):
+            if pd.isna(v) or v == 'None':
+                return np.nan
+            s = str(v).strip()
+            for group, members in groups:
+                if s in members:
+                    return group
+            return 'Otros'
+        return fn
+
+    map_tech = make_map([
+        ('Infraestructura', ['Mobility', 'IoT', 'Cloud']),
+        ('Inteligencia', ['Big Data and Analytics', 'AI', 'Robotics']),
+        ('Usuario', ['AR/VR', '3D Printing', 'Social']),
+        ('Seguridad', ['Security', 'Blockchain']),
+    ])
+    map_partner = make_map([
+        ('Desarrollador', ['Independent Software Vendor (ISV)']),
+        ('Integrador', ['Regional System Integrator (RSI)', 'Global Systems Integrator (GSI)']),
+        ('Proveedor', ['Cloud Service Provider (CSP)', 'Managed Service Provider (MSP)']),
+        ('Revendedor', ['Direct Market Reseller (DMR)', 'Value Added Reseller (VAR)', 'Distributor']),
+    ])
+    sstr = lambda x: None if x is None or (isinstance(x, float) and np.isnan(x)) else str(x)
+    return pd.DataFrame({
+        'Industry_agrupado': df['Industry Detail (Customer)'].apply(map_industry).fillna('Otros'),
+        'Cloud_agrupado': df['Cloud Coverage'].apply(lambda x: 'Publico' if sstr(x) in ['Iaas', 'SaaS', 'PaaS'] else 'Otros'),
+        'Technology_agrupado': df['Technology Scope'].apply(map_tech).fillna('Otros'),
+        'Partner_agrupado': df['Partner Classification'].apply(map_partner).fillna('Otros'),
+    })
+
+
+def test_vectorized_groupings_match_apply_over_all_enum_values():
+    import itertools
+    import numpy as np
+    import pandas as pd
+    from app import CloudCoverageEnum, TechnologyScopeEnum, PartnerClassificationEnum, feature_engineering
+
+    extra = [None, np.nan, '', 'None', ' Cloud ', 'otro valor']
+    industry = ['B1. Banking', 'c2', ' d ', 'E6. Consumer Goods', 'F1', 'g', 'H1', '7'] + extra
+    cloud = [e.value for e in CloudCoverageEnum] + extra
+    tech = [e.value for e in TechnologyScopeEnum] + extra
+    partner = [e.value for e in PartnerClassificationEnum] + extra
+    n = max(len(industry), len(cloud), len(tech), len(partner))
+    cyc = lambda values: list(itertools.islice(itertools.cycle(values), n))
+    df = pd.DataFrame({
+        'Industry Detail (Customer)': cyc(industry),
+        'Cloud Coverage': cyc(cloud),
+        'Technology Scope': cyc(tech),
+        'Partner Classification': cyc(partner),
+    })
+
+    out = feature_engineering(df)
+    expected = _reference_groupings(df)
+    pd.testing.assert_frame_equal(out[expected.columns], expected)
+
+
+def _reference_map(field, v):
+    """Normalización que hacía build_payload con sus dicts de alias locales."""
+    if v is None:
+        return None
+    s = v.strip()
+    if field == 'cloud_coverage':
+        return {'IAAS': 'Iaas', 'PAAS': 'PaaS', 'SAAS': 'SaaS'}.get(s.upper(), s)
+    if field == 'technology_scope':
+        aliases = {
+            'mobility': 'Mobility', 'iot': 'IoT', 'cloud': 'Cloud',
+            'big data and analytics': 'Big Data and Analytics', 'bigdataandanalytics': 'Big Data and Analytics',
+            'ai': 'AI', 'robotics': 'Robotics', 'ar/vr': 'AR/VR', 'arvr': 'AR/VR',
+            '3d printing': '3D Printing', '3dprinting': '3D Printing', 'social': 'Social',
+            'security': 'Security', 'blockchain': 'Blockchain', '-': '-',
+        }
+        key = s.lower().replace(' ', '') if s.lower() not in aliases else s.lower()
+        return aliases.get(s.lower(), aliases.get(key, s))
+    if field == 'partner_classification':
+        aliases = {}
+        for name, code in [('Independent Software Vendor', 'ISV'), ('Regional System Integrator', 'RSI'),
+                           ('Global Systems Integrator', 'GSI'), ('Cloud Service Provider', 'CSP'),
+                           ('Managed Service Provider', 'MSP'), ('Direct Market Reseller', 'DMR'),
+                           ('Value Added Reseller', 'VAR')]:
+            full = f'{name} ({code})'
+            aliases[full.lower()] = full
+            aliases[code.lower()] = full
+        aliases.update({'distributor': 'Distributor', '-': '-'})
+        return aliases.get(s.lower(), s)
+    return s
+
+
+def test_input_normalizer_matches_previous_alias_logic_and_counts_variants():
+    import pandas as pd
+    from app import (
+        InputNormalizer, CloudCoverageEnum, TechnologyScopeEnum, PartnerClassificationEnum, RevenueBandEnum,
+    )
+
+    samples = {
+        'cloud_coverage': [e.value for e in CloudCoverageEnum] + ['iaas', ' SAAS ', 'paas', 'other', 'iAaS', 'x', ''],
+        'technology_scope': [e.value for e in TechnologyScopeEnum] + [
+            'ai', ' Big Data And Analytics ', 'bigdataandanalytics', 'Big Data  and Analytics', 'arvr', 'AR / VR',
+            '3dprinting', '3D printing', 'IOT', 'otro', ''],
+        'partner_classification': [e.value for e in PartnerClassificationEnum] + [
+            'isv', ' GSI ', 'var', 'distributor', 'independent software vendor (isv)', 'Reseller', ''],
+        'revenue_band': [e.value for e in RevenueBandEnum] + [' $500K-$999K', '$25b+', ''],
+    }
+    normalizer = InputNormalizer()
+    for field, values in samples.items():
+        for v in values + [None]:
+            assert normalizer.normalize(field, v) == _reference_map(field, v), (field, v)
+        series = pd.Series(values + [None, values[0]], dtype=object)
+        expected = [_reference_map(field, v) for v in series]
+        assert normalizer.normalize_series(field, series).tolist() == expected
+
+    stats = normalizer.stats()
+    isv = [v for v in stats['partner_classification'] if v['raw'] == 'isv']
+    assert isv and isv[0]['count'] == 2 and isv[0]['canonical'] == 'Independent Software Vendor (ISV)'
+    assert all(v['raw'] != 'Cloud' for v in stats['technology_scope'])
+
+
+def test_model_registry_swaps_versions_and_keeps_in_flight_bundle(loaded_client, tmp_path, monkeypatch):
+    import pandas as pd
+    import app as app_module
+
+    require_model()
+    original = app_module.active_bundle
+    sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+    from publish_model import publish
+
+    repo = tmp_path / 'models'
+    publish('v2', original.model_path, original.encoder_dir, str(repo))
+    (repo / 'v3').mkdir()
+    (repo / 'v3' / app_module.BUNDLE_MODEL_FILE).write_bytes(b'no es un modelo')
+    monkeypatch.setattr(app_module.model_registry, 'repository', str(repo))
+    monkeypatch.setattr(app_module, 'ADMIN_TOKEN', 'secreto')
+    headers = {'X-Admin-Token': 'secreto'}
+    payload = {"revenue_band": "$1M-$2.49M", "employee_band": "11-50", "technology_scope": "AI"}
+
+    try:
+        assert loaded_client.get('/admin/models').status_code == 401
+        assert loaded_client.post('/admin/models/v9/activate', headers=headers).status_code == 404
+        assert loaded_client.get('/admin/models', headers=headers).json()['available'] == ['v2', 'v3']
+
+        before = loaded_client.post('/predict', json=payload).json()
+        activated = loaded_client.post('/admin/models/v2/activate?wait=true', headers=headers).json()
+        assert activated['status'] == 'active' and 'warmup' in activated['model']['timings']
+        after = loaded_client.post('/predict', json=payload).json()
+        batch = loaded_client.post('/predict/batch', json=[payload]).json()
+        assert before['model_version'] == original.version
+        assert after['model_version'] == batch['model_version'] == 'v2'
+        assert after['score'] == before['score']
+
+        # Una petición que empezó con el bundle anterior termina con él
+        X = pd.DataFrame([original.encoder.encode_row(app_module.synthetic_payloads(1)[0])])
+        assert app_module.predict_scores_cached(original.schema.align(X), original)[0] == original.model.predict(original.schema.align(X))[0]
+
+        # Una versión rota no reemplaza a la activa
+        failed = loaded_client.post('/admin/models/v3/activate?wait=true', headers=headers).json()
+        assert 'error' in failed
+        info = loaded_client.get('/admin/models', headers=headers).json()
+        assert info['active']['version'] == 'v2' and 'v3' in info['failed']
+    finally:
+        app_module.activate_bundle(original)
+
+
+def test_ready_probe_reports_startup_and_catboost_is_imported_lazily(loaded_client, monkeypatch):
+    import subprocess
+    import app as app_module
+
+    ready = loaded_client.get('/ready')
+    if app_module.active_bundle is None:
+        assert ready.status_code == 503
+        return
+    report = ready.json()
+    assert ready.status_code == 200 and report['ready']
+    assert {'import', 'request_path'} <= set(report['phases'])
+    assert {'model', 'encoders', 'compile', 'warmup'} <= set(report['model_timings'])
+    assert report['total_seconds'] > 0
+
+    monkeypatch.setattr(app_module, 'startup', app_module.StartupState())
+    assert loaded_client.get('/ready').status_code == 503
+    assert loaded_client.get('/health').json()['status'] == 'ok'
+
+    code = "import sys, app; print('catboost' in sys.modules, 'sklearn' in sys.modules)"
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.split() == ['False', 'False']
+
+
+def test_lite_backend_matches_catboost(loaded_client, tmp_path):
+    import numpy as np
+    import pandas as pd
+    import app as app_module
+
+    require_model()
+    bundle = app_module.active_bundle
+    if bundle.backend != 'catboost':
+        pytest.skip("El bundle activo no usa CatBoost")
+    sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+    import export_lite_model
+
+    export_lite_model.main(bundle.model_path, bundle.encoder_dir, str(tmp_path), None, 2000, 1e-6)
+    lite_path = str(tmp_path / app_module.LITE_MODEL_FILE)
+    lite_bundle = app_module.ModelBundle('lite', bundle.model_path, bundle.encoder_dir, None, lite_path, backend='lite').load()
+    lite_bundle.warm_up()
+    assert lite_bundle.schema.to_dict() == bundle.schema.to_dict()
+
+    features = [bundle.encoder.encode_row(p) for p in app_module.synthetic_payloads(200)]
+    features[0]['Global Region'] = 'Region no vista'
+    X = bundle.schema.align(pd.DataFrame(features))
+    expected = bundle.model.predict(X)
+    np.testing.assert_allclose(lite_bundle.model.predict(X), expected, atol=1e-6, rtol=0)
+    rows = [bundle.schema.row(f) for f in features]
+    np.testing.assert_allclose(lite_bundle.model.predict(rows), expected, atol=1e-6, rtol=0)
+
+
+def test_explain_contributions_add_up_to_score_and_are_cached(loaded_client):
+    require_model()
+    payload = {"revenue_band": "$25B+", "employee_band": "10001+", "global_region": "EMEA", "technology_scope": "AI"}
+    score = loaded_client.post('/predict', json=payload).json()['score']
+    first = loaded_client.post('/predict/explain', json=payload).json()
+    assert first['score'] == pytest.approx(score)
+    total = first['expected_value'] + sum(c['contribution'] for c in first['contributions'])
+    assert total == pytest.approx(score, abs=1e-9)
+    assert len(first['contributions']) == 8
+    impact = [abs(c['contribution']) for c in first['contributions']]
+    assert impact == sorted(impact, reverse=True)
+
+    before = loaded_client.get('/health').json()['explanation_cache']
+    again = loaded_client.post('/predict/explain', json=payload).json()
+    after = loaded_client.get('/health').json()['explanation_cache']
+    assert again == first
+    assert after['hits'] == before['hits'] + 1
+
+    batch = loaded_client.post('/predict/explain/batch', json=[payload, {"company_id": "no-es-un-entero"}, payload]).json()
+    assert batch['count'] == 3 and batch['errors'] == 1
+    assert 'error' in batch['results'][1]
+    for r in (batch['results'][0], batch['results'][2]):
+        assert r['score'] == pytest.approx(first['score'])
+        assert r['contributions'] == first['contributions']
+
+
+def test_explain_batch_isolates_rows_that_shap_cannot_explain(loaded_client, monkeypatch):
+    import pandas as pd
+    import app as app_module
+
+    require_model()
+    good = {"revenue_band": "$25B+", "global_region": "EMEA"}
+    bad = {"revenue_band": "$1M-$2.49M", "global_region": "APJ"}
+    expected = loaded_client.post('/predict/explain', json=good).json()
+    bad_row = app_module.align_features(
+        app_module.feature_engineering(pd.DataFrame([app_module.build_payload(app_module.PredictionInput(**bad))]))
+    )
+    bad_key = next(bad_row.itertuples(index=False, name=None))
+    real_explain = app_module.explain_scores
+
+    def flaky_explain(X, bundle=None):
+        # ShapValues falla con cualquier lote que incluya la fila `bad`
+        if bad_key in set(X.itertuples(index=False, name=None)):
+            raise ValueError("ShapValues falló")
+        return real_explain(X, bundle)
+
+    monkeypatch.setattr(app_module, 'explain_scores', flaky_explain)
+    batch = loaded_client.post('/predict/explain/batch', json=[good, bad, good]).json()
+    assert batch['count'] == 3 and batch['errors'] == 1
+    assert 'ShapValues falló' in batch['results'][1]['error']
+    for r in (batch['results'][0], batch['results'][2]):
+        assert r['score'] == pytest.approx(expected['score'])
+        assert r['contributions'] == expected['contributions']
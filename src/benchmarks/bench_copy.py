@@ -0,0 +1,165 @@
+"""src/benchmarks/bench_copy.py
+
+Compara las dos rutas de carga de upload_data sobre un Postgres real con una tabla
+`technology` sintética:
+
+- rest: lo que hace la ruta REST, DataFrame -> to_dict(records) -> JSON por chunk, que
+  PostgREST inserta con json_populate_recordset (se reproduce esa misma sentencia sobre
+  psycopg2, con el ChunkUploader y la misma concurrencia).
+- copy: pg_loader.copy_dataframe (COPY CSV a staging + merge en una transacción).
+
+Cada ruta corre en un proceso aparte para medir su pico de memoria (ru_maxrss). Las tablas
+se crean con app/sql/create_tables.sql dentro de un schema temporal que se borra al final.
+
+Uso:
+    python src/benchmarks/bench_copy.py --database-url postgresql://postgres@localhost/postgres --rows 500000
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+ROOT = os.path.dirname(SRC)
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+import pandas as pd
+import psycopg2
+
+SCHEMA = "bench_copy"
+TECH_GROUPS = ["Cloud", "Security", "Data & Analytics", "Collaboration", "Infrastructure"]
+CATEGORIES = ["Software", "Hardware", "Services"]
+
+
+def synthetic_technology(rows: int, company_ids, seed: int) -> pd.DataFrame:
+    rng = random.Random(seed)
+    return pd.DataFrame(
+        {
+            "company_id": [rng.choice(company_ids) for _ in range(rows)],
+            "tech_group": [rng.choice(TECH_GROUPS) for _ in range(rows)],
+            "technology": [f"Product {rng.randrange(5000)}" for _ in range(rows)],
+            "detail": [rng.choice([None, "On-premise", "SaaS", "Hybrid"]) for _ in range(rows)],
+            "category": [rng.choice(CATEGORIES) for _ in range(rows)],
+        }
+    )
+
+
+def setup(url: str, companies: int) -> None:
+    with open(os.path.join(ROOT, "app", "sql", "create_tables.sql"), encoding="utf-8") as f:
+        ddl = f.read().replace("public.", f"{SCHEMA}.")
+    conn = psycopg2.connect(url)
+    with conn, conn.cursor() as cur:
+        cur.execute(f"drop schema if exists {SCHEMA} cascade; create schema {SCHEMA}")
+        cur.execute(ddl)
+        cur.execute(
+            f"insert into {SCHEMA}.company (id, name) select gen_random_uuid(), 'c' || i from generate_series(1, %s) i",
+            (companies,),
+        )
+    conn.close()
+
+
+def company_ids(url: str):
+    conn = psycopg2.connect(url)
+    with conn, conn.cursor() as cur:
+        cur.execute(f"select id::text from {SCHEMA}.company order by id")
+        ids = [row[0] for row in cur.fetchall()]
+    conn.close()
+    return ids
+
+
+def run_rest(url: str, df: pd.DataFrame, chunk_size: int, concurrency: int) -> dict:
+    from uploader import ChunkUploader, iter_chunks
+
+    local = threading.local()
+
+    def insert(table_name, rows):
+        if not hasattr(local, "conn"):
+            local.conn = psycopg2.connect(url)
+        with local.conn, local.conn.cursor() as cur:
+            cur.execute(
+                f"insert into {SCHEMA}.{table_name} (company_id, tech_group, technology, detail, category) "
+                f"select company_id, tech_group, technology, detail, category "
+                f"from json_populate_recordset(null::{SCHEMA}.{table_name}, %s)",
+                (json.dumps(rows),),
+            )
+
+    df = df.where(pd.notnull(df), None)
+    records = df.to_dict(orient="records")
+    return ChunkUploader("technology", insert=insert, concurrency=concurrency).upload(
+        iter_chunks(records, chunk_size)
+    )
+
+
+def run_copy(url: str, df: pd.DataFrame) -> dict:
+    from pg_loader import copy_dataframe
+
+    conn = psycopg2.connect(url)
+    try:
+        return copy_dataframe(df, "technology", conn, schema=SCHEMA)
+    finally:
+        conn.close()
+
+
+def child(args) -> dict:
+    df = synthetic_technology(args.rows, company_ids(args.database_url), args.seed)
+    conn = psycopg2.connect(args.database_url)
+    with conn, conn.cursor() as cur:
+        cur.execute(f"truncate {SCHEMA}.technology")
+    conn.close()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    start = time.perf_counter()
+    if args.child == "rest":
+        report = run_rest(args.database_url, df, args.chunk_size, args.concurrency)
+    else:
+        report = run_copy(args.database_url, df)
+    report["wall_seconds"] = round(time.perf_counter() - start, 3)
+    report["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    report["rss_before_mb"] = round(rss_before, 1)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga REST (JSON) vs COPY en Postgres")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"), required=os.getenv("DATABASE_URL") is None)
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--companies", type=int, default=20000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--child", choices=["rest", "copy"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args)))
+        return
+
+    setup(args.database_url, args.companies)
+    try:
+        results = {}
+        for path in ("rest", "copy"):
+            cmd = [sys.executable, os.path.abspath(__file__), "--child", path] + sys.argv[1:]
+            out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+            results[path] = json.loads(out.strip().splitlines()[-1])
+        for path, r in results.items():
+            print(
+                f"{path:<5} {r['wall_seconds']:>8.2f}s  {r['rows_per_s']:>10} filas/s  "
+                f"RSS {r['rss_before_mb']} -> pico {r['peak_rss_mb']} MB"
+            )
+        print(f"COPY es {results['rest']['wall_seconds'] / results['copy']['wall_seconds']:.1f}x más rápido")
+    finally:
+        conn = psycopg2.connect(args.database_url)
+        with conn, conn.cursor() as cur:
+            cur.execute(f"drop schema if exists {SCHEMA} cascade")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""src/benchmarks/bench_location.py
+
+Compara dos versiones de prepare_location_data sobre un df_location_filtered.csv sintético
+(por defecto 1M filas):
+
+- reference: la versión anterior, que por chunk hace un merge contra toda la maestra
+  acumulada sobre (city, state, country), genera los uuid5 fila a fila con itertuples y
+  busca las companies sin ubicación con una comprensión de listas contra un set.
+- vectorized: controllers.location (MasterIndex + CompanyCoverage): claves factorizadas por
+  hash, uuid5 solo para las claves nuevas y anti-join con un arreglo booleano.
+
+Cada combinación versión/modo corre en un proceso aparte dentro de su propio directorio de
+trabajo; al final se verifica que ambas versiones generen las mismas tablas. El mapeo de
+companies se arma en memoria, así que no hace falta Supabase.
+
+Uso:
+    python src/benchmarks/bench_location.py --rows 1000000 --chunk-rows 200000
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import types
+import uuid
+from pathlib import Path
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+import pandas as pd
+
+REGIONS = {
+    "AMER": ["North America", "Latin America"],
+    "EMEA": ["Western Europe", "Eastern Europe", "Middle East", "Africa"],
+    "APJ": ["Asia", "Pacific", "Japan"],
+}
+ADDRESS_TYPES = ["Headquarters", "Branch", "Billing"]
+
+
+def synthetic_location(rows: int, companies: int, cities: int, seed: int) -> pd.DataFrame:
+    rng = random.Random(seed)
+    places = []
+    for i in range(cities):
+        global_region = rng.choice(list(REGIONS))
+        country = f"Country {i % 150}"
+        # Algunas ubicaciones sin estado, como en los datos reales
+        state = None if i % 17 == 0 else f"State {i % 900}"
+        places.append((global_region, rng.choice(REGIONS[global_region]), country, state, f"City {i}"))
+    picked = [places[rng.randrange(cities)] for _ in range(rows)]
+    return pd.DataFrame(
+        {
+            "Company ID": [rng.randrange(companies) for _ in range(rows)],
+            "Global Region": [p[0] for p in picked],
+            "Region": [p[1] for p in picked],
+            "Country": [p[2] for p in picked],
+            "State/Province": [p[3] for p in picked],
+            "City": [p[4] for p in picked],
+            "Address Type": [rng.choice(ADDRESS_TYPES) for _ in range(rows)],
+        }
+    )
+
+
+def company_mapping(companies: int, seed: int):
+    """Mapeo external -> uuid: un 5% de los ids del archivo no existe en `company` y hay
+    companies extra que no aparecen en el archivo (reciben la ubicación UNKNOWN)."""
+    rng = random.Random(seed)
+    mapping = {
+        ext: str(uuid.UUID(int=rng.getrandbits(128)))
+        for ext in range(int(companies * 1.1))
+        if ext >= companies or rng.random() >= 0.05
+    }
+    return mapping, list(mapping.values())
+
+
+def prepare_location_reference() -> None:
+    """prepare_location_data antes de MasterIndex/CompanyCoverage (misma salida)."""
+    from controllers.company_mapping import get_company_mapping
+    from controllers.source import IncrementalDedup, read_source
+    from delta import NATURAL_KEYS, master_id
+    from staging import TableWriter
+
+    columns = {
+        "Company ID": "external_company_id",
+        "Global Region": "global_region",
+        "Region": "region",
+        "Country": "country",
+        "State/Province": "state",
+        "City": "city",
+        "Address Type": "address_type",
+    }
+    loc_cols = ["global_region", "region", "country", "state", "city"]
+    key_cols = NATURAL_KEYS["location_master"]
+    unknown_row = {col: "UNKNOWN" for col in loc_cols}
+    unknown_id = master_id("location_master", *(unknown_row[col] for col in key_cols))
+
+    mapping_ext_to_uuid, all_company_ids = get_company_mapping()
+    master_dedup = IncrementalDedup(subset=key_cols)
+    pair_dedup = IncrementalDedup()
+    master_parts = []
+    used_company_ids = set()
+
+    with TableWriter("location_master") as masters, TableWriter("company_location") as pairs:
+        for df in read_source(
+            "df_location_filtered.csv",
+            usecols=list(columns),
+            dtype={
+                "Global Region": "category",
+                "Region": "category",
+                "Country": "category",
+                "Address Type": "category",
+            },
+        ):
+            df = df.rename(columns=columns)
+            df_new_master = master_dedup.filter(df[loc_cols]).copy()
+            df_new_master["id"] = [
+                master_id("location_master", *key)
+                for key in df_new_master[key_cols].itertuples(index=False, name=None)
+            ]
+            df_new_master = df_new_master[["id"] + loc_cols]
+            masters.append(df_new_master)
+            master_parts.append(df_new_master[["id"] + key_cols])
+            df_loc_master = pd.concat(master_parts, ignore_index=True)
+
+            df_merged = df.merge(df_loc_master, on=key_cols, how="left")
+            df_merged["company_id"] = df_merged["external_company_id"].map(mapping_ext_to_uuid)
+            df_merged["location_id"] = df_merged["id"].fillna(unknown_id)
+            df_company_location = df_merged[["company_id", "location_id", "address_type"]]
+            df_company_location = df_company_location.dropna(subset=["company_id"])
+            used_company_ids.update(df_company_location["company_id"].unique())
+            pairs.append(pair_dedup.filter(df_company_location))
+
+        df_unknown = master_dedup.filter(pd.DataFrame([unknown_row]))
+        if not df_unknown.empty:
+            masters.append(df_unknown.assign(id=unknown_id)[["id"] + loc_cols])
+
+        missing_company_ids = [cid for cid in all_company_ids if cid not in used_company_ids]
+        if missing_company_ids:
+            df_missing = pd.DataFrame(
+                {
+                    "company_id": missing_company_ids,
+                    "location_id": [unknown_id] * len(missing_company_ids),
+                    "address_type": ["UNKNOWN"] * len(missing_company_ids),
+                }
+            )
+            pairs.append(pair_dedup.filter(df_missing))
+
+
+def child(args) -> dict:
+    if args.child == "generate":
+        # Se genera en un proceso aparte: el pico de memoria (ru_maxrss) se hereda al
+        # crear procesos y falsearía la medición de las versiones
+        df = synthetic_location(args.rows, args.companies, args.cities, args.seed)
+        df.to_csv(args.output, index=False)
+        return {"rows": len(df)}
+
+    # El benchmark no habla con Supabase: `db` se reemplaza antes de importar los
+    # controllers y el mapeo de companies se deja ya cacheado
+    sys.modules["db"] = types.SimpleNamespace(supabase=None)
+    from controllers import company_mapping as cm
+
+    cm._cached = company_mapping(args.companies, args.seed)
+
+    if args.child == "reference":
+        prepare = prepare_location_reference
+    else:
+        from controllers.location import prepare_location_data as prepare
+
+    start = time.perf_counter()
+    prepare()
+    seconds = time.perf_counter() - start
+    return {
+        "seconds": seconds,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def run_child(impl: str, workdir: Path, args, stream: bool = False, extra=()) -> dict:
+    env = dict(os.environ, ETL_STREAM="1" if stream else "0", ETL_CHUNK_ROWS=str(args.chunk_rows))
+    cmd = [
+        sys.executable, os.path.abspath(__file__), "--child", impl,
+        "--rows", str(args.rows), "--companies", str(args.companies),
+        "--cities", str(args.cities), "--seed", str(args.seed), *extra,
+    ]
+    out = subprocess.run(cmd, cwd=workdir, env=env, check=True, capture_output=True, text=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def load_output(workdir: Path, name: str) -> pd.DataFrame:
+    df = pd.read_parquet(workdir / "src" / "data" / f"{name}.parquet").astype(object)
+    return df.sort_values(list(df.columns), na_position="first").reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="prepare_location_data: merge por chunk vs claves factorizadas")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--companies", type=int, default=200_000)
+    parser.add_argument("--cities", type=int, default=50_000)
+    parser.add_argument("--chunk-rows", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--child", choices=["generate", "reference", "vectorized"], help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args)))
+        return
+
+    with tempfile.TemporaryDirectory(prefix="bench_location_") as tmp:
+        source = Path(tmp) / "df_location_filtered.csv"
+        print(f"Generando {args.rows} filas sintéticas ({args.cities} ciudades, {args.companies} companies)...")
+        run_child("generate", Path(tmp), args, extra=("--output", str(source)))
+
+        results = []
+        for stream in (False, True):
+            for impl in ("reference", "vectorized"):
+                workdir = Path(tmp) / f"{impl}-{int(stream)}"
+                (workdir / "src" / "data").mkdir(parents=True)
+                (workdir / "src" / "data" / source.name).symlink_to(source)
+                result = run_child(impl, workdir, args, stream=stream)
+                results.append((impl, "stream" if stream else "full", result))
+
+        # Las salidas se comparan al final, para no inflar el pico de memoria que heredan
+        # los procesos hijos
+        for stream in (0, 1):
+            for name in ("location_master", "company_location"):
+                reference = load_output(Path(tmp) / f"reference-{stream}", name)
+                if not reference.equals(load_output(Path(tmp) / f"vectorized-{stream}", name)):
+                    raise SystemExit(f"Las versiones generan {name} distintos")
+
+        print(f"{'versión':<12} {'modo':<8} {'segundos':>9} {'pico MB':>9}")
+        for impl, mode, result in results:
+            print(f"{impl:<12} {mode:<8} {result['seconds']:>9.2f} {result['max_rss_mb']:>9.0f}")
+        print("Salidas idénticas entre versiones.")
+
+
+if __name__ == "__main__":
+    main()
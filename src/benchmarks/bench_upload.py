@@ -0,0 +1,92 @@
+"""src/benchmarks/bench_upload.py
+
+Mide el ChunkUploader de src/uploader.py contra un sustituto local de PostgREST: cada
+inserción espera una latencia fija por petición, falla de forma transitoria con cierta
+probabilidad (503) y rechaza las filas marcadas como inválidas (como una violación de
+restricción). Así se ve el efecto de la concurrencia sin tocar Supabase.
+
+Uso:
+    python src/benchmarks/bench_upload.py --rows 50000 --latency 0.08 --concurrency 1 4 8
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+from uploader import ChunkRejected, ChunkUploader, iter_chunks
+
+
+class ServiceUnavailable(Exception):
+    code = "503"
+
+
+class FakePostgrest:
+    """Tabla en memoria detrás de una 'red' con latencia y fallos transitorios."""
+
+    def __init__(self, latency: float, per_row: float, transient_rate: float, seed: int):
+        self.latency = latency
+        self.per_row = per_row
+        self.transient_rate = transient_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.rows = []
+
+    def insert(self, table_name, rows):
+        time.sleep(self.latency + self.per_row * len(rows))
+        with self.lock:
+            if self.random.random() < self.transient_rate:
+                raise ServiceUnavailable("503 Service Unavailable")
+        bad = [row for row in rows if row["company_id"] is None]
+        if bad:
+            raise ChunkRejected('null value in column "company_id" violates not-null constraint')
+        with self.lock:
+            self.rows.extend(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Filas/s del uploader concurrente contra un PostgREST simulado")
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.08, help="Segundos por petición")
+    parser.add_argument("--per-row", type=float, default=0.00001, help="Segundos por fila dentro de una petición")
+    parser.add_argument("--transient-rate", type=float, default=0.02, help="Probabilidad de 503 por petición")
+    parser.add_argument("--bad-rows", type=int, default=5, help="Filas inválidas repartidas en los datos")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    records = [
+        {"company_id": f"c{i}", "tech_group": rng.choice(["Cloud", "Security", "Data"])}
+        for i in range(args.rows)
+    ]
+    for i in rng.sample(range(args.rows), args.bad_rows):
+        records[i]["company_id"] = None
+
+    rejects = Path(tempfile.mkdtemp(prefix="rejects_"))
+    for concurrency in args.concurrency:
+        server = FakePostgrest(args.latency, args.per_row, args.transient_rate, args.seed)
+        uploader = ChunkUploader(
+            "technology",
+            insert=server.insert,
+            concurrency=concurrency,
+            backoff=0.05,
+            reject_path=rejects / f"technology_{concurrency}.jsonl",
+        )
+        report = uploader.upload(iter_chunks(records, args.chunk_size))
+        assert len(server.rows) == args.rows - args.bad_rows == report["inserted"]
+        print(f"concurrency={concurrency}: {report}")
+    print(f"Rechazos en {rejects}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from db import supabase
+
+# PostgREST corta cada respuesta en max-rows (1000 por defecto en Supabase): se pagina
+PAGE_SIZE = int(os.getenv("COMPANY_MAPPING_PAGE_SIZE", "1000"))
+# Si se define, el mapeo se guarda en este archivo junto con el checksum de la tabla
+CACHE_PATH = os.getenv("COMPANY_MAPPING_CACHE")
+
+_lock = threading.Lock()
+_cached: Optional[Tuple[Dict[str, str], List[str]]] = None
+
+
+def _fetch_rows() -> List[dict]:
+    """Lee todas las filas (id, external_company_id) de company, página a página."""
+    rows: List[dict] = []
+    start = 0
+    while True:
+        resp = (
+            supabase.table("company")
+            .select("id, external_company_id")
+            .order("id")
+            .range(start, start + PAGE_SIZE - 1)
+            .execute()
+        )
+        page = getattr(resp, "data", []) or []
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+        start += PAGE_SIZE
+
+
+def _table_checksum() -> Optional[str]:
+    """
+    Checksum de (id, external_company_id) calculado en la base con la función
+    company_mapping_checksum() de app/sql/create_tables.sql; None si no está disponible.
+    """
+    try:
+        resp = supabase.rpc("company_mapping_checksum").execute()
+    except Exception as e:
+        print(f"No se pudo calcular el checksum de 'company' ({e}); no se usa la caché en disco")
+        return None
+    return getattr(resp, "data", None) or None
+
+
+def _load_file(path: Path, checksum: str) -> Optional[List[dict]]:
+    if not path.exists():
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if saved.get("checksum") != checksum:
+        return None
+    return [{"id": id_, "external_company_id": ext} for id_, ext in saved["rows"]]
+
+
+def _save_file(path: Path, checksum: str, rows: List[dict]) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "checksum": checksum,
+                "rows": [[row["id"], row.get("external_company_id")] for row in rows],
+            },
+            f,
+        )
+    os.replace(tmp, path)
+
+
+def _load_rows() -> List[dict]:
+    if not CACHE_PATH:
+        return _fetch_rows()
+    checksum = _table_checksum()
+    if checksum is None:
+        return _fetch_rows()
+    path = Path(CACHE_PATH)
+    rows = _load_file(path, checksum)
+    if rows is not None:
+        print(f"Mapeo de company leído de {path} ({len(rows)} filas)")
+        return rows
+    rows = _fetch_rows()
+    _save_file(path, checksum, rows)
+    return rows
+
+
+def get_company_mapping() -> Tuple[Dict[str, str], List[str]]:
+    """
+    Obtiene el mapeo external_company_id -> company.id y la lista de ids.
+
+    Se consulta una sola vez por proceso y se comparte entre todos los prepare_* (también
+    entre hilos: el primero lo carga y el resto espera). Los resultados no deben modificarse.
+    """
+    global _cached
+    with _lock:
+        if _cached is None:
+            rows = _load_rows()
+            ids = [row["id"] for row in rows]
+            mapping = {
+                row["external_company_id"]: row["id"]
+                for row in rows
+                if row.get("external_company_id") is not None
+            }
+            _cached = (mapping, ids)
+            print(f"Mapeo de company cargado: {len(ids)} filas")
+        return _cached
+
+
+def clear_company_mapping() -> None:
+    """Descarta el mapeo en memoria (p. ej. después de volver a subir company)."""
+    global _cached
+    with _lock:
+        _cached = None
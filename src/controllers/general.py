@@ -1,107 +1,86 @@
-from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import List, Tuple
 
 import pandas as pd
 
-from db import supabase
+from controllers.company_mapping import get_company_mapping
+from controllers.source import IncrementalDedup, read_source, source_columns
+from staging import TableWriter
 
-BASE_DATA_DIR = Path("src/data")
 
-
-def _read_csv(file_name: str) -> pd.DataFrame:
-    """Lee un CSV desde el directorio de datos."""
-    file_path = BASE_DATA_DIR / file_name
-    return pd.read_csv(file_path)
-
-
-def _get_company_mapping() -> Tuple[Dict[str, str], List[str]]:
-    """Obtiene el mapeo external_company_id -> company.id y la lista de ids."""
-    resp = supabase.table("company").select("id, external_company_id").execute()
-    rows = getattr(resp, "data", []) or []
-    ids = [row["id"] for row in rows]
-    mapping = {
-        row["external_company_id"]: row["id"]
-        for row in rows
-        if row.get("external_company_id") is not None
-    }
-    return mapping, ids
+def _drop_unmapped(df: pd.DataFrame, columns: List[str]) -> Tuple[pd.DataFrame, int]:
+    """Quita las filas sin company_id en alguna de `columns`; devuelve también cuántas."""
+    mask = df[columns].notnull().all(axis=1)
+    return df[mask], int((~mask).sum())
 
 
 def prepare_score_data() -> None:
     """Prepara datos de score para la tabla score."""
-    df = _read_csv("df_score.csv")
-    print("Columnas df_score:", df.columns.tolist())
-
-    df = df.rename(
-        columns={
-            "Company ID": "external_company_id",
-            "Relevance": "relevance",
-        }
-    )
+    mapping, _ = get_company_mapping()
+    dedup = IncrementalDedup()
+    removed = 0
+
+    with TableWriter("score_ready") as out:
+        for df in read_source(
+            "df_score.csv",
+            usecols=["Company ID", "Relevance"],
+            na_values={"Relevance": ["-"]},
+        ):
+            df = df.rename(
+                columns={
+                    "Company ID": "external_company_id",
+                    "Relevance": "relevance",
+                }
+            )
+
+            df["company_id"] = df["external_company_id"].map(mapping)
+            df, dropped = _drop_unmapped(df, ["company_id"])
+            removed += dropped
+
+            df = df.drop(columns=["external_company_id"])
+            out.append(dedup.filter(df))
 
-    df = df[["external_company_id", "relevance"]]
-
-    df = df.replace("-", None)
-    df = df.where(pd.notnull(df), None)
-
-    mapping, _ = _get_company_mapping()
-    df["company_id"] = df["external_company_id"].map(mapping)
-
-    before = len(df)
-    df = df[df["company_id"].notnull()]
-    removed = before - len(df)
     if removed > 0:
         print(
             f"{removed} filas de score descartadas por no encontrar company_id en 'company'"
         )
 
-    df = df.drop(columns=["external_company_id"])
-    df = df.drop_duplicates().reset_index(drop=True)
-
-    output_path = BASE_DATA_DIR / "score_ready.csv"
-    df.to_csv(output_path, index=False)
-    print(f"score_ready.csv generado con {len(df)} filas")
-
 
 def prepare_cloud_data() -> None:
     """Prepara datos de cloud para la tabla cloud."""
-    df = _read_csv("df_cloud_filtered.csv")
-    print("Columnas df_cloud:", df.columns.tolist())
+    mapping, _ = get_company_mapping()
+    removed = 0
+
+    with TableWriter("cloud_ready") as out:
+        for df in read_source(
+            "df_cloud_filtered.csv",
+            usecols=["Company ID", "Cloud Coverage"],
+            dtype={"Cloud Coverage": "category"},
+            na_values={"Cloud Coverage": ["-"]},
+        ):
+            df = df.rename(
+                columns={
+                    "Company ID": "external_company_id",
+                    "Cloud Coverage": "coverage",
+                }
+            )
+
+            df["company_id"] = df["external_company_id"].map(mapping)
+            df, dropped = _drop_unmapped(df, ["company_id"])
+            removed += dropped
+
+            out.append(df[["company_id", "coverage"]])
 
-    df = df.rename(
-        columns={
-            "Company ID": "external_company_id",
-            "Cloud Coverage": "coverage",
-        }
-    )
-
-    df["coverage"] = df["coverage"].replace("-", None)
-
-    mapping, _ = _get_company_mapping()
-    df["company_id"] = df["external_company_id"].map(mapping)
-
-    before = len(df)
-    df = df[df["company_id"].notnull()]
-    removed = before - len(df)
     if removed > 0:
         print(
             f"{removed} filas de cloud descartadas por no encontrar company_id en 'company'"
         )
 
-    df = df[["company_id", "coverage"]]
-
-    output_path = BASE_DATA_DIR / "cloud_ready.csv"
-    df.to_csv(output_path, index=False)
-    print(f"cloud_ready.csv generado con {len(df)} filas")
-
 
 def prepare_partner_class_data() -> None:
     """Prepara datos de clasificación de partners para la tabla partner_classification."""
-    df = _read_csv("df_partners_class_filtered.csv")
-    print("Columnas df_partners_class:", df.columns.tolist())
-
+    file_name = "df_partners_class_filtered.csv"
     class_col = None
-    for col in df.columns:
+    for col in source_columns(file_name):
         if col.strip().startswith("Partner Class"):
             class_col = col
             break
@@ -111,138 +90,131 @@ def prepare_partner_class_data() -> None:
             "No se encontró ninguna columna que empiece por 'Partner Class'"
         )
 
-    df = df.rename(
-        columns={
-            "Company ID": "external_company_id",
-            class_col: "classification",
-        }
-    )
-
-    df = df[["external_company_id", "classification"]]
-
-    mapping, _ = _get_company_mapping()
-    df["company_id"] = df["external_company_id"].map(mapping)
+    mapping, _ = get_company_mapping()
+    dedup = IncrementalDedup()
+    removed = 0
+
+    with TableWriter("partner_classification_ready") as out:
+        for df in read_source(
+            file_name,
+            usecols=["Company ID", class_col],
+            dtype={class_col: "category"},
+        ):
+            df = df.rename(
+                columns={
+                    "Company ID": "external_company_id",
+                    class_col: "classification",
+                }
+            )
+
+            df["company_id"] = df["external_company_id"].map(mapping)
+            df, dropped = _drop_unmapped(df, ["company_id"])
+            removed += dropped
+
+            df = df.drop(columns=["external_company_id"])
+            out.append(dedup.filter(df))
 
-    before = len(df)
-    df = df[df["company_id"].notnull()]
-    removed = before - len(df)
     if removed > 0:
         print(
             f"{removed} filas de partner_classification descartadas por no encontrar company_id en 'company'"
         )
 
-    df = df.drop(columns=["external_company_id"])
-    df = df.drop_duplicates().reset_index(drop=True)
-
-    output_path = BASE_DATA_DIR / "partner_classification_ready.csv"
-    df.to_csv(output_path, index=False)
-    print(f"partner_classification_ready.csv generado con {len(df)} filas")
-
 
 def prepare_technology_sc_data() -> None:
     """Prepara datos de technology scope para la tabla technology_sc."""
-    df = _read_csv("df_technology_sc_filtered.csv")
-    print("Columnas df_technology_sc:", df.columns.tolist())
+    mapping, _ = get_company_mapping()
+    dedup = IncrementalDedup()
+    removed = 0
+
+    with TableWriter("technology_sc_ready") as out:
+        for df in read_source(
+            "df_technology_sc_filtered.csv",
+            usecols=["Company ID", "Technology Scope"],
+            dtype={"Technology Scope": "category"},
+            na_values={"Technology Scope": ["-"]},
+        ):
+            df = df.rename(
+                columns={
+                    "Company ID": "external_company_id",
+                    "Technology Scope": "scope",
+                }
+            )
+
+            df["company_id"] = df["external_company_id"].map(mapping)
+            df, dropped = _drop_unmapped(df, ["company_id"])
+            removed += dropped
+
+            out.append(dedup.filter(df[["company_id", "scope"]]))
 
-    df = df.rename(
-        columns={
-            "Company ID": "external_company_id",
-            "Technology Scope": "scope",
-        }
-    )
-
-    df["scope"] = df["scope"].replace("-", None)
-
-    mapping, _ = _get_company_mapping()
-    df["company_id"] = df["external_company_id"].map(mapping)
-
-    before = len(df)
-    df = df[df["company_id"].notnull()]
-    removed = before - len(df)
     if removed > 0:
         print(
             f"{removed} filas de technology_sc descartadas por no encontrar company_id en 'company'"
         )
 
-    df = df[["company_id", "scope"]]
-    df = df.drop_duplicates().reset_index(drop=True)
-
-    output_path = BASE_DATA_DIR / "technology_sc_ready.csv"
-    df.to_csv(output_path, index=False)
-    print(f"technology_sc_ready.csv generado con {len(df)} filas")
-
 
 def prepare_technology_data() -> None:
     """Prepara datos de tecnología para la tabla technology."""
-    df = _read_csv("df_technology.csv")
-    print("Columnas df_technology:", df.columns.tolist())
-
-    df = df.rename(
-        columns={
-            "Company ID": "external_company_id",
-            "Technology Group": "tech_group",
-            "Technology": "technology",
-            "Technology Detail": "detail",
-            "Technology Category": "category",
-        }
-    )
-
-    df = df[
-        ["external_company_id", "tech_group", "technology", "detail", "category"]
-    ]
-
-    df = df.replace("-", None)
-    df = df.where(pd.notnull(df), None)
-
-    mapping, _ = _get_company_mapping()
-    df["company_id"] = df["external_company_id"].map(mapping)
-
-    before = len(df)
-    df = df[df["company_id"].notnull()]
-    removed = before - len(df)
+    columns = {
+        "Company ID": "external_company_id",
+        "Technology Group": "tech_group",
+        "Technology": "technology",
+        "Technology Detail": "detail",
+        "Technology Category": "category",
+    }
+    text_columns = [col for col in columns if col != "Company ID"]
+
+    mapping, _ = get_company_mapping()
+    dedup = IncrementalDedup()
+    removed = 0
+
+    with TableWriter("technology_ready") as out:
+        for df in read_source(
+            "df_technology.csv",
+            usecols=list(columns),
+            dtype={col: "category" for col in text_columns},
+            na_values={col: ["-"] for col in columns},
+        ):
+            df = df.rename(columns=columns)
+
+            df["company_id"] = df["external_company_id"].map(mapping)
+            df, dropped = _drop_unmapped(df, ["company_id"])
+            removed += dropped
+
+            df = df.drop(columns=["external_company_id"])
+            out.append(dedup.filter(df))
+
     if removed > 0:
         print(
             f"{removed} filas de technology descartadas por no encontrar company_id en 'company'"
         )
 
-    df = df.drop(columns=["external_company_id"])
-    df = df.drop_duplicates().reset_index(drop=True)
-
-    output_path = BASE_DATA_DIR / "technology_ready.csv"
-    df.to_csv(output_path, index=False)
-    print(f"technology_ready.csv generado con {len(df)} filas")
-
 
 def prepare_partner_vendor_data() -> None:
     """Prepara relaciones partner-vendor para la tabla partner_vendor."""
-    df = _read_csv("df_partners_vendors.csv")
-    print("Columnas df_partners_vendors:", df.columns.tolist())
-
-    df = df.rename(
-        columns={
-            "Company ID (Partner)": "external_partner_id",
-            "Company ID (Vendor)": "external_vendor_id",
-        }
-    )
-
-    df = df[["external_partner_id", "external_vendor_id"]]
+    mapping, _ = get_company_mapping()
+    dedup = IncrementalDedup()
+    removed = 0
+
+    with TableWriter("partner_vendor_ready") as out:
+        for df in read_source(
+            "df_partners_vendors.csv",
+            usecols=["Company ID (Partner)", "Company ID (Vendor)"],
+        ):
+            df = df.rename(
+                columns={
+                    "Company ID (Partner)": "external_partner_id",
+                    "Company ID (Vendor)": "external_vendor_id",
+                }
+            )
+
+            df["partner_id"] = df["external_partner_id"].map(mapping)
+            df["vendor_id"] = df["external_vendor_id"].map(mapping)
+            df, dropped = _drop_unmapped(df, ["partner_id", "vendor_id"])
+            removed += dropped
+
+            out.append(dedup.filter(df[["partner_id", "vendor_id"]]))
 
-    mapping, _ = _get_company_mapping()
-
-    df["partner_id"] = df["external_partner_id"].map(mapping)
-    df["vendor_id"] = df["external_vendor_id"].map(mapping)
-
-    before = len(df)
-    df = df[df["partner_id"].notnull() & df["vendor_id"].notnull()]
-    removed = before - len(df)
     if removed > 0:
         print(
             f"{removed} relaciones partner-vendor descartadas por company_id inexistente"
         )
-
-    df = df[["partner_id", "vendor_id"]]
-    df = df.drop_duplicates().reset_index(drop=True)
-
-    output_path = BASE_DATA_DIR / "partner_vendor_ready.csv"
-    df.to_csv(output_path, index=False)
-    print(f"partner_vendor_ready.csv generado con {len(df)} filas")
@@ -0,0 +1,141 @@
+from typing import Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from delta import master_ids
+from staging import BASE_DATA_DIR, STREAM_CHUNK_ROWS, STREAM_MODE
+
+
+def source_columns(file_name: str) -> List[str]:
+    """Encabezado de un CSV de origen, sin leer sus filas."""
+    return pd.read_csv(BASE_DATA_DIR / file_name, nrows=0).columns.tolist()
+
+
+def read_source(
+    file_name: str,
+    usecols: Optional[Sequence[str]] = None,
+    dtype: Optional[Mapping[str, str]] = None,
+    na_values: Optional[Mapping[str, Sequence[str]]] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Lee un CSV de origen solo con las columnas `usecols` y los tipos `dtype` (categorías
+    para los textos repetidos). Devuelve el archivo entero como un único DataFrame, o en
+    chunks si STREAM_MODE está activo; los prepare_* procesan ambos casos igual.
+    """
+    path = BASE_DATA_DIR / file_name
+    print(f"Columnas de {file_name}:", list(usecols) if usecols else source_columns(file_name))
+    options = dict(usecols=usecols, dtype=dtype, na_values=na_values)
+    if not STREAM_MODE:
+        yield pd.read_csv(path, **options)
+        return
+    yield from pd.read_csv(path, chunksize=STREAM_CHUNK_ROWS, **options)
+
+
+def _key_text(values: pd.Series) -> pd.Series:
+    """
+    Valores de una columna como texto ("string", nulos como <NA>). Los float enteros se
+    escriben sin decimales, igual que una columna int: la misma clave da el mismo texto
+    aunque un chunk traiga la columna como float por tener NaN.
+    """
+    text = values.astype("string")
+    if pd.api.types.is_float_dtype(values):
+        whole = values.notna() & (values.abs() < 2.0**63) & (values == np.floor(values))
+        text[whole] = values[whole].astype("int64").astype("string")
+    return text
+
+
+def _key_hashes(df: pd.DataFrame) -> np.ndarray:
+    """
+    Hash de 64 bits por fila que no depende del dtype que pandas infiere en cada chunk: una
+    columna toda en NaN llega como float64 y un NaN float no hashea igual que uno de texto,
+    así que las columnas se pasan antes a texto.
+    """
+    keys = pd.DataFrame({col: _key_text(df[col]) for col in df.columns}, index=df.index)
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy(dtype=np.uint64)
+
+
+class IncrementalDedup:
+    """
+    drop_duplicates a lo largo de varios chunks: recuerda un hash de 64 bits por fila ya
+    emitida (8 bytes por fila única, en un arreglo ordenado) y en cada chunk deja solo las
+    filas que no aparecieron antes, conservando la primera aparición como drop_duplicates.
+    """
+
+    def __init__(self, subset: Optional[Sequence[str]] = None):
+        self.subset = list(subset) if subset else None
+        self.seen = np.empty(0, dtype=np.uint64)
+
+    def filter(self, df: pd.DataFrame) -> pd.DataFrame:
+        if df.empty:
+            return df
+        hashes = _key_hashes(df[self.subset] if self.subset else df)
+        unique, first = np.unique(hashes, return_index=True)
+        pos = np.searchsorted(self.seen, unique)
+        found = pos < len(self.seen)
+        found[found] = self.seen[pos[found]] == unique[found]
+        # `unique` viene ordenado y sus posiciones en `seen` ya están calculadas: insertar
+        # mantiene `seen` ordenado sin volver a ordenar todo
+        self.seen = np.insert(self.seen, pos[~found], unique[~found])
+        keep = np.zeros(len(df), dtype=bool)
+        keep[first[~found]] = True
+        return df[keep]
+
+
+class MasterIndex:
+    """
+    Ids de una tabla maestra por clave natural, construida chunk a chunk. Cada clave se
+    reduce a un hash de 64 bits y se factoriza: el "join" de un chunk contra la maestra es
+    una búsqueda binaria por clave distinta, sin merge sobre las columnas de texto, y los
+    ids (uuid5 de delta.master_ids) se generan de una vez solo para las claves nuevas.
+    """
+
+    def __init__(self, table_name: str, key_cols: Sequence[str]):
+        self.table_name = table_name
+        self.key_cols = list(key_cols)
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.ids = np.empty(0, dtype=object)
+
+    def assign(self, df: pd.DataFrame) -> Tuple[np.ndarray, pd.DataFrame]:
+        """
+        Devuelve el id de cada fila de `df` y las filas (primera aparición) con claves que
+        la maestra no tenía, ya con su columna "id".
+        """
+        hashes = _key_hashes(df[self.key_cols])
+        codes, uniques = pd.factorize(hashes)
+        first = np.flatnonzero(~pd.Series(codes).duplicated().to_numpy())
+        uniques = np.asarray(uniques, dtype=np.uint64)
+
+        pos = np.searchsorted(self.hashes, uniques)
+        found = pos < len(self.hashes)
+        found[found] = self.hashes[pos[found]] == uniques[found]
+
+        new_rows = df.iloc[first[~found]].copy()
+        new_ids = master_ids(self.table_name, new_rows[self.key_cols])
+        new_rows.insert(0, "id", new_ids)
+
+        order = np.argsort(uniques[~found], kind="stable")
+        insert_at = pos[~found][order]
+        self.hashes = np.insert(self.hashes, insert_at, uniques[~found][order])
+        self.ids = np.insert(self.ids, insert_at, new_ids[order])
+
+        unique_ids = self.ids[np.searchsorted(self.hashes, uniques)]
+        return unique_ids[codes], new_rows
+
+
+class CompanyCoverage:
+    """
+    Anti-join de companies: marca en un arreglo booleano (una posición por company) las que
+    aparecen en algún chunk y al final devuelve las que no aparecieron, en su orden original.
+    """
+
+    def __init__(self, all_company_ids: Sequence[str]):
+        self.index = pd.Index(all_company_ids)
+        self.used = np.zeros(len(self.index), dtype=bool)
+
+    def add(self, company_ids: pd.Series) -> None:
+        pos = self.index.get_indexer(company_ids.unique())
+        self.used[pos[pos >= 0]] = True
+
+    def missing(self) -> np.ndarray:
+        return self.index.to_numpy()[~self.used]
@@ -0,0 +1,194 @@
+import hashlib
+import os
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Claves naturales de cada tabla (restricciones unique/primary key de app/sql/create_tables.sql).
+# Las tablas 1-N sin clave natural (score, cloud, technology...) están en OWNER_COLUMNS.
+NATURAL_KEYS: Dict[str, List[str]] = {
+    "company": ["external_company_id"],
+    "industry_master": ["sector", "detail"],
+    "location_master": ["city", "state", "country"],
+    "company_industry": ["company_id", "industry_id"],
+    "company_location": ["company_id", "location_id", "address_type"],
+    "partner_vendor": ["partner_id", "vendor_id"],
+}
+
+# Tablas 1-N contra company sin clave natural: se identifican por la company dueña de las
+# filas, así que para no duplicarlas se reemplazan todas las filas de esas companies.
+OWNER_COLUMNS: Dict[str, str] = {
+    "score": "company_id",
+    "cloud": "company_id",
+    "partner_classification": "company_id",
+    "technology_sc": "company_id",
+    "technology": "company_id",
+}
+
+# Columnas de on_conflict de los upserts: la clave natural, salvo en las maestras, que usan
+# `id` (uuid5 de la clave natural, ver master_id). Un NULL en la clave natural (p. ej. una
+# ciudad sin estado) nunca coincide en on_conflict y la fila chocaría con su propio id.
+UPSERT_KEYS: Dict[str, List[str]] = {
+    **NATURAL_KEYS,
+    "industry_master": ["id"],
+    "location_master": ["id"],
+}
+
+# Espacio de nombres fijo para los ids de las tablas maestras: la misma clave natural da el
+# mismo id en cualquier corrida, así una recarga se puede conciliar con lo ya cargado
+MASTER_ID_NAMESPACE = uuid.UUID("6f1c2f0e-5d3a-4c47-9a57-2b6c1d8e4f10")
+
+DELTA_DIR = Path(os.getenv("DELTA_DIR", "src/data/.delta"))
+
+
+def master_id(table_name: str, *values) -> str:
+    """Id determinista (uuid5) de una fila maestra a partir de su clave natural."""
+    parts = ["" if value is None or pd.isna(value) else str(value) for value in values]
+    return str(uuid.uuid5(MASTER_ID_NAMESPACE, "|".join([table_name] + parts)))
+
+
+def master_ids(table_name: str, keys: pd.DataFrame) -> np.ndarray:
+    """
+    master_id de muchas claves a la vez (pensado para claves ya únicas). Es el mismo uuid5,
+    armado a mano: sha1 por nombre y los bits de versión/variante y el formato en bloque,
+    sin crear un uuid.UUID por fila.
+    """
+    names = pd.Series(table_name, index=keys.index, dtype="str")
+    for col in keys.columns:
+        values = keys[col].astype(object)
+        names = names + "|" + values.where(values.notna(), "").astype("str")
+    prefix = MASTER_ID_NAMESPACE.bytes
+    digests = b"".join([hashlib.sha1(prefix + name.encode()).digest()[:16] for name in names])
+    raw = np.frombuffer(digests, dtype=np.uint8).reshape(-1, 16).copy()
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x50  # versión 5
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80  # variante RFC 4122
+    hex_ids = raw.tobytes().hex()
+    return np.array(
+        [
+            f"{hex_ids[i:i + 8]}-{hex_ids[i + 8:i + 12]}-{hex_ids[i + 12:i + 16]}-"
+            f"{hex_ids[i + 16:i + 20]}-{hex_ids[i + 20:i + 32]}"
+            for i in range(0, len(hex_ids), 32)
+        ],
+        dtype=object,
+    )
+
+
+def _hash_rows(df: pd.DataFrame) -> np.ndarray:
+    return pd.util.hash_pandas_object(df, index=False).to_numpy(dtype=np.uint64)
+
+
+def _owner_hash(owners: np.ndarray) -> np.ndarray:
+    return pd.util.hash_array(np.asarray(owners, dtype=object))
+
+
+class TableFingerprint:
+    """
+    Huella de lo que se subió en la última corrida exitosa de una tabla: un hash por fila y
+    uno por clave natural. En las tablas de OWNER_COLUMNS la unidad es la company dueña: un
+    hash de todas sus filas, el de su id y los ids (para borrar las que ya no vienen). Con
+    ella, `changes` deja solo las filas nuevas o modificadas (en OWNER_COLUMNS, todas las
+    filas de las companies con algún cambio).
+    """
+
+    def __init__(self, table_name: str, directory: Optional[Path] = None):
+        self.table_name = table_name
+        self.path = Path(directory or DELTA_DIR) / f"{table_name}.npz"
+        self.keys: Optional[Sequence[str]] = NATURAL_KEYS.get(table_name)
+        self.owner: Optional[str] = OWNER_COLUMNS.get(table_name)
+        self._parts: List[Tuple[np.ndarray, np.ndarray]] = []
+
+    def _load(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if not self.path.exists():
+            return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.uint64), np.empty(0, dtype=str)
+        with np.load(self.path) as saved:
+            owners = saved["owners"] if "owners" in saved.files else np.empty(0, dtype=str)
+            return saved["row_hash"], saved["key_hash"], owners
+
+    def _by_owner(self, df: pd.DataFrame) -> bool:
+        return self.owner is not None and self.owner in df.columns
+
+    def _groups(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Companies de `df` (sin repetir), el hash de las filas de cada una y la company de cada fila."""
+        row_hash = _hash_rows(df[sorted(df.columns)])
+        codes, owners = pd.factorize(df[self.owner], use_na_sentinel=False)
+        # Suma (módulo 2**64) de los hashes de sus filas: no depende del orden de las filas
+        group_hash = np.zeros(len(owners), dtype=np.uint64)
+        np.add.at(group_hash, codes, row_hash)
+        return np.asarray(owners, dtype=str), group_hash, codes
+
+    def _hashes(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        row_hash = _hash_rows(df[sorted(df.columns)])
+        keys = [col for col in (self.keys or []) if col in df.columns]
+        key_hash = _hash_rows(df[keys]) if keys else row_hash
+        return row_hash, key_hash
+
+    def changes(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, int]]:
+        """
+        Filas de `df` que no estaban idénticas en la última carga y un resumen con filas
+        nuevas, modificadas (misma clave, otro contenido) y ausentes respecto de la anterior.
+        En las tablas de OWNER_COLUMNS el resumen cuenta companies en lugar de filas.
+        """
+        prev_rows, prev_keys, _ = self._load()
+        if self._by_owner(df):
+            owners, group_hash, codes = self._groups(df)
+            key_hash = _owner_hash(owners)
+            changed_group = ~np.isin(group_hash, prev_rows)
+            changed, existing_key = changed_group[codes], np.isin(key_hash, prev_keys)
+            counted = changed_group
+        else:
+            row_hash, key_hash = self._hashes(df)
+            changed = ~np.isin(row_hash, prev_rows)
+            existing_key = np.isin(key_hash, prev_keys)
+            counted = changed
+        stats = {
+            "rows": len(df),
+            "new": int((counted & ~existing_key).sum()),
+            "updated": int((counted & existing_key).sum()),
+            "unchanged": int((~counted).sum()),
+            "missing": int((~np.isin(prev_keys, key_hash)).sum()),
+        }
+        return df[changed], stats
+
+    def removed_owners(self, df: pd.DataFrame) -> List[str]:
+        """Companies que tenían filas en la última carga y ya no aparecen en `df`."""
+        _, _, prev_owners = self._load()
+        if not self._by_owner(df) or not len(prev_owners):
+            return []
+        current = np.asarray(df[self.owner].unique(), dtype=str)
+        return prev_owners[~np.isin(prev_owners, current)].tolist()
+
+    def add(self, df: pd.DataFrame) -> None:
+        """Suma un lote de la tabla a la huella que guarda `save()` (subidas por lotes)."""
+        if self._by_owner(df):
+            owners, group_hash, _ = self._groups(df)
+            self._parts.append((owners, group_hash))
+        else:
+            row_hash, key_hash = self._hashes(df)
+            self._parts.append((np.unique(row_hash), np.unique(key_hash)))
+
+    def save(self, df: Optional[pd.DataFrame] = None) -> None:
+        """
+        Guarda la huella de `df` (o de los lotes pasados a `add`); llamar solo cuando la
+        subida terminó bien.
+        """
+        if df is not None:
+            self.add(df)
+        parts, self._parts = self._parts, []
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.stem + ".tmp.npz")
+        if self.owner is not None and parts and parts[0][0].dtype.kind == "U":
+            # Una company puede venir repartida en varios lotes: se juntan sus sumas
+            codes, owners = pd.factorize(np.concatenate([part[0] for part in parts]))
+            group_hash = np.zeros(len(owners), dtype=np.uint64)
+            np.add.at(group_hash, codes, np.concatenate([part[1] for part in parts]))
+            owners = np.asarray(owners, dtype=str)
+            np.savez(tmp, row_hash=group_hash, key_hash=_owner_hash(owners), owners=owners)
+        else:
+            empty = np.empty(0, dtype=np.uint64)
+            row_hash = np.unique(np.concatenate([part[0] for part in parts] or [empty]))
+            key_hash = np.unique(np.concatenate([part[1] for part in parts] or [empty]))
+            np.savez(tmp, row_hash=row_hash, key_hash=key_hash)
+        os.replace(tmp, self.path)
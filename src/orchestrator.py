@@ -0,0 +1,178 @@
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+
+@dataclass(frozen=True)
+class Step:
+    """
+    Paso del ETL: se ejecuta cuando todos los pasos de `deps` terminaron bien. Si una
+    corrida anterior lo dejó a medio hacer, se ejecuta `resume` en su lugar (p. ej. una
+    subida que no duplica lo que ya alcanzó a entrar); sin `resume` se repite `func`.
+    """
+
+    name: str
+    func: Callable[[], None]
+    deps: Tuple[str, ...] = ()
+    resume: Optional[Callable[[], None]] = None
+
+
+class StepState:
+    """
+    Marcas de pasos iniciados y completados, persistidas en un JSON para poder reanudar
+    una carga fallida sin volver a insertar las tablas que ya terminaron.
+    """
+
+    def __init__(self, path: Optional[Path]):
+        self.path = Path(path) if path else None
+        self.completed: Dict[str, dict] = {}
+        self.started: Set[str] = set()
+        if self.path and self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                saved = json.load(f)
+            self.completed = saved.get("completed", {})
+            self.started = set(saved.get("started", []))
+
+    def is_done(self, name: str) -> bool:
+        return name in self.completed
+
+    def was_interrupted(self, name: str) -> bool:
+        """True si una corrida anterior inició el paso y no llegó a completarlo."""
+        return name in self.started and name not in self.completed
+
+    def mark_started(self, name: str) -> None:
+        self.started.add(name)
+        self._save()
+
+    def mark_done(self, name: str, seconds: float) -> None:
+        self.completed[name] = {
+            "finished_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "seconds": round(seconds, 3),
+        }
+        self._save()
+
+    def reset(self) -> None:
+        self.completed = {}
+        self.started = set()
+        if self.path and self.path.exists():
+            self.path.unlink()
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        # Escritura atómica: un corte a mitad de escritura no deja un estado corrupto
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"completed": self.completed, "started": sorted(self.started)}, f, indent=2)
+        os.replace(tmp, self.path)
+
+
+def _check_graph(steps: Sequence[Step]) -> None:
+    """Valida nombres únicos, dependencias existentes y ausencia de ciclos."""
+    names = [step.name for step in steps]
+    duplicated = {name for name in names if names.count(name) > 1}
+    if duplicated:
+        raise ValueError(f"Pasos duplicados: {sorted(duplicated)}")
+
+    by_name = {step.name: step for step in steps}
+    for step in steps:
+        unknown = [dep for dep in step.deps if dep not in by_name]
+        if unknown:
+            raise ValueError(f"El paso '{step.name}' depende de pasos inexistentes: {unknown}")
+
+    pending = {step.name: set(step.deps) for step in steps}
+    while pending:
+        ready = [name for name, deps in pending.items() if not deps]
+        if not ready:
+            raise ValueError(f"Hay un ciclo entre los pasos: {sorted(pending)}")
+        for name in ready:
+            del pending[name]
+        for deps in pending.values():
+            deps.difference_update(ready)
+
+
+def run_steps(
+    steps: Iterable[Step],
+    state_path: Optional[Path] = None,
+    max_workers: int = 4,
+    fresh: bool = False,
+) -> Dict[str, float]:
+    """
+    Ejecuta los pasos en hilos respetando sus dependencias: cada paso arranca en cuanto
+    terminan los suyos, así la carga completa dura lo que la cadena más lenta y no la suma
+    de todas las tablas.
+
+    - Los pasos ya marcados en `state_path` por una corrida que falló se saltan
+      (reanudación); `fresh=True` borra las marcas y empieza de cero. Cuando todos los
+      pasos terminan bien las marcas se borran: la siguiente corrida es una carga nueva.
+    - Si un paso falla, sus dependientes no se ejecutan pero el resto de ramas sigue; al
+      final se lanza RuntimeError con los pasos fallidos y los que quedaron bloqueados.
+    - Un paso que falló (o se cortó) a medio hacer se vuelve a ejecutar entero al
+      reanudar, con su `resume` si lo tiene.
+
+    Devuelve los segundos de cada paso ejecutado en esta corrida.
+    """
+    steps = list(steps)
+    _check_graph(steps)
+    state = StepState(state_path)
+    if fresh:
+        state.reset()
+
+    done = {step.name for step in steps if state.is_done(step.name)}
+    if done:
+        print(f"Reanudando: se omiten {len(done)} pasos ya completados: {sorted(done)}")
+
+    failed: Dict[str, BaseException] = {}
+    timings: Dict[str, float] = {}
+    waiting: List[Step] = [step for step in steps if step.name not in done]
+    running = {}
+
+    def timed(func: Callable[[], None]) -> float:
+        start = time.perf_counter()
+        func()
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        while waiting or running:
+            for step in [s for s in waiting if all(dep in done for dep in s.deps)]:
+                waiting.remove(step)
+                func = step.func
+                if state.was_interrupted(step.name) and step.resume is not None:
+                    print(f"[{step.name}] reanudando un paso que quedó a medio hacer")
+                    func = step.resume
+                else:
+                    print(f"[{step.name}] iniciando")
+                state.mark_started(step.name)
+                running[pool.submit(timed, func)] = step
+
+            if not running:
+                # Lo que queda depende de pasos fallidos
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                step = running.pop(future)
+                try:
+                    seconds = future.result()
+                except Exception as e:
+                    failed[step.name] = e
+                    print(f"[{step.name}] ERROR: {e}")
+                    continue
+                timings[step.name] = seconds
+                done.add(step.name)
+                state.mark_done(step.name, seconds)
+                print(f"[{step.name}] completado en {seconds:.1f}s")
+
+    if failed or waiting:
+        blocked = sorted(step.name for step in waiting)
+        raise RuntimeError(
+            f"Pasos fallidos: {sorted(failed)}; bloqueados por dependencias: {blocked}. "
+            "Vuelve a ejecutar para reanudar desde aquí."
+        )
+    state.reset()
+    return timings
@@ -0,0 +1,203 @@
+import io
+import json
+import os
+import time
+import itertools
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Sequence, Union
+
+import pandas as pd
+
+# Filas que se convierten a CSV por vez al alimentar COPY: acota la memoria del buffer
+COPY_CHUNK_ROWS = int(os.getenv("COPY_CHUNK_ROWS", "50000"))
+
+
+def connect():
+    """
+    Conexión directa a Postgres (psycopg2) con las mismas variables que app/database.py;
+    DATABASE_URL tiene prioridad si está definida.
+    """
+    import psycopg2
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    url = os.getenv("DATABASE_URL")
+    if url:
+        return psycopg2.connect(url)
+    return psycopg2.connect(
+        user=os.getenv("DB_USER", "postgres"),
+        password=os.getenv("DB_PASSWORD", ""),
+        host=os.getenv("DB_HOST", "localhost"),
+        port=os.getenv("DB_PORT", "5432"),
+        dbname=os.getenv("DB_NAME", "postgres"),
+    )
+
+
+class CsvStream(io.RawIOBase):
+    """
+    Archivo de solo lectura que genera el CSV de uno o varios DataFrames (p. ej. los lotes
+    del modo streaming) de a `chunk_rows` filas a medida que COPY lo lee, sin armar nunca
+    el texto completo en memoria.
+    """
+
+    def __init__(self, frames: Iterable[pd.DataFrame], chunk_rows: int = COPY_CHUNK_ROWS):
+        self.parts = self._slices(frames, chunk_rows)
+        self.buffer = b""
+        self.done = False
+
+    @staticmethod
+    def _slices(frames: Iterable[pd.DataFrame], chunk_rows: int) -> Iterator[pd.DataFrame]:
+        for df in frames:
+            for start in range(0, len(df), chunk_rows):
+                yield df.iloc[start : start + chunk_rows]
+
+    def readable(self) -> bool:
+        return True
+
+    def _fill(self) -> None:
+        part = next(self.parts, None)
+        if part is None:
+            self.done = True
+            return
+        self.buffer += part.to_csv(header=False, index=False, lineterminator="\n").encode("utf-8")
+
+    def read(self, size: int = -1) -> bytes:
+        while (size < 0 or len(self.buffer) < size) and not self.done:
+            self._fill()
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+def _ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def copy_dataframe(
+    df: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+    table_name: str,
+    conn=None,
+    schema: str = "public",
+    conflict_columns: Optional[Sequence[str]] = None,
+    replace_column: Optional[str] = None,
+    delete_values: Sequence[object] = (),
+    reject_path: Optional[Path] = None,
+) -> Dict[str, float]:
+    """
+    Carga `df` (un DataFrame o una secuencia de lotes con las mismas columnas) en
+    `schema.table_name` con COPY ... FROM STDIN (CSV) a una tabla staging
+    temporal y la fusiona en la tabla destino, todo en una transacción: o entra la tabla
+    completa o no entra nada. Las filas que chocan con una clave primaria o única existente
+    se omiten (ON CONFLICT DO NOTHING), salvo que se indique `conflict_columns`: entonces se
+    actualizan las demás columnas de la fila existente con esa clave (upsert). Las omitidas
+    que no son idénticas a una fila de la tabla se cuentan en `rejected` y se escriben en
+    `reject_path` (JSON lines, como ChunkUploader); las idénticas no se pierden. Con
+    `replace_column`, antes de insertar se borran de la tabla destino las filas cuyo valor
+    en esa columna aparece en los datos (p. ej. todas las filas de las companies cargadas)
+    o en `delete_values` (p. ej. companies que ya no tienen filas).
+
+    Devuelve el resumen: filas copiadas, borradas, insertadas y rechazadas, segundos y filas/s.
+    """
+    if reject_path is not None and Path(reject_path).exists():
+        # Los rechazos de una corrida anterior de esta tabla se reemplazan
+        Path(reject_path).unlink()
+    frames = iter([df] if isinstance(df, pd.DataFrame) else df)
+    first = next(frames, None)
+    if first is None:
+        return {"copied": 0, "deleted": 0, "inserted": 0, "rejected": 0, "seconds": 0.0, "rows_per_s": 0.0}
+    frames = itertools.chain([first], frames)
+    df = first
+
+    own_conn = conn is None
+    conn = conn or connect()
+    columns = ", ".join(_ident(col) for col in df.columns)
+    target = f"{_ident(schema)}.{_ident(table_name)}"
+    staging = _ident(f"stg_{table_name}")
+    on_conflict = "do nothing"
+    if conflict_columns:
+        updates = [col for col in df.columns if col not in conflict_columns]
+        on_conflict = f"({', '.join(_ident(col) for col in conflict_columns)}) do " + (
+            "update set " + ", ".join(f"{_ident(col)} = excluded.{_ident(col)}" for col in updates)
+            if updates
+            else "nothing"
+        )
+
+    start = time.perf_counter()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"create temp table {staging} (like {target} including defaults) on commit drop"
+                )
+                cur.copy_expert(
+                    f"copy {staging} ({columns}) from stdin with (format csv)",
+                    CsvStream(frames),
+                )
+                copied = cur.rowcount
+                deleted = 0
+                if replace_column:
+                    column = _ident(replace_column)
+                    replaced = f"select {column} from {staging}"
+                    if len(delete_values):
+                        # Tabla con el mismo tipo que la columna destino para los valores extra
+                        extra = _ident(f"del_{table_name}")
+                        cur.execute(
+                            f"create temp table {extra} on commit drop as select {column} from {target} limit 0"
+                        )
+                        cur.copy_expert(
+                            f"copy {extra} from stdin with (format csv)",
+                            CsvStream([pd.DataFrame({replace_column: list(delete_values)})]),
+                        )
+                        replaced += f" union all select {column} from {extra}"
+                    cur.execute(f"delete from {target} where {column} in ({replaced})")
+                    deleted = cur.rowcount
+                cur.execute(
+                    f"insert into {target} ({columns}) select {columns} from {staging} on conflict {on_conflict}"
+                )
+                inserted = cur.rowcount
+                rejected = []
+                if inserted < copied:
+                    # Filas omitidas por el conflicto que no coinciden con ninguna de la tabla
+                    cur.execute(f"select {columns} from {staging} except select {columns} from {target}")
+                    rejected = [dict(zip(df.columns, row)) for row in cur.fetchall()]
+    finally:
+        if own_conn:
+            conn.close()
+
+    seconds = time.perf_counter() - start
+    report = {
+        "copied": copied,
+        "deleted": deleted,
+        "inserted": inserted,
+        "rejected": len(rejected),
+        "seconds": round(seconds, 3),
+        "rows_per_s": round(inserted / seconds, 1) if seconds > 0 else 0.0,
+    }
+    print(
+        f"'{table_name}' (COPY): {inserted} de {copied} filas en {seconds:.1f}s ({report['rows_per_s']} filas/s)"
+    )
+    if deleted:
+        print(f"'{table_name}' (COPY): se reemplazaron {deleted} filas existentes")
+    if copied - inserted > len(rejected):
+        print(f"'{table_name}' (COPY): {copied - inserted - len(rejected)} filas ya existían idénticas y se omitieron")
+    if rejected:
+        _write_rejects(reject_path, table_name, rejected)
+        print(
+            f"'{table_name}' (COPY): {len(rejected)} filas chocaron con una clave existente y no se "
+            f"insertaron, ver {reject_path}"
+        )
+    return report
+
+
+def _write_rejects(reject_path: Optional[Path], table_name: str, rows: Sequence[Dict[str, object]]) -> None:
+    if reject_path is None:
+        return
+    reject_path = Path(reject_path)
+    reject_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(reject_path, "a", encoding="utf-8") as f:
+        for row in rows:
+            f.write(
+                json.dumps({"table": table_name, "error": "conflicto con una clave existente", "row": row}, default=str)
+                + "\n"
+            )
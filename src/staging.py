@@ -0,0 +1,168 @@
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+BASE_DATA_DIR = Path("src/data")
+
+# Exporta además cada tabla intermedia como <nombre>.csv, solo para inspeccionarla
+DEBUG_CSV = os.getenv("ETL_DEBUG_CSV", "0") == "1"
+
+# Modo streaming: los CSV de origen se procesan en chunks de ETL_CHUNK_ROWS filas y las
+# tablas intermedias se escriben y suben por lotes, así la memoria pico depende del tamaño
+# del chunk y no del archivo
+STREAM_MODE = os.getenv("ETL_STREAM", "0") == "1"
+STREAM_CHUNK_ROWS = int(os.getenv("ETL_CHUNK_ROWS", "200000"))
+
+_ID = "string"
+_TEXT = "string"
+_REPEATED = "category"
+
+# Esquema explícito de cada tabla intermedia que los prepare_* entregan a upload_data.
+# Los ids (uuid) y textos son "string" (nulos como <NA>, no como NaN float) y los textos
+# muy repetidos se guardan como categorías.
+SCHEMAS: Dict[str, Dict[str, str]] = {
+    "location_master": {
+        "id": _ID,
+        "global_region": _REPEATED,
+        "region": _REPEATED,
+        "country": _REPEATED,
+        "state": _TEXT,
+        "city": _TEXT,
+    },
+    "company_location": {"company_id": _ID, "location_id": _ID, "address_type": _REPEATED},
+    "industry_master": {"id": _ID, "sector": _TEXT, "detail": _TEXT},
+    "company_industry": {"company_id": _ID, "industry_id": _ID},
+    "score_ready": {"company_id": _ID, "relevance": "Float64"},
+    "cloud_ready": {"company_id": _ID, "coverage": _REPEATED},
+    "partner_classification_ready": {"company_id": _ID, "classification": _REPEATED},
+    "technology_sc_ready": {"company_id": _ID, "scope": _REPEATED},
+    "technology_ready": {
+        "company_id": _ID,
+        "tech_group": _REPEATED,
+        "technology": _REPEATED,
+        "detail": _REPEATED,
+        "category": _REPEATED,
+    },
+    "partner_vendor_ready": {"partner_id": _ID, "vendor_id": _ID},
+}
+
+_ARROW_TYPES = {
+    _ID: pa.string(),
+    _REPEATED: pa.dictionary(pa.int32(), pa.string()),
+    "Float64": pa.float64(),
+}
+
+
+def arrow_schema(name: str) -> pa.Schema:
+    """Esquema Arrow fijo de la tabla: todos los chunks de un archivo comparten tipos."""
+    return pa.schema([(col, _ARROW_TYPES[dtype]) for col, dtype in SCHEMAS[name].items()])
+
+
+# Entregas en memoria dentro del mismo proceso (prepare_* -> upload_*); el Parquet queda
+# para reanudar una corrida o subir en otro proceso
+_memory: Dict[str, pd.DataFrame] = {}
+_lock = threading.Lock()
+
+
+def apply_schema(df: pd.DataFrame, name: str) -> pd.DataFrame:
+    """Ordena y tipa las columnas según SCHEMAS[name]; falla si falta alguna."""
+    schema = SCHEMAS[name]
+    missing = [col for col in schema if col not in df.columns]
+    if missing:
+        raise ValueError(f"A la tabla '{name}' le faltan columnas del esquema: {missing}")
+    return df[list(schema)].astype(schema)
+
+
+class TableWriter:
+    """
+    Publica una tabla intermedia por partes: cada `append` se tipa con SCHEMAS[name] y se
+    agrega como row group a src/data/<name>.parquet (y a <name>.csv con ETL_DEBUG_CSV=1).
+    Fuera del modo streaming, al cerrar deja además la tabla completa en memoria para el
+    upload del mismo proceso.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.path = BASE_DATA_DIR / f"{name}.parquet"
+        self.tmp = self.path.with_name(self.path.name + ".tmp")
+        self.schema = arrow_schema(name)
+        self.writer = pq.ParquetWriter(self.tmp, self.schema)
+        self.parts: List[pd.DataFrame] = []
+        self.rows = 0
+
+    def append(self, df: pd.DataFrame) -> None:
+        df = apply_schema(df, self.name).reset_index(drop=True)
+        self.writer.write_table(pa.Table.from_pandas(df, schema=self.schema, preserve_index=False))
+        if DEBUG_CSV:
+            first = self.rows == 0
+            df.to_csv(BASE_DATA_DIR / f"{self.name}.csv", index=False, mode="w" if first else "a", header=first)
+        if not STREAM_MODE:
+            self.parts.append(df)
+        self.rows += len(df)
+
+    def close(self) -> None:
+        self.writer.close()
+        os.replace(self.tmp, self.path)
+        if not STREAM_MODE:
+            df = pd.concat(self.parts, ignore_index=True) if self.parts else apply_schema(
+                pd.DataFrame(columns=list(SCHEMAS[self.name])), self.name
+            )
+            with _lock:
+                _memory[self.name] = df
+        self.parts = []
+        print(f"{self.name} generado con {self.rows} filas")
+
+    def __enter__(self) -> "TableWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+            return
+        self.writer.close()
+        self.tmp.unlink(missing_ok=True)
+
+
+def write_table(df: pd.DataFrame, name: str) -> Path:
+    """Publica una tabla intermedia completa de una vez (ver TableWriter)."""
+    with TableWriter(name) as writer:
+        writer.append(df)
+    return writer.path
+
+
+def read_table(name: str) -> pd.DataFrame:
+    """
+    Lee una tabla intermedia: primero la entrega en memoria (que se consume), si no el
+    Parquet. Los nombres con extensión .csv se leen como CSV crudo (archivos de origen).
+    """
+    if name.endswith(".csv"):
+        return pd.read_csv(BASE_DATA_DIR / name)
+    with _lock:
+        df = _memory.pop(name, None)
+    if df is None:
+        df = pd.read_parquet(BASE_DATA_DIR / f"{name}.parquet")
+    return df
+
+
+def iter_table(name: str, batch_rows: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """
+    Como read_table pero por lotes de `batch_rows` filas (por defecto STREAM_CHUNK_ROWS):
+    del Parquet se leen los row groups a medida que se consumen.
+    """
+    batch_rows = batch_rows or STREAM_CHUNK_ROWS
+    if name.endswith(".csv"):
+        yield from pd.read_csv(BASE_DATA_DIR / name, chunksize=batch_rows)
+        return
+    with _lock:
+        df = _memory.pop(name, None)
+    if df is not None:
+        for start in range(0, len(df), batch_rows):
+            yield df.iloc[start : start + batch_rows]
+        return
+    for batch in pq.ParquetFile(BASE_DATA_DIR / f"{name}.parquet").iter_batches(batch_size=batch_rows):
+        yield batch.to_pandas()
@@ -0,0 +1,107 @@
+import json
+import os
+import sys
+import threading
+
+import pytest
+
+# Asegurar que el directorio padre (`src`) esté en sys.path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from orchestrator import Step, run_steps
+
+
+class Recorder:
+    """Funciones de paso que anotan cuándo corrieron y pueden fallar a pedido."""
+
+    def __init__(self):
+        self.calls = []
+        self.failing = set()
+        self._lock = threading.Lock()
+
+    def step(self, name):
+        def run():
+            with self._lock:
+                self.calls.append(name)
+            if name in self.failing:
+                raise ValueError(f"{name} falló")
+        return run
+
+
+def graph(rec, resume=None):
+    """a -> b -> c y una rama independiente d."""
+    resume = resume or {}
+    return [
+        Step("a", rec.step("a")),
+        Step("b", rec.step("b"), ("a",), resume.get("b")),
+        Step("c", rec.step("c"), ("b",)),
+        Step("d", rec.step("d")),
+    ]
+
+
+def test_runs_steps_after_their_dependencies_and_clears_the_state(tmp_path):
+    rec = Recorder()
+    state = tmp_path / "state.json"
+    timings = run_steps(graph(rec), state, max_workers=2)
+
+    assert set(timings) == {"a", "b", "c", "d"}
+    assert rec.calls.index("a") < rec.calls.index("b") < rec.calls.index("c")
+    # Una corrida completa no deja marcas: la siguiente es una carga nueva
+    assert not state.exists()
+
+
+def test_failure_blocks_dependents_but_not_other_branches(tmp_path):
+    rec = Recorder()
+    rec.failing.add("b")
+    state = tmp_path / "state.json"
+
+    with pytest.raises(RuntimeError) as exc:
+        run_steps(graph(rec), state, max_workers=2)
+
+    assert "['b']" in str(exc.value) and "['c']" in str(exc.value)
+    assert "c" not in rec.calls and "d" in rec.calls
+    saved = json.loads(state.read_text())
+    assert set(saved["completed"]) == {"a", "d"}
+    assert "b" in saved["started"]
+
+
+def test_resume_skips_completed_steps_and_resumes_the_interrupted_one(tmp_path):
+    rec = Recorder()
+    rec.failing.add("b")
+    state = tmp_path / "state.json"
+    with pytest.raises(RuntimeError):
+        run_steps(graph(rec), state)
+
+    rec.calls.clear()
+    rec.failing.clear()
+    timings = run_steps(graph(rec, resume={"b": rec.step("b (resume)")}), state)
+
+    # a y d ya habían terminado; b quedó a medio hacer y se retoma con su `resume`
+    assert rec.calls == ["b (resume)", "c"]
+    assert set(timings) == {"b", "c"}
+    assert not state.exists()
+
+
+def test_fresh_ignores_the_previous_marks(tmp_path):
+    rec = Recorder()
+    rec.failing.add("b")
+    state = tmp_path / "state.json"
+    with pytest.raises(RuntimeError):
+        run_steps(graph(rec), state)
+
+    rec.calls.clear()
+    rec.failing.clear()
+    run_steps(graph(rec, resume={"b": rec.step("b (resume)")}), state, fresh=True)
+    assert sorted(rec.calls) == ["a", "b", "c", "d"]
+
+
+def test_invalid_graphs_are_rejected():
+    noop = lambda: None
+    with pytest.raises(ValueError, match="duplicados"):
+        run_steps([Step("a", noop), Step("a", noop)])
+    with pytest.raises(ValueError, match="inexistentes"):
+        run_steps([Step("a", noop, ("x",))])
+    with pytest.raises(ValueError, match="ciclo"):
+        run_steps([Step("a", noop, ("b",)), Step("b", noop, ("a",))])
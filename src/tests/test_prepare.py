@@ -0,0 +1,68 @@
+import os
+import sys
+import types
+import uuid
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Asegurar que el directorio padre (`src`) y sus benchmarks estén en sys.path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+for path in (ROOT, os.path.join(ROOT, 'benchmarks')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# Los tests no hablan con Supabase: `db` se reemplaza antes de importar los controllers
+sys.modules.setdefault("db", types.SimpleNamespace(supabase=None))
+
+import bench_location
+import staging
+from controllers import company_mapping, source
+from controllers.location import prepare_location_data
+from delta import master_id, master_ids
+
+
+def test_master_ids_match_master_id():
+    keys = pd.DataFrame(
+        {
+            "city": ["Springfield", "Ñuñoa", "São Paulo", None, "x|y", "", "Zürich"],
+            "state": [None, "RM", np.nan, "CA", "a", "b", "ZH"],
+            "country": pd.Series(["US", "CL", "BR", "US", "?", "?", "CH"], dtype="category"),
+            "n": [1, 2, 3, 4, 5, 6, 7],
+        }
+    )
+    expected = [master_id("t", *row) for row in keys.itertuples(index=False, name=None)]
+    assert list(master_ids("t", keys)) == expected
+    assert all(uuid.UUID(value).version == 5 for value in expected)
+
+
+def _outputs(workdir):
+    return {name: bench_location.load_output(workdir, name) for name in ("location_master", "company_location")}
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_prepare_location_matches_the_previous_implementation(tmp_path, monkeypatch, stream):
+    companies, seed = 300, 5
+    data = bench_location.synthetic_location(4000, companies, 250, seed)
+    monkeypatch.setattr(company_mapping, "_cached", bench_location.company_mapping(companies, seed))
+    monkeypatch.setattr(staging, "STREAM_MODE", stream)
+    monkeypatch.setattr(source, "STREAM_MODE", stream)
+    monkeypatch.setattr(source, "STREAM_CHUNK_ROWS", 700)
+
+    results = {}
+    for name, prepare in (
+        ("reference", bench_location.prepare_location_reference),
+        ("vectorized", prepare_location_data),
+    ):
+        workdir = tmp_path / name
+        (workdir / "src" / "data").mkdir(parents=True)
+        data.to_csv(workdir / "src" / "data" / "df_location_filtered.csv", index=False)
+        # BASE_DATA_DIR es relativo (src/data), como al correr el ETL desde la raíz del repo
+        monkeypatch.chdir(workdir)
+        prepare()
+        results[name] = _outputs(workdir)
+        staging._memory.clear()
+
+    for table, expected in results["reference"].items():
+        assert results["vectorized"][table].equals(expected), table
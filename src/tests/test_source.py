@@ -0,0 +1,121 @@
+import os
+import random
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Asegurar que el directorio padre (`src`) esté en sys.path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from controllers.source import CompanyCoverage, IncrementalDedup, MasterIndex
+
+KEY_COLS = ["city", "state", "country"]
+
+
+def locations(rows=1000, seed=3):
+    rng = random.Random(seed)
+    places = [
+        (f"Region {i % 4}", f"Country {i % 9}", None if i % 7 == 0 else f"State {i % 13}", f"City {i}")
+        for i in range(120)
+    ]
+    picked = [rng.choice(places) for _ in range(rows)]
+    return pd.DataFrame(
+        {
+            "company_id": [f"c{rng.randrange(400)}" for _ in range(rows)],
+            "region": [p[0] for p in picked],
+            "country": [p[1] for p in picked],
+            "state": [p[2] for p in picked],
+            "city": [p[3] for p in picked],
+        }
+    )
+
+
+def chunks(df, size):
+    """Como read_source en modo streaming: cada chunk con sus propias categorías."""
+    for start in range(0, len(df), size):
+        part = df.iloc[start : start + size].copy()
+        part["region"] = part["region"].astype("category")
+        part["country"] = part["country"].astype("category")
+        yield part
+
+
+def as_rows(df):
+    return df.astype(object).where(df.notna(), None).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("size", [13, 250, 1000])
+def test_incremental_dedup_matches_drop_duplicates(size):
+    df = locations()
+    for subset in (None, KEY_COLS):
+        dedup = IncrementalDedup(subset=subset)
+        streamed = pd.concat([dedup.filter(part) for part in chunks(df, size)])
+        expected = df.drop_duplicates(subset=subset)
+        assert as_rows(streamed).equals(as_rows(expected))
+
+
+@pytest.mark.parametrize("size", [13, 250, 1000])
+def test_master_index_matches_one_shot_assignment(size):
+    df = locations()
+    one_shot = MasterIndex("location_master", KEY_COLS)
+    expected_ids, expected_new = one_shot.assign(df)
+
+    master = MasterIndex("location_master", KEY_COLS)
+    parts = [master.assign(part) for part in chunks(df, size)]
+    ids = np.concatenate([part[0] for part in parts])
+    new_rows = pd.concat([part[1] for part in parts])
+
+    assert (ids == expected_ids).all()
+    assert as_rows(new_rows).equals(as_rows(expected_new))
+    # Una fila maestra por clave
+    assert len(new_rows) == len(df.drop_duplicates(subset=KEY_COLS))
+
+
+@pytest.mark.parametrize("size", [13, 250, 1000])
+def test_company_coverage_matches_one_shot_anti_join(size):
+    df = locations()
+    all_ids = [f"c{i}" for i in range(500)]
+    one_shot = CompanyCoverage(all_ids)
+    one_shot.add(df["company_id"])
+
+    coverage = CompanyCoverage(all_ids)
+    for part in chunks(df, size):
+        coverage.add(part["company_id"])
+
+    used = set(df["company_id"])
+    assert list(coverage.missing()) == list(one_shot.missing()) == [cid for cid in all_ids if cid not in used]
+
+
+def test_chunk_with_an_all_nan_column_keeps_keys_and_ids_unique(tmp_path):
+    # El primer chunk mezcla estados y NaN; el segundo no trae ningún estado, así que
+    # read_csv lee su columna `state` como float64
+    rows = 200
+    df = pd.DataFrame(
+        {
+            "city": [f"City {i % 10}" for i in range(rows)],
+            "state": [("S" if i % 2 else None) if i < 100 else None for i in range(rows)],
+            "country": ["FR"] * rows,
+        }
+    )
+    path = tmp_path / "locations.csv"
+    df.to_csv(path, index=False)
+    parts = list(pd.read_csv(path, chunksize=100))
+    assert parts[1]["state"].dtype == np.float64
+    whole = pd.read_csv(path)
+
+    master = MasterIndex("location_master", KEY_COLS)
+    assigned = [master.assign(part) for part in parts]
+    ids = np.concatenate([part[0] for part in assigned])
+    new_rows = pd.concat([part[1] for part in assigned])
+    expected_ids, expected_new = MasterIndex("location_master", KEY_COLS).assign(whole)
+
+    assert new_rows["id"].is_unique
+    assert (ids == expected_ids).all()
+    assert as_rows(new_rows).equals(as_rows(expected_new))
+
+    dedup = IncrementalDedup(subset=KEY_COLS)
+    streamed = pd.concat([dedup.filter(part) for part in parts])
+    assert as_rows(streamed).equals(as_rows(whole.drop_duplicates(subset=KEY_COLS)))
@@ -0,0 +1,272 @@
+import os
+import sys
+import types
+import uuid
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Asegurar que el directorio padre (`src`) esté en sys.path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# Los tests no hablan con Supabase: `db` se reemplaza antes de importar los controllers
+sys.modules.setdefault("db", types.SimpleNamespace(supabase=None))
+
+import delta
+import staging
+import upload
+from uploader import ChunkRejected
+
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.op = None
+        self.rows = None
+        self.on_conflict = None
+        self.filter = None
+        self.page = None
+
+    def select(self, columns):
+        self.op = "select"
+        return self
+
+    def order(self, column):
+        return self
+
+    def range(self, start, end):
+        self.page = (start, end)
+        return self
+
+    def insert(self, rows):
+        self.op, self.rows = "insert", rows
+        return self
+
+    def upsert(self, rows, on_conflict=None):
+        self.op, self.rows, self.on_conflict = "upsert", rows, on_conflict
+        self.client.conflicts.append((self.table, on_conflict))
+        return self
+
+    def delete(self):
+        self.op = "delete"
+        return self
+
+    def in_(self, column, values):
+        self.filter = (column, set(values))
+        return self
+
+    def execute(self):
+        self.client.ops.append((self.table, self.op))
+        stored = self.client.tables.setdefault(self.table, [])
+        if self.op == "select":
+            column, values = self.filter
+            found = sorted((row for row in stored if row.get(column) in values), key=lambda row: row["id"])
+            start, end = self.page
+            return types.SimpleNamespace(data=found[start : end + 1], error=None)
+        if self.op == "delete":
+            column, values = self.filter
+            stored[:] = [row for row in stored if row.get(column) not in values]
+        elif self.op == "upsert":
+            keys = self.on_conflict.split(",")
+            new = {tuple(row[k] for k in keys): row for row in self.rows}
+            stored[:] = [row for row in stored if tuple(row[k] for k in keys) not in new] + list(new.values())
+        else:
+            # Como el default gen_random_uuid() de la tabla
+            stored.extend({"id": str(uuid.uuid4()), **row} for row in self.rows)
+        return types.SimpleNamespace(error=None)
+
+
+class FakeSupabase:
+    """Cliente REST en memoria: aplica select, insert, upsert y delete ... in_ sobre listas de dicts."""
+
+    def __init__(self, tables=None):
+        self.tables = tables or {}
+        self.ops = []
+        self.conflicts = []
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+
+@pytest.fixture
+def fake_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(staging, "BASE_DATA_DIR", tmp_path)
+    monkeypatch.setattr(delta, "DELTA_DIR", tmp_path / ".delta")
+    monkeypatch.setattr(upload, "REJECTS_DIR", tmp_path / "rejects")
+    monkeypatch.setattr(upload, "COPY_TABLES", set())
+    client = FakeSupabase()
+    monkeypatch.setattr(sys.modules["db"], "supabase", client)
+    return client
+
+
+def test_resume_replaces_the_rows_of_the_uploaded_companies(fake_db):
+    # Una corrida anterior alcanzó a subir una fila de c1 antes de cortarse; c3 no se toca
+    fake_db.tables["score"] = [
+        {"id": "s1", "company_id": "c1", "relevance": 0.1},
+        {"id": "s3", "company_id": "c3", "relevance": 0.3},
+    ]
+    staging.write_table(
+        pd.DataFrame({"company_id": ["c1", "c1", "c2"], "relevance": [0.5, 0.6, 0.7]}), "score_ready"
+    )
+    upload.upload_score(resume=True)
+    staging.write_table(
+        pd.DataFrame({"company_id": ["c1", "c1", "c2"], "relevance": [0.5, 0.6, 0.7]}), "score_ready"
+    )
+    upload.upload_score(resume=True)
+
+    rows = sorted((row["company_id"], row["relevance"]) for row in fake_db.tables["score"])
+    assert rows == [("c1", 0.5), ("c1", 0.6), ("c2", 0.7), ("c3", 0.3)]
+    assert ("score", "delete") in fake_db.ops
+
+
+def test_interrupted_replace_keeps_the_previous_rows(fake_db, monkeypatch):
+    # Sin transacción por REST: si la subida se corta, c1 no puede quedar sin filas
+    fake_db.tables["score"] = [{"id": "s1", "company_id": "c1", "relevance": 0.1}]
+
+    def execute(self):
+        if self.op == "insert":
+            raise ChunkRejected("permission denied for table score", code="42501")
+        return original(self)
+
+    original = FakeQuery.execute
+    monkeypatch.setattr(FakeQuery, "execute", execute)
+    staging.write_table(pd.DataFrame({"company_id": ["c1", "c1"], "relevance": [0.5, 0.6]}), "score_ready")
+    with pytest.raises(ChunkRejected):
+        upload.upload_score(resume=True)
+    assert scores(fake_db) == [("c1", 0.1)]
+
+    # Con filas rechazadas las nuevas que sí entraron conviven con las anteriores hasta reintentar
+    monkeypatch.setattr(FakeQuery, "execute", original)
+    staging.write_table(pd.DataFrame({"company_id": ["c1", "bad"], "relevance": [0.5, 0.6]}), "score_ready")
+
+    def reject_bad(self):
+        if self.op == "insert" and any(row["company_id"] == "bad" for row in self.rows):
+            raise ValueError("invalid input syntax for type uuid")
+        return original(self)
+
+    monkeypatch.setattr(FakeQuery, "execute", reject_bad)
+    with pytest.raises(RuntimeError, match="1 filas rechazadas"):
+        upload.upload_score(resume=True)
+    assert scores(fake_db) == [("c1", 0.1), ("c1", 0.5)]
+
+
+def test_resume_upserts_tables_with_a_natural_key(fake_db):
+    fake_db.tables["company_industry"] = [{"company_id": "c1", "industry_id": "i1"}]
+    staging.write_table(
+        pd.DataFrame({"company_id": ["c1", "c2"], "industry_id": ["i1", "i2"]}), "company_industry"
+    )
+    upload.upload_company_industry(resume=True)
+
+    assert fake_db.ops == [("company_industry", "upsert")]
+    assert sorted(row["company_id"] for row in fake_db.tables["company_industry"]) == ["c1", "c2"]
+
+
+def test_rejected_rows_fail_the_upload_step(fake_db, monkeypatch):
+    def execute(self):
+        if self.op == "insert" and any(row["company_id"] == "bad" for row in self.rows):
+            raise ValueError("invalid input syntax for type uuid")
+        return original(self)
+
+    original = FakeQuery.execute
+    monkeypatch.setattr(FakeQuery, "execute", execute)
+    staging.write_table(pd.DataFrame({"company_id": ["c1", "bad", "c2"], "relevance": [0.1, 0.2, 0.3]}), "score_ready")
+
+    with pytest.raises(RuntimeError, match="1 filas rechazadas"):
+        upload.upload_score()
+    # El resto del lote sí se subió; la fila mala quedó en rejects/
+    assert sorted(row["company_id"] for row in fake_db.tables["score"]) == ["c1", "c2"]
+    assert (upload.REJECTS_DIR / "score.jsonl").exists()
+
+
+def scores(client):
+    return sorted((row["company_id"], row["relevance"]) for row in client.tables.get("score", []))
+
+
+def test_delta_replaces_the_rows_of_changed_and_removed_companies(fake_db):
+    first = pd.DataFrame({"company_id": ["c1", "c1", "c2", "c3"], "relevance": [0.1, 0.2, 0.3, 0.4]})
+    staging.write_table(first, "score_ready")
+    # La carga completa también deja la huella, así la primera corrida delta no duplica
+    upload.upload_data("score_ready", "score", keep_columns=["company_id", "relevance"], delta=False)
+
+    fake_db.ops.clear()
+    staging.write_table(first, "score_ready")
+    upload.upload_data("score_ready", "score", keep_columns=["company_id", "relevance"], delta=True)
+    assert fake_db.ops == []
+
+    # c1 cambia una de sus filas, c3 desaparece y llega c4
+    second = pd.DataFrame({"company_id": ["c1", "c1", "c2", "c4"], "relevance": [0.1, 0.25, 0.3, 0.5]})
+    staging.write_table(second, "score_ready")
+    upload.upload_data("score_ready", "score", keep_columns=["company_id", "relevance"], delta=True)
+    assert scores(fake_db) == [("c1", 0.1), ("c1", 0.25), ("c2", 0.3), ("c4", 0.5)]
+
+
+def test_stream_full_load_writes_the_same_fingerprint(fake_db, monkeypatch, tmp_path):
+    df = pd.DataFrame({"company_id": ["c1", "c2", "c1", "c3", "c2"], "relevance": [0.1, 0.2, 0.3, 0.4, 0.5]})
+    staging.write_table(df, "score_ready")
+    upload.upload_data("score_ready", "score", keep_columns=["company_id", "relevance"], delta=False)
+    one_shot = dict(np.load(tmp_path / ".delta" / "score.npz"))
+
+    # Por lotes de 2 filas: c1 y c2 quedan repartidas entre lotes
+    monkeypatch.setattr(upload, "STREAM_MODE", True)
+    monkeypatch.setattr(staging, "STREAM_CHUNK_ROWS", 2)
+    staging.write_table(df, "score_ready")
+    upload.upload_data("score_ready", "score", keep_columns=["company_id", "relevance"], delta=False)
+    streamed = dict(np.load(tmp_path / ".delta" / "score.npz"))
+
+    order_a, order_b = np.argsort(one_shot["owners"]), np.argsort(streamed["owners"])
+    for name in ("owners", "row_hash", "key_hash"):
+        assert (one_shot[name][order_a] == streamed[name][order_b]).all(), name
+
+
+def test_rejected_rows_do_not_update_the_fingerprint(fake_db, monkeypatch, tmp_path):
+    def execute(self):
+        if self.op == "insert" and any(row["company_id"] == "bad" for row in self.rows):
+            raise ValueError("invalid input syntax for type uuid")
+        return original(self)
+
+    original = FakeQuery.execute
+    monkeypatch.setattr(FakeQuery, "execute", execute)
+    staging.write_table(pd.DataFrame({"company_id": ["c1", "bad"], "relevance": [0.1, 0.2]}), "score_ready")
+    with pytest.raises(RuntimeError):
+        upload.upload_data("score_ready", "score", keep_columns=["company_id", "relevance"], delta=True)
+    assert not (tmp_path / ".delta" / "score.npz").exists()
+
+
+def test_master_tables_upsert_on_their_deterministic_id(fake_db):
+    # Un NULL en (city, state, country) nunca coincide en on_conflict: se usa el id (uuid5)
+    master = pd.DataFrame(
+        {
+            "id": ["l1", "l2"],
+            "global_region": ["AMER", "AMER"],
+            "region": ["North America", "North America"],
+            "country": ["US", "US"],
+            "state": [None, "CA"],
+            "city": ["Springfield", "Fresno"],
+        }
+    )
+    staging.write_table(master, "location_master")
+    upload.upload_location_master(resume=True)
+    assert fake_db.conflicts == [("location_master", "id")]
+
+
+def test_copy_conflicts_fail_the_step_like_rest_rejects(fake_db, monkeypatch, tmp_path):
+    import pg_loader
+
+    def copy_dataframe(frames, table_name, **kwargs):
+        # Lo que devuelve pg_loader cuando ON CONFLICT DO NOTHING omitió una fila distinta
+        assert kwargs["reject_path"] == upload.REJECTS_DIR / "company_industry.jsonl"
+        return {"copied": 2, "deleted": 0, "inserted": 1, "rejected": 1, "seconds": 0.0, "rows_per_s": 0.0}
+
+    monkeypatch.setattr(pg_loader, "copy_dataframe", copy_dataframe)
+    staging.write_table(
+        pd.DataFrame({"company_id": ["c1", "c2"], "industry_id": ["i1", "i2"]}), "company_industry"
+    )
+    with pytest.raises(RuntimeError, match="1 filas rechazadas"):
+        upload.upload_data(
+            "company_industry", "company_industry", keep_columns=["company_id", "industry_id"], backend="copy"
+        )
+    assert not (tmp_path / ".delta" / "company_industry.npz").exists()
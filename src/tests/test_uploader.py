@@ -0,0 +1,59 @@
+import os
+import sys
+
+import pytest
+
+# Asegurar que el directorio padre (`src`) esté en sys.path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from uploader import ChunkRejected, ChunkUploader, is_fatal, is_transient, iter_chunks
+
+
+class ApiError(Exception):
+    """Como postgrest.APIError: el código de PostgREST o el SQLSTATE en `code`."""
+
+    def __init__(self, code):
+        super().__init__(f"error {code}")
+        self.code = code
+
+
+def test_error_classification():
+    assert is_transient(ApiError("503")) and is_transient(ApiError("40001")) and is_transient(ConnectionError())
+    for code in ("PGRST301", "PGRST302", "401", "403", "42501", "42P01", "42703", "PGRST204"):
+        assert is_fatal(ApiError(code)), code
+        assert not is_transient(ApiError(code)), code
+    assert is_fatal(ChunkRejected("permission denied", code="42501"))
+    assert not is_fatal(ApiError("23505")) and not is_transient(ApiError("23505"))
+
+
+def test_data_errors_isolate_the_bad_rows(tmp_path):
+    inserted = []
+
+    def insert(table, rows):
+        if any(row["id"] == 7 for row in rows):
+            raise ApiError("23505")
+        inserted.extend(rows)
+
+    uploader = ChunkUploader("t", insert=insert, concurrency=2, reject_path=tmp_path / "t.jsonl")
+    report = uploader.upload(iter_chunks([{"id": i} for i in range(20)], 8))
+    assert report["inserted"] == 19 and report["rejected"] == 1
+    assert sorted(row["id"] for row in inserted) == [i for i in range(20) if i != 7]
+    assert '"id": 7' in (tmp_path / "t.jsonl").read_text()
+
+
+@pytest.mark.parametrize("code", ["PGRST301", "403", "42P01", "42501"])
+def test_auth_permission_and_schema_errors_fail_fast(tmp_path, code):
+    calls = []
+
+    def insert(table, rows):
+        calls.append(len(rows))
+        raise ApiError(code)
+
+    uploader = ChunkUploader("t", insert=insert, concurrency=1, backoff=0, reject_path=tmp_path / "t.jsonl")
+    with pytest.raises(ApiError):
+        uploader.upload(iter_chunks([{"id": i} for i in range(16)], 16))
+    # Ni reintentos ni partición del chunk: una sola llamada con las 16 filas
+    assert calls == [16]
+    assert not (tmp_path / "t.jsonl").exists()
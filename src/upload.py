@@ -1,9 +1,17 @@
+import argparse
+import os
+import uuid
+from functools import partial
 from pathlib import Path
-from typing import Dict, Iterable, List, Mapping, Optional
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence
 
 import pandas as pd
 
-from db import supabase
+from controllers.company_mapping import clear_company_mapping
+from delta import OWNER_COLUMNS, UPSERT_KEYS, TableFingerprint
+from orchestrator import Step, run_steps
+from staging import STREAM_MODE, iter_table, read_table
+from uploader import UPLOAD_CONCURRENCY, ChunkUploader, iter_chunks, supabase_delete_in, supabase_select_in, supabase_upsert
 from controllers.location import prepare_location_data
 from controllers.industry import prepare_industry_data
 from controllers.general import (
@@ -16,28 +24,39 @@ from controllers.general import (
 )
 
 BASE_DATA_DIR = Path("src/data")
+STATE_PATH = BASE_DATA_DIR / ".upload_state.json"
+REJECTS_DIR = BASE_DATA_DIR / "rejects"
 
+# Tablas que se cargan con COPY directo a Postgres (pg_loader) en lugar del cliente REST,
+# p. ej. COPY_TABLES=technology,company_location; "*" = todas
+COPY_TABLES = {name.strip() for name in os.getenv("COPY_TABLES", "").split(",") if name.strip()}
 
-def _read_csv(file_name: str) -> pd.DataFrame:
-    """Lee un CSV desde el directorio de datos y muestra sus columnas."""
-    file_path = BASE_DATA_DIR / file_name
-    df = pd.read_csv(file_path)
-    print(f"Columnas del CSV {file_name}:", df.columns.tolist())
-    return df
 
+# Modo delta: solo se suben las filas nuevas o modificadas desde la última carga exitosa,
+# con upsert sobre la clave natural de cada tabla (ver delta.py)
+DELTA_MODE = os.getenv("ETL_DELTA", "0") == "1"
 
-def upload_data(
-    file_name: str,
-    table_name: str,
-    chunk_size: int = 1000,
-    column_map: Optional[Mapping[str, str]] = None,
-    keep_columns: Optional[Iterable[str]] = None,
-    required_not_null: Optional[Iterable[str]] = None,
-    default_values: Optional[Mapping[str, object]] = None,
-) -> None:
-    """Sube datos de un CSV a una tabla de Supabase en chunks."""
-    df = _read_csv(file_name)
 
+def _backend_for(table_name: str) -> str:
+    return "copy" if table_name in COPY_TABLES or "*" in COPY_TABLES else "rest"
+
+
+def _read_table(name: str) -> pd.DataFrame:
+    """Lee una tabla intermedia (o un CSV de origen) y muestra sus columnas."""
+    df = read_table(name)
+    print(f"Columnas de {name}:", df.columns.tolist())
+    return df
+
+
+def _clean(
+    df: pd.DataFrame,
+    column_map: Optional[Mapping[str, str]],
+    keep_columns: Optional[Iterable[str]],
+    default_values: Optional[Mapping[str, object]],
+    required_not_null: Optional[Iterable[str]],
+    counts: Dict[str, int],
+) -> pd.DataFrame:
+    """Renombra, filtra columnas y completa/descarta nulos; acumula los conteos en `counts`."""
     if column_map:
         df = df.rename(columns=column_map)
 
@@ -51,43 +70,213 @@ def upload_data(
                 before = df[col].isnull().sum()
                 df[col] = df[col].fillna(default)
                 after = df[col].isnull().sum()
-                filled = before - after
-                if filled > 0:
-                    print(
-                        f"Se llenaron {filled} valores nulos en '{col}' con '{default}'"
-                    )
+                counts[f"filled:{col}"] = counts.get(f"filled:{col}", 0) + int(before - after)
 
     if required_not_null:
         for col in required_not_null:
             if col not in df.columns:
-                print(
-                    f"Advertencia: la columna requerida '{col}' no existe en el CSV. Se omite esta validacion."
-                )
+                counts[f"absent:{col}"] = 1
                 continue
             before = len(df)
             df = df[df[col].notnull()]
-            removed = before - len(df)
-            if removed > 0:
-                print(f"Se eliminaron {removed} filas con '{col}' nulo")
-
-    df = df.where(pd.notnull(df), None)
+            counts[f"removed:{col}"] = counts.get(f"removed:{col}", 0) + before - len(df)
+    return df
 
-    records: List[Dict[str, object]] = df.to_dict(orient="records")
-    total = len(records)
-    print(f"Subiendo {total} filas a la tabla '{table_name}'...")
 
-    for i in range(0, total, chunk_size):
-        chunk = records[i : i + chunk_size]
-        resp = supabase.table(table_name).insert(chunk).execute()
+def _report_clean(counts: Dict[str, int], default_values: Optional[Mapping[str, object]]) -> None:
+    for key, n in counts.items():
+        kind, col = key.split(":", 1)
+        if kind == "filled" and n > 0:
+            print(
+                f"Se llenaron {n} valores nulos en '{col}' con '{default_values[col]}'"
+            )
+        elif kind == "absent":
+            print(
+                f"Advertencia: la columna requerida '{col}' no existe en el CSV. Se omite esta validacion."
+            )
+        elif kind == "removed" and n > 0:
+            print(f"Se eliminaron {n} filas con '{col}' nulo")
 
-        if getattr(resp, "error", None):
-            print(f"Error en el chunk {i // chunk_size + 1}: {resp.error}")
-            break
 
+def upload_data(
+    file_name: str,
+    table_name: str,
+    chunk_size: int = 1000,
+    column_map: Optional[Mapping[str, str]] = None,
+    keep_columns: Optional[Iterable[str]] = None,
+    required_not_null: Optional[Iterable[str]] = None,
+    default_values: Optional[Mapping[str, object]] = None,
+    concurrency: int = UPLOAD_CONCURRENCY,
+    backend: Optional[str] = None,
+    delta: Optional[bool] = None,
+    resume: bool = False,
+) -> Dict[str, float]:
+    """
+    Sube a una tabla de Supabase una tabla intermedia de staging.py (o un CSV de origen si
+    `file_name` termina en .csv).
+
+    - backend "rest" (por defecto): chunks por el cliente REST con `concurrency` inserciones
+      en vuelo; las filas que la base rechaza quedan en src/data/rejects/<tabla>.jsonl y,
+      si hay alguna, la subida termina con RuntimeError después de subir el resto.
+    - backend "copy": COPY a una tabla staging y merge en una transacción (pg_loader);
+      sin pasar por dicts ni JSON, pero una fila inválida hace fallar la tabla entera. Las
+      filas que chocan con una clave existente sin ser idénticas también van a rejects/.
+    Sin `backend`, se usa "copy" para las tablas de COPY_TABLES.
+
+    Toda subida que termina sin rechazos guarda la huella de la tabla (delta.TableFingerprint).
+    En modo delta (`delta`, por defecto DELTA_MODE) se suben solo las filas que cambiaron
+    respecto de esa huella, con upsert sobre UPSERT_KEYS; en las tablas de OWNER_COLUMNS se
+    reemplazan todas las filas de las companies con cambios y se borran las de las que ya
+    no vienen. En modo streaming (ETL_STREAM=1) la tabla se lee y se sube por lotes, sin
+    cargarla entera; el modo delta necesita la tabla completa y la lee de una vez.
+
+    `resume=True` retoma una subida que quedó a medio hacer sin duplicar lo que ya entró:
+    upsert sobre UPSERT_KEYS y, en las tablas de OWNER_COLUMNS, reemplazo de las filas de las
+    companies que se suben (ver _upload_frames). También lee la tabla completa.
+    """
+    backend = backend or _backend_for(table_name)
+    delta = DELTA_MODE if delta is None else delta
+    counts: Dict[str, int] = {}
+
+    def clean(df: pd.DataFrame) -> pd.DataFrame:
+        return _clean(df, column_map, keep_columns, default_values, required_not_null, counts)
+
+    fingerprint = TableFingerprint(table_name)
+
+    if STREAM_MODE and not delta and not resume:
+        print(f"Subiendo por lotes '{file_name}' a la tabla '{table_name}'...")
+
+        def frames():
+            for df in iter_table(file_name):
+                df = clean(df)
+                fingerprint.add(df)
+                yield df
+
+        report = _upload_frames(frames(), table_name, backend, chunk_size, concurrency)
+        _report_clean(counts, default_values)
+        _check_rejected(report, table_name)
+        fingerprint.save()
+        print(f"Subida a '{table_name}' finalizada.")
+        return report
+
+    df = clean(_read_table(file_name))
+    _report_clean(counts, default_values)
+
+    conflict_columns = None
+    replace_column = None
+    removed: List[str] = []
+    if delta or resume:
+        conflict_columns = [col for col in UPSERT_KEYS.get(table_name, []) if col in df.columns] or None
+        if conflict_columns:
+            # Un upsert no puede tocar dos veces la misma clave en una sentencia
+            df = df.drop_duplicates(subset=conflict_columns, keep="last")
+        if OWNER_COLUMNS.get(table_name) in df.columns:
+            replace_column = OWNER_COLUMNS[table_name]
+    loaded = df
+    if delta:
+        df, stats = fingerprint.changes(df)
+        unit = f"companies ({replace_column})" if replace_column else "filas"
+        print(
+            f"Delta '{table_name}' en {unit}: {stats['new']} nuevas, {stats['updated']} modificadas, "
+            f"{stats['unchanged']} sin cambios, {stats['missing']} ausentes respecto de la carga anterior"
+        )
+        if replace_column:
+            removed = fingerprint.removed_owners(loaded)
+
+    if df.empty and not removed:
+        report = {"inserted": 0, "seconds": 0.0, "rows_per_s": 0.0}
+    else:
+        print(f"Subiendo {len(df)} filas a la tabla '{table_name}'...")
+        report = _upload_frames(
+            [df], table_name, backend, chunk_size, concurrency, conflict_columns, replace_column, removed
+        )
+
+    # Con filas rechazadas la huella no se actualiza: la próxima corrida delta las reintenta
+    _check_rejected(report, table_name)
+    fingerprint.save(loaded)
     print(f"Subida a '{table_name}' finalizada.")
+    return report
+
+
+def _check_rejected(report: Dict[str, float], table_name: str) -> None:
+    """Falla si la base rechazó filas: el paso no debe quedar marcado como completado."""
+    rejected = report.get("rejected", 0)
+    if rejected:
+        raise RuntimeError(
+            f"'{table_name}': {rejected} filas rechazadas (ver {REJECTS_DIR / f'{table_name}.jsonl'})"
+        )
+
+
+def _upload_frames(
+    frames: Iterable[pd.DataFrame],
+    table_name: str,
+    backend: str,
+    chunk_size: int,
+    concurrency: int,
+    conflict_columns: Optional[List[str]] = None,
+    replace_column: Optional[str] = None,
+    delete_values: Sequence[object] = (),
+) -> Dict[str, float]:
+    """
+    Sube una secuencia de DataFrames (uno o muchos lotes) por COPY o por REST. Con
+    `replace_column`, las filas existentes con los valores de esa columna que vienen en los
+    datos se reemplazan por las nuevas, y se borran las de los valores de `delete_values`.
+
+    Por COPY el reemplazo va en una transacción. Por REST no hay transacción: primero se
+    insertan las filas nuevas (con `id` propio) y solo si entraron todas se borran las que
+    ya estaban. Una subida cortada deja filas repetidas, que la próxima corrida reemplaza,
+    pero nunca deja a una company sin sus filas.
+    """
+    if backend == "copy":
+        from pg_loader import copy_dataframe
+
+        return copy_dataframe(
+            frames,
+            table_name,
+            conflict_columns=conflict_columns,
+            replace_column=replace_column,
+            delete_values=delete_values,
+            reject_path=REJECTS_DIR / f"{table_name}.jsonl",
+        )
+
+    stale: List[object] = []
+    if replace_column:
+        frames = list(frames)
+        owners = pd.concat([df[replace_column] for df in frames]).dropna().unique().tolist()
+        print(
+            f"'{table_name}': se reemplazan las filas de {len(owners)} valores de '{replace_column}'"
+            f" y se borran las de {len(delete_values)}"
+        )
+        stale = supabase_select_in(table_name, replace_column, owners)
+        frames = [df.assign(id=[str(uuid.uuid4()) for _ in range(len(df))]) for df in frames]
+
+    def record_chunks():
+        for df in frames:
+            # object para que los nulos de las columnas tipadas (<NA>) lleguen como None al JSON
+            df = df.astype(object).where(df.notna(), None)
+            records: List[Dict[str, object]] = df.to_dict(orient="records")
+            yield from iter_chunks(records, chunk_size)
+
+    uploader = ChunkUploader(
+        table_name,
+        insert=supabase_upsert(conflict_columns) if conflict_columns else None,
+        concurrency=concurrency,
+        reject_path=REJECTS_DIR / f"{table_name}.jsonl",
+    )
+    report = uploader.upload(record_chunks())
 
+    if replace_column:
+        supabase_delete_in(table_name, replace_column, delete_values)
+        if report.get("rejected"):
+            # Las filas anteriores de esas companies siguen ahí hasta que entren todas las nuevas
+            print(f"'{table_name}': hubo filas rechazadas; no se borran las {len(stale)} filas anteriores")
+        else:
+            supabase_delete_in(table_name, "id", stale)
+            report["deleted"] = len(stale)
+    return report
 
-def upload_company() -> None:
+
+def upload_company(resume: bool = False) -> None:
     upload_data(
         file_name="df_company_tot.csv",
         table_name="company",
@@ -111,12 +300,15 @@ def upload_company() -> None:
         ],
         default_values={"name": "No Name"},
         required_not_null=None,
+        resume=resume,
     )
+    # Los prepare_* deben ver los ids recién insertados
+    clear_company_mapping()
 
 
-def upload_location_master() -> None:
+def upload_location_master(resume: bool = False) -> None:
     upload_data(
-        file_name="location_master.csv",
+        file_name="location_master",
         table_name="location_master",
         keep_columns=[
             "id",
@@ -126,91 +318,99 @@ def upload_location_master() -> None:
             "state",
             "city",
         ],
+        resume=resume,
     )
 
 
-def upload_company_location() -> None:
+def upload_company_location(resume: bool = False) -> None:
     upload_data(
-        file_name="company_location.csv",
+        file_name="company_location",
         table_name="company_location",
         keep_columns=[
             "company_id",
             "location_id",
             "address_type",
         ],
+        resume=resume,
     )
 
 
-def upload_industry_master() -> None:
+def upload_industry_master(resume: bool = False) -> None:
     upload_data(
-        file_name="industry_master.csv",
+        file_name="industry_master",
         table_name="industry_master",
         keep_columns=[
             "id",
             "sector",
             "detail",
         ],
+        resume=resume,
     )
 
 
-def upload_score() -> None:
+def upload_score(resume: bool = False) -> None:
     upload_data(
-        file_name="score_ready.csv",
+        file_name="score_ready",
         table_name="score",
         keep_columns=[
             "company_id",
             "relevance",
         ],
+        resume=resume,
     )
 
 
-def upload_company_industry() -> None:
+def upload_company_industry(resume: bool = False) -> None:
     upload_data(
-        file_name="company_industry.csv",
+        file_name="company_industry",
         table_name="company_industry",
         keep_columns=[
             "company_id",
             "industry_id",
         ],
+        resume=resume,
     )
 
 
-def upload_cloud() -> None:
+def upload_cloud(resume: bool = False) -> None:
     upload_data(
-        file_name="cloud_ready.csv",
+        file_name="cloud_ready",
         table_name="cloud",
         keep_columns=[
             "company_id",
             "coverage",
         ],
+        resume=resume,
     )
 
 
-def upload_partner_classification() -> None:
+def upload_partner_classification(resume: bool = False) -> None:
     upload_data(
-        file_name="partner_classification_ready.csv",
+        file_name="partner_classification_ready",
         table_name="partner_classification",
         keep_columns=[
             "company_id",
             "classification",
         ],
+        resume=resume,
     )
 
 
-def upload_technology_sc() -> None:
+def upload_technology_sc(resume: bool = False) -> None:
     upload_data(
-        file_name="technology_sc_ready.csv",
+        file_name="technology_sc_ready",
         table_name="technology_sc",
         keep_columns=[
             "company_id",
             "scope",
         ],
+        resume=resume,
     )
 
 
-def upload_technology() -> None:
+def upload_technology(resume: bool = False) -> None:
     upload_data(
-        file_name="technology_ready.csv",
+        file_name="technology_ready",
         table_name="technology",
         keep_columns=[
             "company_id",
@@ -219,49 +419,69 @@ def upload_technology() -> None:
             "detail",
             "category",
         ],
+        resume=resume,
     )
 
 
-def upload_partner_vendor() -> None:
+def upload_partner_vendor(resume: bool = False) -> None:
     upload_data(
-        file_name="partner_vendor_ready.csv",
+        file_name="partner_vendor_ready",
         table_name="partner_vendor",
         keep_columns=[
             "partner_id",
             "vendor_id",
         ],
+        resume=resume,
     )
 
 
-if __name__ == "__main__":
-    print("====== INICIANDO CARGA DE DATOS ======\n")
-
-    upload_company()
-
-    prepare_location_data()
-    upload_location_master()
-    upload_company_location()
+def build_steps() -> List[Step]:
+    """
+    Grafo de la carga: todo depende de `company` (los prepare_* consultan sus ids) y cada
+    tabla pivote espera a su tabla maestra; el resto de ramas son independientes. Las
+    subidas que quedaron a medio hacer se reanudan con resume=True (sin duplicar filas).
+    """
+    steps = [Step("company", upload_company, resume=partial(upload_company, resume=True))]
+
+    steps += [
+        Step("prepare_location", prepare_location_data, ("company",)),
+        Step("location_master", upload_location_master, ("prepare_location",), partial(upload_location_master, resume=True)),
+        Step("company_location", upload_company_location, ("location_master",), partial(upload_company_location, resume=True)),
+        Step("prepare_industry", prepare_industry_data, ("company",)),
+        Step("industry_master", upload_industry_master, ("prepare_industry",), partial(upload_industry_master, resume=True)),
+        Step("company_industry", upload_company_industry, ("industry_master",), partial(upload_company_industry, resume=True)),
+    ]
+
+    for name, prepare, upload in [
+        ("score", prepare_score_data, upload_score),
+        ("cloud", prepare_cloud_data, upload_cloud),
+        ("partner_classification", prepare_partner_class_data, upload_partner_classification),
+        ("technology_sc", prepare_technology_sc_data, upload_technology_sc),
+        ("technology", prepare_technology_data, upload_technology),
+        ("partner_vendor", prepare_partner_vendor_data, upload_partner_vendor),
+    ]:
+        steps += [
+            Step(f"prepare_{name}", prepare, ("company",)),
+            Step(name, upload, (f"prepare_{name}",), partial(upload, resume=True)),
+        ]
+    return steps
 
-    prepare_industry_data()
-    upload_industry_master()
-    upload_company_industry()
 
-    prepare_score_data()
-    upload_score()
-
-    prepare_cloud_data()
-    upload_cloud()
-
-    prepare_partner_class_data()
-    upload_partner_classification()
-
-    prepare_technology_sc_data()
-    upload_technology_sc()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Carga los CSV de src/data en Supabase")
+    parser.add_argument("--workers", type=int, default=4, help="Pasos en paralelo (1 = secuencial)")
+    parser.add_argument("--fresh", action="store_true", help="Ignora las marcas de una corrida anterior y carga todo")
+    parser.add_argument("--state", default=str(STATE_PATH), help="Archivo con los pasos completados")
+    parser.add_argument("--delta", action="store_true", help="Sube solo lo que cambió desde la última carga (upsert)")
+    parser.add_argument("--copy", nargs="*", default=[], metavar="TABLA", help="Tablas a cargar con COPY (se suman a COPY_TABLES)")
+    args = parser.parse_args()
+    COPY_TABLES.update(args.copy)
+    DELTA_MODE = DELTA_MODE or args.delta
 
-    prepare_technology_data()
-    upload_technology()
+    print("====== INICIANDO CARGA DE DATOS ======\n")
 
-    prepare_partner_vendor_data()
-    upload_partner_vendor()
+    timings = run_steps(build_steps(), Path(args.state), args.workers, args.fresh)
+    for name, seconds in sorted(timings.items(), key=lambda kv: -kv[1]):
+        print(f"  {name:<24} {seconds:8.1f}s")
 
     print("TODAS LAS CARGAS TERMINADAS")
@@ -0,0 +1,282 @@
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+Records = List[Dict[str, object]]
+InsertFn = Callable[[str, Records], None]
+
+# Inserciones de chunks en vuelo a la vez y reintentos ante errores transitorios
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "4"))
+UPLOAD_MAX_RETRIES = int(os.getenv("UPLOAD_MAX_RETRIES", "5"))
+UPLOAD_BACKOFF_SECONDS = float(os.getenv("UPLOAD_BACKOFF_SECONDS", "0.5"))
+# Valores por petición al borrar con un filtro `in` (viajan en la URL)
+DELETE_CHUNK_SIZE = int(os.getenv("DELETE_CHUNK_SIZE", "200"))
+# Filas por página al leer con select (PostgREST corta en max-rows, 1000 en Supabase)
+SELECT_PAGE_SIZE = int(os.getenv("SELECT_PAGE_SIZE", "1000"))
+
+# SQLSTATE de conexión (08), concurrencia (40), recursos (53) e intervención del operador (57)
+TRANSIENT_SQLSTATE_CLASSES = ("08", "40", "53", "57")
+TRANSIENT_HTTP_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+# Errores que no son de las filas sino de credenciales (PGRST3xx, 401/403), permisos (42501)
+# o esquema (tabla o columna inexistente): fallan igual con cualquier subconjunto del chunk
+FATAL_HTTP_STATUS = {401, 403}
+FATAL_SQLSTATE = {"42501", "42P01", "42703"}
+FATAL_PGRST = {"PGRST204", "PGRST205"}
+
+
+class ChunkRejected(Exception):
+    """Error que la API devolvió para el chunk (restricción, tipo inválido...): reintentar no sirve."""
+
+    def __init__(self, message: str, code: Optional[str] = None):
+        super().__init__(message)
+        self.code = code
+
+
+def _rejected(error) -> ChunkRejected:
+    code = error.get("code") if isinstance(error, dict) else getattr(error, "code", None)
+    return ChunkRejected(str(error), code=code)
+
+
+def supabase_insert(table_name: str, rows: Records) -> None:
+    """Inserta un chunk con el cliente REST de Supabase."""
+    from db import supabase
+
+    resp = supabase.table(table_name).insert(rows).execute()
+    if getattr(resp, "error", None):
+        raise _rejected(resp.error)
+
+
+def supabase_upsert(on_conflict: Sequence[str]) -> InsertFn:
+    """Como supabase_insert, pero actualiza las filas que ya existen con la misma clave natural."""
+
+    def upsert(table_name: str, rows: Records) -> None:
+        from db import supabase
+
+        resp = supabase.table(table_name).upsert(rows, on_conflict=",".join(on_conflict)).execute()
+        if getattr(resp, "error", None):
+            raise _rejected(resp.error)
+
+    return upsert
+
+
+def supabase_delete_in(table_name: str, column: str, values: Sequence[object], chunk_size: int = DELETE_CHUNK_SIZE) -> None:
+    """Borra con el cliente REST las filas de la tabla cuyo `column` está en `values`."""
+    from db import supabase
+
+    values = list(values)
+    for i in range(0, len(values), chunk_size):
+        resp = supabase.table(table_name).delete().in_(column, values[i : i + chunk_size]).execute()
+        if getattr(resp, "error", None):
+            raise _rejected(resp.error)
+
+
+def supabase_select_in(
+    table_name: str,
+    column: str,
+    values: Sequence[object],
+    select: str = "id",
+    chunk_size: int = DELETE_CHUNK_SIZE,
+    page_size: int = SELECT_PAGE_SIZE,
+) -> List[object]:
+    """Valores de la columna `select` de las filas cuyo `column` está en `values`, paginando."""
+    from db import supabase
+
+    values = list(values)
+    found: List[object] = []
+    for i in range(0, len(values), chunk_size):
+        start = 0
+        while True:
+            resp = (
+                supabase.table(table_name)
+                .select(select)
+                .in_(column, values[i : i + chunk_size])
+                .order(select)
+                .range(start, start + page_size - 1)
+                .execute()
+            )
+            if getattr(resp, "error", None):
+                raise _rejected(resp.error)
+            found.extend(row[select] for row in resp.data)
+            if len(resp.data) < page_size:
+                break
+            start += page_size
+    return found
+
+
+def _error_status(exc: BaseException) -> Optional[int]:
+    """Código HTTP del error, si lo trae (httpx.HTTPStatusError o un `code` numérico)."""
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None)
+    if isinstance(status, int):
+        return status
+    code = str(getattr(exc, "code", "") or "")
+    return int(code) if code.isdigit() and len(code) == 3 else None
+
+
+def is_fatal(exc: BaseException) -> bool:
+    """
+    True si el error es de credenciales, permisos o esquema: no depende de las filas, así
+    que ni reintentar ni partir el chunk sirve y la subida debe fallar de inmediato.
+    """
+    code = str(getattr(exc, "code", "") or "")
+    if code in FATAL_SQLSTATE or code in FATAL_PGRST or code.startswith("PGRST3"):
+        return True
+    return _error_status(exc) in FATAL_HTTP_STATUS
+
+
+def is_transient(exc: BaseException) -> bool:
+    """
+    True si el error es de red o del servidor y vale la pena reintentar el mismo chunk;
+    False si es de los datos (se parte el chunk para aislar las filas malas) o fatal.
+    """
+    if isinstance(exc, ChunkRejected) or is_fatal(exc):
+        return False
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    try:
+        import httpx
+
+        if isinstance(exc, httpx.TransportError):
+            return True
+    except ImportError:
+        pass
+    if _error_status(exc) in TRANSIENT_HTTP_STATUS:
+        return True
+    code = str(getattr(exc, "code", "") or "")
+    return len(code) == 5 and code[:2] in TRANSIENT_SQLSTATE_CLASSES
+
+
+def iter_chunks(records: Sequence[dict], chunk_size: int) -> Iterator[Records]:
+    for i in range(0, len(records), chunk_size):
+        yield list(records[i : i + chunk_size])
+
+
+class ChunkUploader:
+    """
+    Sube chunks de filas a una tabla con varias inserciones en vuelo a la vez.
+
+    - Errores transitorios (red, 5xx, 429, SQLSTATE 08/40/53/57): reintenta el mismo chunk
+      con backoff exponencial y jitter; si se agotan los reintentos, la subida falla.
+    - Errores de credenciales, permisos o esquema (ver is_fatal): la subida falla sin
+      reintentar ni partir el chunk.
+    - Errores de datos: parte el chunk en mitades hasta aislar las filas que fallan, que se
+      escriben en `reject_path` (JSON lines con el error) y se cuentan en `rejected`.
+    """
+
+    def __init__(
+        self,
+        table_name: str,
+        insert: Optional[InsertFn] = None,
+        concurrency: int = UPLOAD_CONCURRENCY,
+        max_retries: int = UPLOAD_MAX_RETRIES,
+        backoff: float = UPLOAD_BACKOFF_SECONDS,
+        reject_path: Optional[Path] = None,
+    ):
+        self.table_name = table_name
+        self.insert = insert or supabase_insert
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.reject_path = Path(reject_path) if reject_path else None
+        self._lock = threading.Lock()
+        self.inserted = 0
+        self.rejected = 0
+        self.retries = 0
+        self.requests = 0
+
+    def _insert_with_retry(self, rows: Records) -> None:
+        attempt = 0
+        while True:
+            with self._lock:
+                self.requests += 1
+            try:
+                self.insert(self.table_name, rows)
+                return
+            except Exception as e:
+                if not is_transient(e) or attempt >= self.max_retries:
+                    raise
+                delay = self.backoff * (2 ** attempt) + random.uniform(0, self.backoff)
+                attempt += 1
+                with self._lock:
+                    self.retries += 1
+                print(
+                    f"'{self.table_name}': error transitorio ({e}); reintento {attempt}/{self.max_retries} en {delay:.1f}s"
+                )
+                time.sleep(delay)
+
+    def _send(self, rows: Records) -> None:
+        try:
+            self._insert_with_retry(rows)
+        except Exception as e:
+            if is_transient(e) or is_fatal(e):
+                raise
+            if len(rows) == 1:
+                self._reject(rows, e)
+                return
+            middle = len(rows) // 2
+            self._send(rows[:middle])
+            self._send(rows[middle:])
+            return
+        with self._lock:
+            self.inserted += len(rows)
+
+    def _reject(self, rows: Records, error: BaseException) -> None:
+        with self._lock:
+            self.rejected += len(rows)
+            if self.reject_path is None:
+                return
+            self.reject_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.reject_path, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(
+                        json.dumps({"table": self.table_name, "error": str(error), "row": row}, default=str)
+                        + "\n"
+                    )
+
+    def upload(self, chunks: Iterable[Records]) -> Dict[str, float]:
+        """
+        Sube los chunks (puede ser un generador: solo se piden los que caben en vuelo) y
+        devuelve el resumen: filas subidas y rechazadas, peticiones, reintentos y filas/s.
+        """
+        if self.reject_path is not None and self.reject_path.exists():
+            # Los rechazos de una corrida anterior de esta tabla se reemplazan
+            self.reject_path.unlink()
+        start = time.perf_counter()
+        pending = set()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            try:
+                for chunk in chunks:
+                    if len(pending) >= self.concurrency * 2:
+                        finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            future.result()
+                    pending.add(pool.submit(self._send, chunk))
+                for future in pending:
+                    future.result()
+            except BaseException:
+                for future in pending:
+                    future.cancel()
+                raise
+
+        seconds = time.perf_counter() - start
+        report = {
+            "inserted": self.inserted,
+            "rejected": self.rejected,
+            "requests": self.requests,
+            "retries": self.retries,
+            "seconds": round(seconds, 3),
+            "rows_per_s": round(self.inserted / seconds, 1) if seconds > 0 else 0.0,
+        }
+        print(
+            f"'{self.table_name}': {self.inserted} filas en {seconds:.1f}s "
+            f"({report['rows_per_s']} filas/s, {self.requests} peticiones, {self.retries} reintentos)"
+        )
+        if self.rejected:
+            print(f"'{self.table_name}': {self.rejected} filas rechazadas, ver {self.reject_path}")
+        return report